@@ -0,0 +1,134 @@
+"""Check that steady-state ticks allocate nothing, from gc.mem_alloc() deltas.
+
+On a Pico W with main.py and lib/ installed:
+
+    mpremote run bench/alloc_tick.py
+
+Imports main.py without starting its tasks, warms the caches with a few
+ticks, then runs sample_once() and display_once() with the collector
+disabled and checks that gc.mem_alloc() does not move across a tick.
+Minute rollover and HTTP requests fall outside the tick and are not run.
+Exits with status 1 if any tick allocated.
+
+Under CPython (python bench/alloc_tick.py) refcounting frees temporaries at
+once and the host's gc.mem_alloc() is tracemalloc's live total, so the
+deltas only catch retained growth, and ints above 256 that CPython boxes
+(MicroPython does not) keep them from reaching zero. The host run also
+prints host/sim.py's estimate of bytes allocated per tick. Both are for
+comparing revisions; only the device run passes or fails.
+"""
+import gc
+import sys
+
+MICROPYTHON = sys.implementation.name == "micropython"
+WARMUP = 20  # a full jitter period, so every reading string is cached
+TICKS = 60
+now = 0  # sampler clock for tick()
+
+
+def load():
+    if MICROPYTHON:
+        import main
+
+        return main
+    import os
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.join(root, "host"))
+    import run
+    import tracemalloc
+
+    m = run.load_main()
+    tracemalloc.start()  # backs gc.mem_alloc() on the host
+    return m
+
+
+def tick(m):
+    # Step the sampler's clock a whole period so every probe comes due once,
+    # whether or not the real clock kept up
+    global now
+    now = m.ticks_add(now, m.SAMPLE_PERIOD_MS)
+    m.sample_once(now)
+    m.display_once()
+
+
+def read_errors(m):
+    return sum(ch.errors for ch in m.channels)
+
+
+def measure(m, ticks, pause, meter=None):
+    """Run ticks with the collector off; returns (mem_alloc deltas, failed reads,
+    per-tick estimates from meter)."""
+    deltas = []
+    estimates = []
+    failed = 0
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(ticks):
+            if meter:
+                meter.mark()
+                est0 = meter.total
+            e0 = read_errors(m)
+            a0 = gc.mem_alloc()
+            tick(m)
+            a1 = gc.mem_alloc()
+            if meter:
+                meter.mark()
+            if read_errors(m) != e0:
+                # A failed read raises inside the driver, and the exception
+                # itself allocates
+                failed += 1
+                continue
+            deltas.append(a1 - a0)
+            if meter:
+                estimates.append(meter.total - est0)
+            if pause:
+                pause(1)
+    finally:
+        gc.enable()
+    return deltas, failed, estimates
+
+
+def main():
+    m = load()
+    pause = None
+    if MICROPYTHON:
+        import time
+
+        pause = time.sleep  # DHT11 needs ~1 s between reads
+    global now
+    now = m.ticks_ms()
+    for _ in range(WARMUP):
+        tick(m)
+        if pause:
+            pause(1)
+
+    deltas, failed_reads, _ = measure(m, TICKS, pause)
+    bad = [d for d in deltas if d]
+    print("ticks: {} measured, {} failed reads skipped".format(len(deltas), failed_reads))
+    print("gc.mem_alloc() delta per tick: max {} B, {} ticks allocated".format(
+        max(deltas) if deltas else 0, len(bad)))
+    if not MICROPYTHON:
+        import sim
+
+        meter = sim._AllocMeter()
+        meter.start()
+        try:
+            _, _, est = measure(m, TICKS, None, meter)
+        finally:
+            meter.stop()
+        print("host estimate (CPython): {:.0f} B/tick average, {} B worst".format(
+            sum(est) / len(est), max(est)))
+    if not MICROPYTHON:
+        # Retained ints above 256 (sums, averages) are heap objects here, so
+        # the host cannot reach zero; the pass/fail verdict is the device's
+        print("host run: informational only")
+        return
+    if bad:
+        print("FAIL")
+        sys.exit(1)
+    print("OK")
+
+
+main()
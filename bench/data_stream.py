@@ -0,0 +1,137 @@
+"""/data serialization: json.dumps payload vs streamed JSON vs /data.bin.
+
+    python bench/data_stream.py [--repeat 20]
+
+For several window sizes, reports peak extra allocation (tracemalloc) and
+time-to-last-byte into a counting sink stream. Requests go through the
+server's /data handler with the body cache off, so every one is encoded.
+Then times /data?fields= with derived series: the first request converts
+the whole window, later ones only the points added since.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "host"))
+
+import run  # noqa: E402
+
+node = run.load_main()
+from httpreq import Request  # noqa: E402  (on the path once main is loaded)
+
+node.data_cache = node.ResponseCache(0)
+
+
+class Sink:
+    """Stream stand-in that only counts bytes."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+
+    async def drain(self):
+        pass
+
+
+class Feed:
+    def __init__(self, head):
+        self.head = head
+
+    async def readinto(self, buf):
+        head, self.head = self.head, b""
+        buf[:len(head)] = head
+        return len(head)
+
+
+def parse(target):
+    req = Request(512)
+    asyncio.run(req.read(Feed(b"GET " + target.encode() + b" HTTP/1.1\r\nHost: pico\r\n\r\n")))
+    return req
+
+
+async def legacy_send(writer, points):
+    # The pre-streaming path: copy into lists, dumps, then encode again
+    n = points if points < len(node.temp_series) else len(node.temp_series)
+    out_t = list(node.temp_series.iter_last(n))
+    out_h = list(node.hum_series.iter_last(n))
+    payload = json.dumps({"t": out_t, "h": out_h}).encode("utf-8")
+    await node._send_response(writer, node._HDR_JSON, payload, True)
+
+
+async def streamed_send(writer, req):
+    await node._serve_data(writer, req, True, False)
+
+
+async def binary_send(writer, req):
+    await node._serve_data(writer, req, True, True)
+
+
+def measure(fn, arg, repeat):
+    async def go():
+        sink = Sink()
+        # Warm up (fills the chunk pool) so steady state is measured
+        await fn(sink, arg)
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        await fn(Sink(), arg)
+        peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            await fn(Sink(), arg)
+        return peak, (time.perf_counter() - t0) / repeat, sink.bytes
+
+    return asyncio.run(go())
+
+
+def main(repeat=20):
+    ts0 = int(time.time()) - 60 * 1440
+    for i in range(1440):
+        node.temp_series.append(21.5 + (i % 50) / 10)
+        node.hum_series.append(48.0 + (i % 70) / 10)
+        node.primary.times.append(ts0 + 60 * i)
+    print("{:>6} {:>8} {:>10} {:>9} {:>8} {:>10} {:>9} {:>8} {:>10} {:>9}".format(
+        "points", "legacy B", "peak", "ms", "stream B", "peak", "ms", "bin B", "peak", "ms"))
+    for points in (60, 360, 1440):
+        row = [points]
+        runs = ((legacy_send, points),
+                (streamed_send, parse("/data?points={}".format(points))),
+                (binary_send, parse("/data.bin?points={}".format(points))))
+        for fn, arg in runs:
+            peak, secs, nbytes = measure(fn, arg, repeat)
+            row += [nbytes, peak, secs * 1000]
+        print("{:>6} {:>8} {:>10} {:>9.2f} {:>8} {:>10} {:>9.2f} {:>8} {:>10} {:>9.2f}".format(*row))
+    derived(ts0 + 60 * 1440)
+
+
+def derived(ts):
+    req = parse("/data?points=1440&fields=t,h,dp,ah")
+
+    async def send():
+        await node._serve_data(Sink(), req, True, False)
+
+    def timed():
+        t0 = time.perf_counter()
+        asyncio.run(send())
+        return (time.perf_counter() - t0) * 1000
+
+    first = timed()
+    node.temp_series.append(22.0)
+    node.hum_series.append(50.0)
+    node.primary.times.append(ts)
+    after_one = timed()
+    print("fields=t,h,dp,ah over 1440 points: first request {:.2f} ms, "
+          "after one new point {:.2f} ms".format(first, after_one))
+
+
+if __name__ == "__main__":
+    rep = 20
+    if "--repeat" in sys.argv:
+        rep = int(sys.argv[sys.argv.index("--repeat") + 1])
+    main(rep)
@@ -0,0 +1,186 @@
+"""Collector throughput against a fleet of fake nodes, in nodes scraped/s.
+
+    python bench/fleet.py [--nodes 32] [--limit 8] [--history 1440] [--rounds 5]
+
+A child process loads main.py once per node (each its own module, so its
+own series and counters), seeds every node with --history minutes and
+serves them with main.py's own HTTP server on loopback ports, adding a
+minute to each node every --minute-s seconds. Two extra addresses stand for
+broken boards: a closed port and one that accepts but never answers.
+
+tools/collector.py then scrapes them into a temporary column store: one
+cold round (every node sends its whole window), then --rounds incremental
+rounds (only the minutes added since). Checks that each node's table holds
+every minute up to its cursor exactly once, that a time range lookup finds
+the right rows, and that the broken nodes were backed off.
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, os.path.join(ROOT, "host"))
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+TS0 = 1700000000
+
+
+def _add_minute(m, k):
+    t = 200 + (k * 7) % 50
+    h = 450 + (k * 11) % 80
+    m.store_minute(TS0 + 60 * k, t, h, t - 3, t + 3, h - 5, h + 5, 60)
+    m.readings_count += 1
+
+
+async def serve(nodes, history, minute_s):
+    import run
+
+    run.install()
+    os.chdir(ROOT)
+    fleet = []
+    for i in range(nodes):
+        spec = importlib.util.spec_from_file_location("node%d" % i, os.path.join(ROOT, "main.py"))
+        m = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(m)
+        for k in range(history):
+            _add_minute(m, k)
+        m.HTTP_PORT = 0  # any free port
+        await m.start_http_server()
+        fleet.append(m)
+    print("ready", *(m.server.sockets[0].getsockname()[1] for m in fleet), flush=True)
+    k = history
+    while True:
+        await asyncio.sleep(minute_s)
+        for m in fleet:
+            _add_minute(m, k)
+        k += 1
+
+
+async def _silent(reader, writer):
+    # Accept, never answer; returns once the collector gives up and hangs up
+    await reader.read()
+    writer.close()
+
+
+async def bench(args, ports, store_dir):
+    from collector import Collector
+    from colstore import ColumnStore
+
+    silent = await asyncio.start_server(_silent, "127.0.0.1", 0)
+    dead = silent.sockets[0].getsockname()[1] + 1  # nothing listens here (usually)
+    addrs = ["127.0.0.1:%d" % p for p in ports]
+    broken = ["127.0.0.1:%d" % silent.sockets[0].getsockname()[1], "127.0.0.1:%d" % dead]
+    store = ColumnStore(store_dir)
+    c = Collector(addrs + broken, store, interval=3600, limit=args.limit, timeout=args.timeout)
+    live = c.nodes[:len(addrs)]
+    for n in c.nodes[len(addrs):]:
+        n.due = float("inf")  # kept out of the timed rounds
+
+    t0 = time.perf_counter()
+    await c.round()
+    cold = time.perf_counter() - t0
+    cold_rows = sum(n.rows for n in live)
+    cold_bytes = sum(n.bytes for n in live)
+
+    # The broken nodes on their own: a timeout and a refusal, then backoff
+    for n in c.nodes[len(addrs):]:
+        n.due = 0
+    t0 = time.perf_counter()
+    await c.round()
+    broken_s = time.perf_counter() - t0
+
+    times = []
+    for _ in range(args.rounds):
+        await asyncio.sleep(args.minute_s * 2)
+        b0 = sum(n.bytes for n in live)
+        r0 = sum(n.rows for n in live)
+        for n in live:
+            n.due = 0
+        t0 = time.perf_counter()
+        await c.round()
+        times.append(time.perf_counter() - t0)
+        inc_bytes = sum(n.bytes for n in live) - b0
+        inc_rows = sum(n.rows for n in live) - r0
+    silent.close()
+
+    # Every minute exactly once, in order, up to the cursor (minutes that
+    # left a node's window before its first scrape are gone); broken nodes
+    # backed off
+    ok = True
+    for n in live:
+        tab = store.table(n.name)
+        ts = tab.column("ts")
+        if (ts[tab.rows - 1] != TS0 + 60 * (tab.seq - 1)
+                or any(ts[i] - ts[i - 1] != 60 for i in range(1, tab.rows))):
+            print("MISMATCH", n.name, tab.rows, tab.seq)
+            ok = False
+        del ts
+        lo, hi = tab.range(TS0 + 60 * 100, TS0 + 60 * 200)
+        if hi - lo != 100:
+            print("RANGE", n.name, lo, hi)
+            ok = False
+    for n in c.nodes[len(addrs):]:
+        if not n.fails or n.due <= time.monotonic():
+            print("NOT BACKED OFF", n.name)
+            ok = False
+    store.close()
+
+    times.sort()
+    inc = times[len(times) // 2]
+    print("{} nodes (+2 broken), limit {}, timeout {} s".format(len(addrs), args.limit, args.timeout))
+    print("cold round:        {:.3f} s, {:.1f} nodes/s, {} rows, {:.0f} KB".format(
+        cold, len(addrs) / cold, cold_rows, cold_bytes / 1024))
+    print("incremental round: {:.3f} s median, {:.1f} nodes/s, {:.0f} B/node, {} rows".format(
+        inc, len(addrs) / inc, inc_bytes / len(addrs), inc_rows))
+    print("broken nodes:      {:.3f} s, ".format(broken_s) + ", ".join(
+        "{} ({}, retry in {:.0f} s)".format(n.name, type(n.last_error).__name__, n.due - time.monotonic())
+        for n in c.nodes[len(addrs):]))
+    print("OK" if ok else "FAIL")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--nodes", type=int, default=32)
+    ap.add_argument("--limit", type=int, default=8)
+    ap.add_argument("--history", type=int, default=1440)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--minute-s", type=float, default=0.2)
+    ap.add_argument("--timeout", type=float, default=1.0)
+    ap.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve:
+        asyncio.run(serve(args.nodes, args.history, args.minute_s))
+        return
+
+    child = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--nodes", str(args.nodes),
+         "--history", str(args.history), "--minute-s", str(args.minute_s)],
+        stdout=subprocess.PIPE, text=True)
+    store_dir = tempfile.mkdtemp(prefix="fleet-store-")
+    try:
+        while True:
+            line = child.stdout.readline()
+            if not line:
+                sys.exit("fake nodes did not start")
+            if line.startswith("ready"):
+                break
+        ports = [int(p) for p in line.split()[1:]]
+        ok = asyncio.run(bench(args, ports, store_dir))
+    finally:
+        child.kill()
+        child.wait()
+        shutil.rmtree(store_dir, ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""HTTP latency under concurrent pollers against a local host instance.
+
+    python bench/http_latency.py [--clients 10] [--seconds 10] [--interval 0.2]
+
+Starts main.py through host/run.py on a free port, then runs N keep-alive
+pollers that alternate /data and /text. Prints latency percentiles.
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def start_node(port, extra=()):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "host", "run.py"), "--wifi", "--port", str(port)]
+        + list(extra),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("node did not start listening on :%d" % port)
+
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return float("nan")
+    k = min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+
+def poller(port, seconds, interval, paths, out, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    end = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < end:
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                errors.append(path)
+            else:
+                out.append(time.perf_counter() - t0)
+            if resp.getheader("Connection", "").lower() == "close":
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        except Exception:
+            errors.append(path)
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        time.sleep(interval)
+    conn.close()
+
+
+def run(clients, seconds, interval, paths, port=None):
+    """Run the pollers against 127.0.0.1:port; returns (latencies, errors)."""
+    lat = []
+    errors = []
+    threads = [
+        threading.Thread(target=poller, args=(port, seconds, interval, paths, lat, errors))
+        for _ in range(clients)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    lat.sort()
+    return lat, errors
+
+
+def report(label, lat, errors):
+    ms = [x * 1000 for x in lat]
+    print(
+        "{}: n={} err={} p50={:.1f}ms p90={:.1f}ms p99={:.1f}ms max={:.1f}ms".format(
+            label, len(ms), len(errors), percentile(ms, 50), percentile(ms, 90),
+            percentile(ms, 99), ms[-1] if ms else float("nan"),
+        )
+    )
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--clients", type=int, default=10)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--interval", type=float, default=0.2)
+    args = ap.parse_args(argv)
+    port = free_port()
+    proc = start_node(port)
+    try:
+        lat, errors = run(args.clients, args.seconds, args.interval,
+                          ["/data?points=60", "/text"], port)
+        report("{} clients".format(args.clients), lat, errors)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Request head parsing: readline/split/decode vs lib/httpreq.Request.
+
+    python bench/http_parse.py [--repeat 2000]
+
+Feeds a browser-sized /data request head (with If-None-Match, Accept-Encoding
+and Range) to both parsers in one piece, in three, and a byte at a time, and
+reports time per head and peak extra allocation (tracemalloc), less what
+just handing over the pieces costs. Request is fed through readinto, as on
+the device. Checks that both parsers agree.
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "host"))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "lib"))
+
+from httpreq import Request  # noqa: E402
+
+HEAD = (b"GET /data?sensor=s0&res=1m&points=1440&since=1234 HTTP/1.1\r\n"
+        b"Host: 192.168.1.50\r\n"
+        b"Connection: keep-alive\r\n"
+        b"User-Agent: Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        b"(KHTML, like Gecko) Chrome/124.0 Safari/537.36\r\n"
+        b"Accept: */*\r\n"
+        b"Referer: http://192.168.1.50/\r\n"
+        b"Accept-Encoding: gzip, deflate\r\n"
+        b"Accept-Language: en-GB,en;q=0.9\r\n"
+        b"If-None-Match: \"s0-1m-1234-1700000000\"\r\n"
+        b"Range: bytes=0-99\r\n"
+        b"\r\n")
+
+
+class Feed:
+    """Stream stand-in handing out fixed pieces, via readinto or readline."""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.i = 0
+        self.pending = b""
+
+    async def readinto(self, buf):
+        if self.i == len(self.pieces):
+            return 0
+        p = self.pieces[self.i]
+        self.i += 1
+        buf[:len(p)] = p
+        return len(p)
+
+    async def readline(self):
+        # What StreamReader.readline does: join pieces until a newline
+        while b"\n" not in self.pending and self.i < len(self.pieces):
+            self.pending += self.pieces[self.i]
+            self.i += 1
+        line, nl, self.pending = self.pending.partition(b"\n")
+        return line + nl
+
+
+async def bare(reader, req):
+    # Only the reads: the baseline both parsers are measured against
+    while await reader.readinto(req.buf):
+        pass
+
+
+async def legacy(reader, _req):
+    # The pre-Request path from main.py
+    req = await reader.readline()
+    parts = req.split()
+    parts[0].decode()
+    target = parts[1].decode()
+    keep_alive = parts[2] == b"HTTP/1.1"
+    if_none_match = None
+    while True:
+        line = await reader.readline()
+        if not line or line == b"\r\n":
+            break
+        if line[:11].lower() == b"connection:":
+            value = line[11:].strip().lower()
+            if value == b"close":
+                keep_alive = False
+            elif value == b"keep-alive":
+                keep_alive = True
+        elif line[:14].lower() == b"if-none-match:":
+            if_none_match = line[14:].strip().decode()
+    path, _, query = target.partition("?")
+    points = since = 0
+    for kv in query.split("&"):
+        k, _, v = kv.partition("=")
+        if k == "points":
+            points = int(v)
+        elif k == "since":
+            since = int(v)
+    return path, points, since, keep_alive, if_none_match
+
+
+async def inplace(reader, req):
+    req.reset()
+    await req.read(reader)
+    return (req.path_is(b"/data"), req.int_param(b"points", 0), req.int_param(b"since", -1),
+            req.keep_alive, req.etag_is(b'"s0-1m-1234-1700000000"'))
+
+
+def split(n):
+    size = (len(HEAD) + n - 1) // n
+    return [HEAD[i:i + size] for i in range(0, len(HEAD), size)]
+
+
+def measure(fn, pieces, repeat):
+    req = Request(1536)
+
+    async def go():
+        out = await fn(Feed(pieces), req)
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        await fn(Feed(pieces), req)
+        peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            await fn(Feed(pieces), req)
+        return out, peak, (time.perf_counter() - t0) / repeat
+
+    return asyncio.run(go())
+
+
+def main(repeat):
+    print("{} byte head".format(len(HEAD)))
+    print("{:>8} {:>10} {:>9} {:>10} {:>9}".format("pieces", "legacy B", "us", "Request B", "us"))
+    ok = True
+    for n in (1, 3, len(HEAD)):
+        pieces = split(n)
+        _, base, _ = measure(bare, pieces, 1)
+        (path, points, since, ka, inm), lpeak, lsecs = measure(legacy, pieces, repeat // n + 1)
+        got, rpeak, rsecs = measure(inplace, pieces, repeat // n + 1)
+        if got != (path == "/data", points, since, ka, inm == '"s0-1m-1234-1700000000"'):
+            print("MISMATCH", got)
+            ok = False
+        print("{:>8} {:>10} {:>9.1f} {:>10} {:>9.1f}".format(
+            len(pieces), max(0, lpeak - base), lsecs * 1e6, max(0, rpeak - base), rsecs * 1e6))
+    req = Request(1536)
+    asyncio.run(req.read(Feed([HEAD])))
+    if (req.range_lo, req.range_hi, req.gzip) != (0, 99, True):
+        print("MISMATCH range/gzip", req.range_lo, req.range_hi, req.gzip)
+        ok = False
+    print("OK" if ok else "FAIL")
+
+
+if __name__ == "__main__":
+    rep = 2000
+    if "--repeat" in sys.argv:
+        rep = int(sys.argv[sys.argv.index("--repeat") + 1])
+    main(rep)
@@ -0,0 +1,63 @@
+"""Boot-time history recovery from the flash minute log.
+
+    python bench/log_recovery.py [--hours 24]
+
+Writes `hours` of minute records into a temporary directory (the host's
+stand-in for the flash filesystem) through FlashLog, then times how long
+main.py's open_flash_log() takes to rebuild the ring buffers and rollup
+tiers from it.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "host"))
+
+import run  # noqa: E402
+
+node = run.load_main()
+
+from flashlog import REC_SIZE, FlashLog  # noqa: E402
+
+
+def write_log(path, minutes):
+    log = FlashLog(path, node.LOG_SEGMENT_RECORDS, node.LOG_SEGMENTS, node.LOG_BATCH)
+    ts0 = int(time.time()) - 60 * minutes
+    t0 = time.perf_counter()
+    for i in range(1, minutes + 1):
+        t = 215 + (i % 50)
+        h = 480 + (i % 70)
+        log.append(i, ts0 + 60 * i, t, h, t - 3, t + 3, h - 5, h + 5, 60)
+    log.flush()
+    return log, time.perf_counter() - t0
+
+
+def main(hours=24):
+    minutes = hours * 60
+    tmp = tempfile.mkdtemp(prefix="flashlog-")
+    try:
+        log, write_s = write_log(tmp, minutes)
+        size = sum(os.path.getsize(os.path.join(tmp, n)) for n in os.listdir(tmp))
+        print("wrote {} minutes: {} segments, {} bytes, {} flash appends ({:.1f} ms)".format(
+            minutes, len(log.segments), size, log.writes, write_s * 1000))
+        node.LOG_DIR = tmp
+        t0 = time.perf_counter()
+        node.open_flash_log()
+        elapsed = time.perf_counter() - t0
+        kept = min(minutes, node.LOG_SEGMENT_RECORDS * node.LOG_SEGMENTS)
+        print("recovered {} records in {:.1f} ms ({:.0f} records/s, {} B/record)".format(
+            len(node.temp_series), elapsed * 1000, kept / elapsed, REC_SIZE))
+        print("seq={} 10m buckets={} 1h buckets={}".format(
+            node.readings_count, len(node.tier_10m), len(node.tier_1h)))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    h = 24
+    if "--hours" in sys.argv:
+        h = int(sys.argv[sys.argv.index("--hours") + 1])
+    main(h)
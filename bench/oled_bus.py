@@ -0,0 +1,72 @@
+"""OLED bus traffic per displayed frame, on counting fake I2C and SPI buses.
+
+    python bench/oled_bus.py [--frames 600]
+
+Loads main.py with the host stand-ins and runs display_once() once per
+simulated second, burn-in jitter and power cycling included: first on the
+I2C driver main.py builds, then on an SSD1306_SPI swapped in on a fake SPI
+bus. The reading changes every 30 frames so some frames redraw digits.
+Prints bus transactions, bytes and spi.init() calls per frame, plus
+host/sim.py's estimate of bytes allocated per frame (CPython's, so only
+useful to compare revisions).
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "host"))
+
+import run  # noqa: E402
+
+
+def frames(m, n, meter):
+    for i in range(n):
+        m.temp = 20 + (i // 30) % 5
+        meter.mark()
+        m.display_once()
+        meter.mark()
+
+
+def measure(m, bus, n):
+    import sim
+
+    meter = sim._AllocMeter()
+    frames(m, 30, meter)  # warm the reading string caches
+    bus.reset_counters()
+    meter.start()
+    try:
+        frames(m, n, meter)
+    finally:
+        meter.stop()
+    return {
+        "transactions": round(bus.transactions / n, 2),
+        "bytes": round(bus.bytes_written / n, 1),
+        "spi_inits": round(getattr(bus, "inits", 0) / n, 2),
+        "alloc": round(meter.total / n, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--frames", type=int, default=600)
+    args = ap.parse_args()
+
+    m = run.load_main()
+    from machine import SPI, Pin
+    from ssd1306 import SSD1306_SPI
+
+    results = [("i2c", measure(m, m.i2c, args.frames))]
+    spi = SPI(0)
+    m.oled = SSD1306_SPI(m.WIDTH, m.HEIGHT, spi, Pin(16), Pin(17), Pin(18))
+    results.append(("spi", measure(m, spi, args.frames)))
+
+    print("{} frames, per frame:".format(args.frames))
+    print("{:<5} {:>13} {:>8} {:>10} {:>9}".format("bus", "transactions", "bytes", "spi.init", "alloc B"))
+    for name, r in results:
+        print("{:<5} {:>13} {:>8} {:>10} {:>9}".format(
+            name, r["transactions"], r["bytes"], r["spi_inits"], r["alloc"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Heap cost of minute history: float lists vs RingSeries.
+
+    python bench/ring_memory.py [--points 1440]
+
+Also runs on the Pico (copy next to lib/ and `import ring_memory`), where it
+measures with gc.mem_alloc() deltas instead of tracemalloc.
+"""
+import gc
+import sys
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+if tracemalloc:
+    import os
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib"))
+
+from ringseries import RingSeries
+
+
+def _measure(build):
+    gc.collect()
+    if tracemalloc:
+        tracemalloc.start()
+        obj = build()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    else:
+        before = gc.mem_alloc()
+        obj = build()
+        gc.collect()
+        used = gc.mem_alloc() - before
+    return obj, used
+
+
+def build_lists(points):
+    # What main.py used to keep: two lists of distinct boxed floats
+    t = [0] * (points + 1)
+    h = [0] * (points + 1)
+    for i in range(points + 1):
+        t[i] = 20.0 + (i % 97) / 10
+        h[i] = 40.0 + (i % 89) / 10
+    return t, h
+
+
+def build_series(points):
+    t = RingSeries(points)
+    h = RingSeries(points)
+    for i in range(points):
+        t.append(20.0 + (i % 97) / 10)
+        h.append(40.0 + (i % 89) / 10)
+    return t, h
+
+
+def main(points=1440):
+    _, lists = _measure(lambda: build_lists(points))
+    _, series = _measure(lambda: build_series(points))
+    print("points={}".format(points))
+    print("float lists : {} bytes".format(lists))
+    print("RingSeries  : {} bytes".format(series))
+    print("ratio       : {:.1f}x".format(lists / series if series else 0))
+
+
+if __name__ == "__main__":
+    pts = 1440
+    if "--points" in sys.argv:
+        pts = int(sys.argv[sys.argv.index("--points") + 1])
+    main(pts)
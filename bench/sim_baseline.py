@@ -0,0 +1,105 @@
+"""Baseline numbers for the device loop from the virtual-clock simulator.
+
+    python bench/sim_baseline.py [--hours 1] [--clients 2] [--out baseline.json]
+
+Runs host/sim.py twice in fresh processes: a timing pass with HTTP pollers
+and an allocation pass without them (tracing slows everything down and the
+pollers would only add noise to the device tasks). Prints per-tick CPU time,
+I2C traffic, HTTP latency and allocations per step for the device tasks.
+
+CPU and allocation figures are CPython's, not the RP2040's: use them to
+compare revisions of main.py against each other, not as device numbers.
+CPython also boxes every int above 256, which MicroPython does not below
+2**30, so allocations are reported above the idle_reference floor.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+DEVICE_TASKS = ("sampler_task", "display_task", "aggregator_task", "wifi_task")
+
+
+def run_sim(*args):
+    out = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "host", "sim.py"), "--json"] + list(args),
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def summarize(timing, alloc):
+    ticks = timing["ticks"]
+    tasks = timing["tasks"]
+    busy = sum(tasks[t]["busy_ms"] for t in DEVICE_TASKS if t in tasks)
+    per_task = {}
+    for name in DEVICE_TASKS:
+        t = tasks.get(name)
+        a = alloc["tasks"].get(name)
+        if not t:
+            continue
+        per_task[name] = {
+            "us_per_step": t["us_per_step"],
+            "worst_us": t["worst_us"],
+            "alloc_bytes_per_step": a["alloc_over_floor"] if a else None,
+        }
+    http_busy = tasks.get("http_handle", {}).get("busy_ms", 0)
+    return {
+        "simulated_s": timing["simulated_s"],
+        "cpu_us_per_tick": round(busy * 1e3 / ticks, 1) if ticks else 0,
+        "http_cpu_us_per_tick": round(http_busy * 1e3 / ticks, 1) if ticks else 0,
+        "tasks": per_task,
+        "alloc_floor_bytes_per_step": alloc["tasks"]["idle_reference"]["alloc_bytes_per_step"],
+        "i2c_bytes_per_frame": timing["i2c"]["bytes_per_frame"],
+        "i2c_bytes_per_s": round(timing["i2c"]["bytes"] / timing["simulated_s"], 1),
+        "i2c_transactions_per_frame": round(
+            timing["i2c"]["transactions"] / timing["i2c"]["frames"], 1) if timing["i2c"]["frames"] else 0,
+        "serial_bytes_per_s": timing["serial"]["bytes_per_s"],
+        "flash_writes": timing["flash_writes"],
+        "http": timing["http"],
+    }
+
+
+def report(s):
+    print("simulated {:.0f} s".format(s["simulated_s"]))
+    print("cpu per tick: {} us device tasks, {} us HTTP handlers".format(
+        s["cpu_us_per_tick"], s["http_cpu_us_per_tick"]))
+    print("{:<16} {:>10} {:>10} {:>12}".format("task", "us/step", "worst us", "alloc B/step"))
+    for name, t in s["tasks"].items():
+        print("{:<16} {:>10} {:>10} {:>12}".format(
+            name, t["us_per_step"], t["worst_us"], t["alloc_bytes_per_step"]))
+    print("  (allocations above a {} B/step asyncio floor)".format(s["alloc_floor_bytes_per_step"]))
+    print("i2c: {} B/frame in {} transactions, {} B/s".format(
+        s["i2c_bytes_per_frame"], s["i2c_transactions_per_frame"], s["i2c_bytes_per_s"]))
+    print("serial: {} B/s  flash writes: {}".format(s["serial_bytes_per_s"], s["flash_writes"]))
+    h = s["http"]
+    print("http: {} requests, {} errors, p50 {} ms p90 {} ms p99 {} ms".format(
+        h["requests"], h["errors"], h["p50_ms"], h["p90_ms"], h["p99_ms"]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--hours", type=float, default=1.0)
+    ap.add_argument("--clients", type=int, default=2)
+    ap.add_argument("--errors", type=float, default=0.02)
+    ap.add_argument("--out", help="also write the summary as JSON")
+    args = ap.parse_args()
+
+    common = ["--hours", str(args.hours), "--errors", str(args.errors)]
+    timing = run_sim(*common, "--clients", str(args.clients))
+    # A shorter traced run is plenty: the loop is periodic
+    alloc = run_sim("--hours", str(min(args.hours, 0.25)), "--errors", str(args.errors),
+                    "--clients", "0", "--alloc")
+    s = summarize(timing, alloc)
+    report(s)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(s, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Host stand-in for the MicroPython `dht` module
+import random
+
+# Scripting hooks, set by host/sim.py or a test:
+#   source(sensor) -> (temperature, humidity) replaces the random readings
+#   error_rate is the probability that measure() fails like a missed read
+source = None
+error_rate = 0.0
+reads = 0
+failures = 0
+
+
+class DHTBase:
+    def __init__(self, pin):
+        self.pin = pin
+        self._t = 0
+        self._h = 0
+
+    def measure(self):
+        global reads, failures
+        reads += 1
+        if error_rate and random.random() < error_rate:
+            failures += 1
+            # What the firmware raises when the sensor does not answer
+            raise OSError(110, "ETIMEDOUT")
+        if source is not None:
+            self._t, self._h = source(self)
+        else:
+            self._random()
+
+    def _random(self):
+        self._t = 22 + random.randint(-1, 1)
+        self._h = 45 + random.randint(-2, 2)
+
+    def temperature(self):
+        return self._t
+
+    def humidity(self):
+        return self._h
+
+
+class DHT11(DHTBase):
+    pass
+
+
+class DHT22(DHTBase):
+    def _random(self):
+        self._t = round(22 + random.uniform(-0.5, 0.5), 1)
+        self._h = round(45 + random.uniform(-1.0, 1.0), 1)
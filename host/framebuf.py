@@ -0,0 +1,98 @@
+# Host stand-in for the MicroPython `framebuf` module.
+# Only MONO_VLSB is implemented, which is what the SSD1306 driver uses.
+# Text renders as an 8x8 block pattern derived from the character code
+# rather than the real font; good enough to exercise drawing and diffing.
+# Like the C module, drawing never dispatches to a subclass's pixel().
+
+MONO_VLSB = 0
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format, stride=None):
+        self._buf = buffer
+        self._w = width
+        self._h = height
+
+    def fill(self, c):
+        v = 0xFF if c else 0
+        buf = self._buf
+        for i in range(len(buf)):
+            buf[i] = v
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self._w and 0 <= y < self._h):
+            return None if c is None else 0
+        i = (y >> 3) * self._w + x
+        m = 1 << (y & 7)
+        if c is None:
+            return 1 if self._buf[i] & m else 0
+        if c:
+            self._buf[i] |= m
+        else:
+            self._buf[i] &= ~m & 0xFF
+
+    def hline(self, x, y, w, c):
+        for i in range(w):
+            FrameBuffer.pixel(self, x + i, y, c)
+
+    def vline(self, x, y, h, c):
+        for i in range(h):
+            FrameBuffer.pixel(self, x, y + i, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx = abs(x2 - x1)
+        dy = -abs(y2 - y1)
+        sx = 1 if x1 < x2 else -1
+        sy = 1 if y1 < y2 else -1
+        err = dx + dy
+        while True:
+            FrameBuffer.pixel(self, x1, y1, c)
+            if x1 == x2 and y1 == y2:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def fill_rect(self, x, y, w, h, c):
+        for j in range(h):
+            self.hline(x, y + j, w, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def text(self, s, x, y, c=1):
+        for k, ch in enumerate(s):
+            if ch == " ":
+                continue
+            code = ord(ch)
+            for col in range(8):
+                bits = ((code * (col + 3)) ^ (code >> 1)) & 0x7E
+                for row in range(8):
+                    if bits & (1 << row):
+                        FrameBuffer.pixel(self, x + 8 * k + col, y + row, c)
+
+    def scroll(self, xstep, ystep):
+        w, h = self._w, self._h
+        old = [[FrameBuffer.pixel(self, x, y) for x in range(w)] for y in range(h)]
+        for y in range(h):
+            for x in range(w):
+                sx, sy = x - xstep, y - ystep
+                if 0 <= sx < w and 0 <= sy < h:
+                    FrameBuffer.pixel(self, x, y, old[sy][sx])
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for sy in range(fbuf._h):
+            for sx in range(fbuf._w):
+                c = FrameBuffer.pixel(fbuf, sx, sy)
+                if c != key:
+                    FrameBuffer.pixel(self, x + sx, y + sy, c)
@@ -0,0 +1,106 @@
+# Host stand-in for the MicroPython `machine` module (Pin, I2C, SPI, RTC,
+# lightsleep)
+import calendar
+import time
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+
+    def __init__(self, id, mode=-1, pull=None, value=None):
+        self.id = id
+        self.mode = mode
+        self._value = value or 0
+
+    def init(self, mode=-1, pull=None, value=None):
+        self.mode = mode
+        if value is not None:
+            self._value = value
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = 1 if v else 0
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def high(self):
+        self._value = 1
+
+    def low(self):
+        self._value = 0
+
+    on = high
+    off = low
+
+
+class I2C:
+    """Swallows writes but counts them, so the simulator can report bus traffic."""
+
+    def __init__(self, id, sda=None, scl=None, freq=400000):
+        self.id = id
+        self.freq = freq
+        self.transactions = 0  # start..stop sequences
+        self.bytes_written = 0  # payload bytes, excluding address bytes
+
+    def writeto(self, addr, buf, stop=True):
+        self.transactions += 1
+        self.bytes_written += len(buf)
+        return len(buf)
+
+    def writevto(self, addr, vector, stop=True):
+        n = sum(len(b) for b in vector)
+        self.transactions += 1
+        self.bytes_written += n
+        return n
+
+    def reset_counters(self):
+        self.transactions = 0
+        self.bytes_written = 0
+
+
+class SPI:
+    """Swallows writes but counts them, like I2C above."""
+
+    def __init__(self, id, baudrate=1000000, polarity=0, phase=0, sck=None, mosi=None, miso=None):
+        self.id = id
+        self.inits = 0
+        self.transactions = 0  # write() calls
+        self.bytes_written = 0
+        self.init(baudrate=baudrate, polarity=polarity, phase=phase)
+
+    def init(self, baudrate=1000000, polarity=0, phase=0, **kw):
+        self.baudrate = baudrate
+        self.inits += 1
+
+    def write(self, buf):
+        self.transactions += 1
+        self.bytes_written += len(buf)
+
+    def reset_counters(self):
+        self.inits = 0
+        self.transactions = 0
+        self.bytes_written = 0
+
+
+class RTC:
+    """Starts at the host's wall time; setting it offsets time.time(), which
+    host/run.py routes through `offset`."""
+
+    offset = 0
+
+    def datetime(self, dt=None):
+        if dt is None:
+            tm = time.gmtime(time.time())
+            return (tm[0], tm[1], tm[2], tm[6], tm[3], tm[4], tm[5], 0)
+        y, mo, d, _wd, h, mi, s, _sub = dt
+        RTC.offset += calendar.timegm((y, mo, d, h, mi, s)) - int(time.time())
+
+
+def lightsleep(time_ms=None):
+    """Blocks like the real one: nothing else runs until it returns (under
+    host/sim.py the virtual clock just moves on)."""
+    time.sleep((time_ms or 0) / 1000)
@@ -0,0 +1,9 @@
+# Host stand-in for the MicroPython `micropython` module
+
+
+def const(x):
+    return x
+
+
+def native(f):
+    return f
@@ -0,0 +1,63 @@
+# Host stand-in for the MicroPython `network` module
+import time
+
+STA_IF = 0
+AP_IF = 1
+
+# WLAN.status() codes, as on the Pico W
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+# Scripting hooks: set link_up to False to simulate the access point going
+# away; connect_ms is how long a join takes (it finishes in the background,
+# as on the device)
+link_up = True
+connect_ms = 2000
+
+
+class WLAN:
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self._active = False
+        self._status = STAT_IDLE
+        self._since = 0
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        if not self._active:
+            self._status = STAT_IDLE
+
+    def connect(self, ssid=None, password=None):
+        if not self._active:
+            raise OSError("WLAN not active")
+        self._status = STAT_CONNECTING
+        self._since = time.ticks_ms()
+
+    def disconnect(self):
+        self._status = STAT_IDLE
+
+    def _update(self):
+        if self._status == STAT_CONNECTING:
+            if time.ticks_diff(time.ticks_ms(), self._since) >= connect_ms:
+                self._status = STAT_GOT_IP if link_up else STAT_NO_AP_FOUND
+        elif self._status == STAT_GOT_IP and not link_up:
+            self._status = STAT_IDLE
+
+    def isconnected(self):
+        self._update()
+        return self._status == STAT_GOT_IP
+
+    def ifconfig(self):
+        return ("127.0.0.1", "255.0.0.0", "127.0.0.1", "127.0.0.1")
+
+    def status(self, param=None):
+        if param == "rssi":
+            return -50
+        self._update()
+        return self._status
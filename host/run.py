@@ -0,0 +1,115 @@
+"""Run main.py under CPython asyncio with the hardware modules stubbed out.
+
+    python host/run.py [--port 8080] [--wifi]
+
+The stand-ins for machine, dht, network, framebuf and micropython live next
+to this file. MicroPython-only helpers in `time` and `gc` are filled in from
+their CPython equivalents.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+HEAP_SIZE = 192 * 1024  # notional MicroPython heap on a Pico W
+
+_now_ns = time.monotonic_ns  # replaced by a virtual clock under host/sim.py
+_T0 = _now_ns()
+_WALL0 = time.time()  # wall time at _T0
+_real_time = time.time
+_TICKS_PERIOD = 1 << 30
+
+
+def _ticks_ms():
+    return ((_now_ns() - _T0) // 1000000) & (_TICKS_PERIOD - 1)
+
+
+def _ticks_us():
+    return ((_now_ns() - _T0) // 1000) & (_TICKS_PERIOD - 1)
+
+
+def _time():
+    # Follows the (possibly virtual) clock; machine.RTC().datetime() offsets it
+    return _WALL0 + (_now_ns() - _T0) / 1e9 + _rtc.offset
+
+
+def _ticks_add(ticks, delta):
+    return (ticks + delta) & (_TICKS_PERIOD - 1)
+
+
+def _ticks_diff(a, b):
+    half = _TICKS_PERIOD // 2
+    return ((a - b + half) & (_TICKS_PERIOD - 1)) - half
+
+
+def _mem_alloc():
+    # With tracemalloc running (host/sim.py --alloc) report traced bytes
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return 0
+
+
+def install(clock=None):
+    """Make the stubs importable and patch MicroPython-only helpers in.
+
+    With a clock (see host/sim.py), ticks and blocking sleeps follow its
+    virtual time instead of the wall clock.
+    """
+    global _now_ns, _T0, _WALL0
+    for p in (ROOT, os.path.join(ROOT, "lib"), HERE):
+        if p not in sys.path:
+            sys.path.insert(0, p)
+    if clock is not None:
+        _now_ns = clock.now_ns
+        _T0 = _now_ns()
+        _WALL0 = _real_time()
+        time.sleep = clock.sleep
+    global _rtc
+    import machine
+
+    _rtc = machine.RTC
+    time.time = _time
+    time.ticks_ms = _ticks_ms
+    time.ticks_us = _ticks_us
+    time.ticks_add = _ticks_add
+    time.ticks_diff = _ticks_diff
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+    time.sleep_us = lambda us: time.sleep(us / 1000000)
+    # No fixed heap on the host; report a notional 192 KB one
+    gc.mem_alloc = _mem_alloc
+    gc.mem_free = lambda: max(0, HEAP_SIZE - _mem_alloc())
+
+
+def load_main(port=8080, wifi=False, clock=None):
+    """Import main.py as a module and point it at a host-friendly port."""
+    install(clock)
+    # main.py opens www/ relative to the filesystem root, i.e. the repo root here
+    os.chdir(ROOT)
+    if wifi:
+        import types
+
+        sys.modules["secrets"] = types.SimpleNamespace(
+            WIFI_SSID="host", WIFI_PASSWORD="host"
+        )
+    import main
+
+    main.HTTP_PORT = port
+    return main
+
+
+def _parse_args(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--wifi", action="store_true", help="pretend secrets.py exists")
+    return ap.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    m = load_main(args.port, args.wifi)
+    asyncio.run(m.main())
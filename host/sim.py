@@ -0,0 +1,623 @@
+"""Run main.py on a virtual clock, so hours of device time pass in seconds.
+
+    python host/sim.py [--hours 1] [--clients 2] [--poll 2] [--streams 0]
+                       [--errors 0.02] [--outage MIN:MIN] [--alloc]
+                       [--low-power] [--json]
+
+The hardware stand-ins from host/ are driven by a scenario: the DHT follows
+a slow daily curve and fails a fraction of reads, Wi-Fi can drop for a
+window of minutes, HTTP clients poll the real server over loopback
+sockets and /stream subscribers hold connections open. The event loop
+jumps its clock to the next timer whenever nothing is ready, so sleeping
+costs nothing.
+
+Reported per simulated run:
+- busy time per task (every step of a task is timed, so HTTP handlers,
+  clients and the device loop are kept apart),
+- I2C transactions and bytes per displayed frame,
+- serial output and flash writes,
+- HTTP latency percentiles (wall clock, measured by the in-loop clients),
+- events and bytes received by /stream subscribers,
+- time in machine.lightsleep and awake seconds per hour (with --low-power,
+  which turns on ADAPTIVE_SAMPLING and LIGHTSLEEP; use --clients 0, as an
+  open connection keeps the board awake),
+- with --alloc, bytes allocated per task step, estimated with tracemalloc
+  and a line tracer (slow, so busy times from that run are not comparable).
+  The idle_reference row is an empty task on the same deadline scaffold:
+  what asyncio itself costs per step.
+"""
+import argparse
+import asyncio
+import asyncio.events
+import json
+import math
+import os
+import random
+import selectors
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+import run  # noqa: E402
+
+
+class VirtualClock:
+    """Monotonic nanosecond clock that only moves when told to."""
+
+    def __init__(self):
+        self.ns = 0
+
+    def now_ns(self):
+        return self.ns
+
+    def time(self):
+        return self.ns / 1e9
+
+    def advance(self, seconds):
+        if seconds > 0:
+            self.ns += int(math.ceil(seconds * 1e9))
+
+    # Blocking sleeps (time.sleep) just move time on
+    sleep = advance
+
+
+class _IdleSelector:
+    """Selector wrapper: polls sockets without blocking and, when nothing is
+    ready, advances the clock to the loop's next timer instead of waiting.
+    """
+
+    def __init__(self, selector, clock, sim):
+        self._sel = selector
+        self._clock = clock
+        self._sim = sim
+
+    def select(self, timeout=None):
+        events = self._sel.select(0)
+        if events or timeout == 0:
+            return events
+        if self._sim.inflight:
+            # A client is waiting on the server; give loopback I/O real time
+            events = self._sel.select(0.05)
+            if events:
+                return events
+        if timeout is None:
+            return self._sel.select(None)
+        self._clock.advance(timeout)
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self._sel, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock, sim):
+        super().__init__(selectors.DefaultSelector())
+        self._vclock = clock
+        self._selector = _IdleSelector(self._selector, clock, sim)
+
+    def time(self):
+        return self._vclock.time()
+
+
+class TaskStats:
+    __slots__ = ("steps", "busy", "worst", "alloc", "alloc_worst")
+
+    def __init__(self):
+        self.steps = 0
+        self.busy = 0.0
+        self.worst = 0.0
+        self.alloc = 0
+        self.alloc_worst = 0
+
+
+class _AllocMeter:
+    """Approximates cumulative bytes allocated, which CPython does not count.
+
+    tracemalloc only reports live and peak memory, and refcounting frees
+    temporaries at once, so the peak is re-armed on every line executed in
+    main.py and lib/ and each interval's rise above its starting point is
+    added up. Temporaries that live and die inside one line are merged
+    into that line's high-water mark, so this errs low, never high. The
+    tracer's own cost per line is measured at start and taken off.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.overhead = 0
+        self._start = 0
+        self._depth = 0  # inside a host stand-in
+        self._files = (os.path.join(run.ROOT, "main.py"), os.path.join(run.ROOT, "lib"))
+
+    def mark(self):
+        cur, peak = tracemalloc.get_traced_memory()
+        rise = peak - self._start - self.overhead
+        if rise > 0:
+            self.total += rise
+        tracemalloc.reset_peak()
+        self._start = cur
+
+    def _line(self, frame, event, arg):
+        if event == "line":
+            self.mark()
+        return self._line
+
+    def _call(self, frame, event, arg):
+        name = frame.f_code.co_filename
+        if name.startswith(self._files):
+            return self._line
+        if name.startswith(HERE) and self._depth == 0:
+            # Stand-ins for C modules (framebuf above all) allocate where the
+            # firmware would not; leave their work out
+            self.mark()
+            self._depth = 1
+            return self._leave_host
+        return None
+
+    def _leave_host(self, frame, event, arg):
+        if event == "return":
+            tracemalloc.reset_peak()
+            self._start = tracemalloc.get_traced_memory()[0]
+            self._depth = 0
+        return None
+
+    @staticmethod
+    def _calibrate_body():
+        a = 1
+        a = 2
+        a = 3
+        a = 4
+        a = 5
+        a = 6
+        a = 7
+        return a
+
+    def _calibrate(self):
+        # Eight line events that allocate nothing themselves
+        code = self._calibrate_body.__code__
+        tracer = lambda frame, event, arg: self._line if frame.f_code is code else None
+        self.mark()
+        before = self.total
+        sys.settrace(tracer)
+        for _ in range(100):
+            self._calibrate_body()
+        sys.settrace(None)
+        self.mark()
+        self.overhead = (self.total - before) // 800
+        self.total = before
+
+    def start(self):
+        tracemalloc.start()
+        self._start = tracemalloc.get_traced_memory()[0]
+        self._calibrate()
+        sys.settrace(self._call)
+
+    def stop(self):
+        sys.settrace(None)
+        tracemalloc.stop()
+
+
+def _task_name(callback):
+    task = getattr(callback, "__self__", None)
+    if isinstance(task, asyncio.Task):
+        coro = task.get_coro()
+        name = getattr(coro, "__qualname__", None)
+        return name.rsplit(".", 1)[-1] if name else task.get_name()
+    return None
+
+
+class Simulation:
+    """Loads main.py against the host stand-ins and runs it on a VirtualClock."""
+
+    def __init__(self, hours=1.0, clients=2, poll=2.0, errors=0.02,
+                 outage=None, alloc=False, seed=1, streams=0, low_power=False):
+        self.seconds = hours * 3600
+        self.clients = clients
+        self.poll = poll
+        self.streams = streams
+        self.errors = errors
+        self.outage = outage  # (start minute, end minute) without Wi-Fi
+        self.low_power = low_power  # adaptive sampling and lightsleep
+        self.alloc = alloc
+        self.meter = _AllocMeter() if alloc else None
+        self.seed = seed
+        self.clock = VirtualClock()
+        self.inflight = 0
+        self.tasks = {}
+        self.latencies = []
+        self.http_errors = 0
+        self.http_bytes = 0
+        self.serial_bytes = 0
+        self.serial_lines = 0
+        self.stream_events = 0
+        self.stream_pings = 0
+        self.stream_bytes = 0
+        self.stream_errors = 0
+        self.stream_refused = 0  # turned away at the subscriber limit
+
+    # ---- scenario ----
+
+    def _reading(self, sensor):
+        # One slow cycle per simulated day plus read noise, in whole units
+        # like a DHT11
+        day = self.clock.time() / 86400.0
+        t = 24 + 4 * math.sin(2 * math.pi * day) + random.uniform(-0.6, 0.6)
+        h = 50 - 10 * math.sin(2 * math.pi * day) + random.uniform(-1.5, 1.5)
+        return int(round(t)), int(round(h))
+
+    async def _wifi_script(self, network):
+        start, end = self.outage
+        await asyncio.sleep(start * 60)
+        network.link_up = False
+        await asyncio.sleep((end - start) * 60)
+        network.link_up = True
+
+    async def _client(self, port, idx):
+        paths = (b"/data?span=60", b"/data.bin?span=60", b"/text", b"/info")
+        await asyncio.sleep(15 + idx * 0.37)  # once Wi-Fi is up
+        reader = writer = None
+        i = idx
+        while True:
+            path = paths[i % len(paths)]
+            i += 1
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                self.inflight += 1
+                t0 = time.perf_counter()
+                try:
+                    writer.write(b"GET " + path + b" HTTP/1.1\r\nHost: sim\r\n\r\n")
+                    status, length, close = await self._read_response(reader)
+                finally:
+                    self.inflight -= 1
+                if status == 200:
+                    self.latencies.append(time.perf_counter() - t0)
+                    self.http_bytes += length
+                else:
+                    self.http_errors += 1
+                if close:
+                    writer.close()
+                    writer = None
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                self.http_errors += 1
+                if writer is not None:
+                    writer.close()
+                writer = None
+            try:
+                await asyncio.sleep(self.poll)
+            except asyncio.CancelledError:
+                if writer is not None:
+                    writer.close()
+                raise
+
+    async def _subscriber(self, port, idx):
+        await asyncio.sleep(15 + idx * 0.41)
+        writer = None
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /stream HTTP/1.1\r\nHost: sim\r\n\r\n")
+            head = await reader.readuntil(b"\r\n\r\n")
+            if b" 200 " not in head.split(b"\r\n", 1)[0]:
+                self.stream_refused += 1
+                return
+            while True:
+                event = await reader.readuntil(b"\n\n")
+                self.stream_bytes += len(event)
+                if event.startswith(b":"):
+                    self.stream_pings += 1
+                elif b"event: minute" in event:
+                    self.stream_events += 1
+        except (OSError, asyncio.IncompleteReadError):
+            self.stream_errors += 1
+        finally:
+            if writer is not None:
+                writer.close()
+
+    @staticmethod
+    async def _read_response(reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode().split("\r\n")
+        status = int(lines[0].split()[1])
+        length = 0
+        close = False
+        for line in lines[1:]:
+            k, _, v = line.partition(":")
+            k = k.strip().lower()
+            if k == "content-length":
+                length = int(v)
+            elif k == "connection":
+                close = v.strip().lower() == "close"
+        if length:
+            await reader.readexactly(length)
+        return status, length, close
+
+    @staticmethod
+    async def idle_reference(m):
+        # Same deadline/sleep scaffold as the device tasks with no work in
+        # between: its row is the floor that asyncio itself costs per step
+        deadline = m.ticks_ms()
+        while True:
+            deadline = m._next_deadline(deadline, m.SAMPLE_PERIOD_MS)
+            await m._sleep_until(deadline)
+
+    # ---- instrumentation ----
+
+    def _instrument(self):
+        sim = self
+        handle_run = asyncio.events.Handle._run
+        perf = time.perf_counter
+        meter = self.meter
+
+        def timed_run(handle):
+            name = _task_name(handle._callback)
+            if name is None:
+                return handle_run(handle)
+            if meter:
+                meter.mark()
+                before = meter.total
+            t0 = perf()
+            try:
+                return handle_run(handle)
+            finally:
+                dt = perf() - t0
+                st = sim.tasks.get(name)
+                if st is None:
+                    st = sim.tasks[name] = TaskStats()
+                st.steps += 1
+                st.busy += dt
+                if dt > st.worst:
+                    st.worst = dt
+                if meter:
+                    meter.mark()
+                    grew = meter.total - before
+                    st.alloc += grew
+                    if grew > st.alloc_worst:
+                        st.alloc_worst = grew
+
+        asyncio.events.Handle._run = timed_run
+        return handle_run
+
+    def _write_serial(self, s):
+        self.serial_bytes += len(s)
+        self.serial_lines += s.count("\n")
+        return len(s)
+
+    # ---- run ----
+
+    def run(self):
+        random.seed(self.seed)
+        port = _free_port()
+        m = run.load_main(port, wifi=True, clock=self.clock)
+        import dht
+        import network
+
+        dht.source = self._reading
+        dht.error_rate = self.errors
+        logdir = tempfile.TemporaryDirectory()
+        m.LOG_DIR = os.path.join(logdir.name, "log")
+        if self.low_power:
+            # The channels exist by now, so set their limit as main.py would have
+            m.ADAPTIVE_SAMPLING = m.LIGHTSLEEP = True
+            for ch in m.channels:
+                ch.max_interval = m.ADAPTIVE_MAX_MS
+
+        loop = VirtualTimeLoop(self.clock, self)
+        asyncio.set_event_loop(loop)
+        stdout = sys.stdout
+        sys.stdout = _Serial(self._write_serial)
+        original = self._instrument()
+        if self.meter:
+            self.meter.start()
+        wall0 = time.perf_counter()
+        try:
+            loop.run_until_complete(self._drive(m, port, network))
+        finally:
+            wall = time.perf_counter() - wall0
+            if self.meter:
+                self.meter.stop()
+            asyncio.events.Handle._run = original
+            sys.stdout = stdout
+            loop.close()
+            logdir.cleanup()
+        return self._report(m, wall)
+
+    async def _drive(self, m, port, network):
+        helpers = [asyncio.create_task(self._client(port, i)) for i in range(self.clients)]
+        helpers += [asyncio.create_task(self._subscriber(port, i)) for i in range(self.streams)]
+        helpers.append(asyncio.create_task(self.idle_reference(m)))
+        if self.outage:
+            helpers.append(asyncio.create_task(self._wifi_script(network)))
+        node = asyncio.create_task(m.main())
+        await asyncio.sleep(self.seconds)
+        for t in helpers + [node]:
+            t.cancel()
+        await asyncio.gather(*helpers, node, return_exceptions=True)
+        if m.server:
+            m.server.close()
+        # Let connection handlers see their clients' EOF and finish; stream
+        # handlers notice when a keep-alive write fails, which takes two
+        await asyncio.sleep(max(m.HTTP_IDLE_TIMEOUT, 2 * m.STREAM_KEEPALIVE_S) + 1)
+
+    def _report(self, m, wall):
+        import dht
+
+        idle = self.tasks.get("idle_reference")
+        floor = idle.alloc / idle.steps if self.alloc and idle and idle.steps else 0
+        tasks = {}
+        for name, st in sorted(self.tasks.items()):
+            row = {
+                "steps": st.steps,
+                "busy_ms": round(st.busy * 1e3, 1),
+                "us_per_step": round(st.busy * 1e6 / st.steps, 1) if st.steps else 0,
+                "worst_us": round(st.worst * 1e6),
+            }
+            if self.alloc:
+                per = st.alloc / st.steps if st.steps else 0
+                row["alloc_bytes_per_step"] = round(per, 1)
+                row["alloc_over_floor"] = round(max(0, per - floor), 1)
+                row["alloc_worst_bytes"] = st.alloc_worst
+            tasks[name] = row
+        display = self.tasks.get("display_task")
+        frames = display.steps if display else 0
+        lat = sorted(self.latencies)
+        return {
+            "simulated_s": self.seconds,
+            "wall_s": round(wall, 2),
+            "speedup": round(self.seconds / wall) if wall else 0,
+            "ticks": int(self.seconds * 1000 // m.SAMPLE_PERIOD_MS),
+            "minutes_stored": m.readings_count,
+            "sensor_reads": dht.reads,
+            "sensor_failures": dht.failures,
+            "sensor_missed": sum(ch.missed for ch in m.channels),
+            "first_sample_ms": getattr(m, "first_sample_ms", None),
+            "power": {
+                "lightsleep_s": round(getattr(m, "slept_ms", 0) / 1000, 1),
+                "naps": getattr(m, "naps", 0),
+                "awake_s_per_hour": m.awake_s_per_hour() if hasattr(m, "awake_s_per_hour") else None,
+                "speedups": sum(getattr(ch, "speedups", 0) for ch in m.channels),
+            },
+            "wifi": {
+                "connects": getattr(m, "wifi_connects", 0),
+                "failures": getattr(m, "wifi_failures", 0),
+                "drops": getattr(m, "wifi_drops", 0),
+            },
+            "tasks": tasks,
+            "i2c": {
+                "transactions": m.i2c.transactions,
+                "bytes": m.i2c.bytes_written,
+                "frames": frames,
+                "bytes_per_frame": round(m.i2c.bytes_written / frames, 1) if frames else 0,
+            },
+            "serial": {
+                "bytes": self.serial_bytes,
+                "bytes_per_s": round(self.serial_bytes / self.seconds, 1),
+                "lines": self.serial_lines,
+            },
+            "flash_writes": m.flash_writes(),
+            "http": {
+                "requests": len(lat),
+                "errors": self.http_errors,
+                "bytes": self.http_bytes,
+                "p50_ms": _ms(_percentile(lat, 50)),
+                "p90_ms": _ms(_percentile(lat, 90)),
+                "p99_ms": _ms(_percentile(lat, 99)),
+                "max_ms": _ms(lat[-1] if lat else None),
+            },
+            "stream": {
+                "subscribers": self.streams,
+                "events": self.stream_events,
+                "pings": self.stream_pings,
+                "bytes": self.stream_bytes,
+                "refused": self.stream_refused,
+                "errors": self.stream_errors,
+            },
+        }
+
+
+class _Serial:
+    """Counts what main.py prints instead of writing it out."""
+
+    def __init__(self, write):
+        self.write = write
+
+    def flush(self):
+        pass
+
+
+def _free_port():
+    import socket
+
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def _percentile(sorted_vals, p):
+    if not sorted_vals:
+        return None
+    k = min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+
+def _ms(v):
+    return None if v is None else round(v * 1e3, 2)
+
+
+def format_report(r):
+    lines = [
+        "simulated {:.0f} s in {:.2f} s wall ({}x)".format(r["simulated_s"], r["wall_s"], r["speedup"]),
+        "minutes stored {}  sensor reads {} ({} failed, {} slots missed)  first sample at {} ms".format(
+            r["minutes_stored"], r["sensor_reads"], r["sensor_failures"], r["sensor_missed"],
+            r["first_sample_ms"]),
+        "wifi: {connects} connects, {failures} failed, {drops} drops".format(**r["wifi"]),
+        "power: {lightsleep_s} s in {naps} lightsleeps, awake {awake_s_per_hour} s/h, "
+        "{speedups} interval cuts".format(**r["power"]),
+        "",
+        "{:<26} {:>8} {:>10} {:>10} {:>10}".format("task", "steps", "busy ms", "us/step", "worst us"),
+    ]
+    has_alloc = any("alloc_bytes_per_step" in t for t in r["tasks"].values())
+    if has_alloc:
+        lines[-1] += " {:>10} {:>10} {:>10}".format("B/step", "over idle", "worst B")
+    for name, t in r["tasks"].items():
+        line = "{:<26} {:>8} {:>10} {:>10} {:>10}".format(
+            name, t["steps"], t["busy_ms"], t["us_per_step"], t["worst_us"])
+        if has_alloc:
+            line += " {:>10} {:>10} {:>10}".format(
+                t["alloc_bytes_per_step"], t["alloc_over_floor"], t["alloc_worst_bytes"])
+        lines.append(line)
+    i2c = r["i2c"]
+    lines += [
+        "",
+        "i2c: {} bytes in {} transactions over {} frames ({} B/frame)".format(
+            i2c["bytes"], i2c["transactions"], i2c["frames"], i2c["bytes_per_frame"]),
+        "serial: {} bytes, {} lines ({} B/s)".format(
+            r["serial"]["bytes"], r["serial"]["lines"], r["serial"]["bytes_per_s"]),
+        "flash writes: {}".format(r["flash_writes"]),
+    ]
+    h = r["http"]
+    if h["requests"] or h["errors"]:
+        lines.append("http: {} ok, {} errors, p50 {} ms p90 {} ms p99 {} ms max {} ms".format(
+            h["requests"], h["errors"], h["p50_ms"], h["p90_ms"], h["p99_ms"], h["max_ms"]))
+    st = r["stream"]
+    if st["subscribers"]:
+        lines.append("stream: {} subscribers got {} events and {} pings ({} bytes), "
+                     "{} refused, {} errors".format(
+                         st["subscribers"], st["events"], st["pings"], st["bytes"],
+                         st["refused"], st["errors"]))
+    return "\n".join(lines)
+
+
+def _outage(s):
+    a, _, b = s.partition(":")
+    return float(a), float(b)
+
+
+def _parse_args(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--hours", type=float, default=1.0, help="simulated time to run")
+    ap.add_argument("--clients", type=int, default=2, help="keep-alive HTTP pollers")
+    ap.add_argument("--poll", type=float, default=2.0, help="simulated seconds between polls")
+    ap.add_argument("--streams", type=int, default=0, help="/stream subscribers")
+    ap.add_argument("--errors", type=float, default=0.02, help="fraction of sensor reads that fail")
+    ap.add_argument("--outage", type=_outage, default=None, metavar="MIN:MIN",
+                    help="drop Wi-Fi between these simulated minutes")
+    ap.add_argument("--alloc", action="store_true", help="trace allocations per task step")
+    ap.add_argument("--low-power", action="store_true",
+                    help="turn on ADAPTIVE_SAMPLING and LIGHTSLEEP")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    return ap.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    report = Simulation(args.hours, args.clients, args.poll, args.errors,
+                        args.outage, args.alloc, args.seed, args.streams,
+                        args.low_power).run()
+    print(json.dumps(report) if args.json else format_report(report))
@@ -0,0 +1,65 @@
+# Series derived from temperature and relative humidity, computed on demand
+
+from math import exp, log
+from ringseries import RingSeries
+
+
+def dew_point(t, rh):
+    """Dew point (°C) from temperature (°C) and RH (%), Magnus formula."""
+    if rh < 0.1:
+        rh = 0.1  # log(0); a dry reading is noise anyway
+    g = log(rh / 100) + 17.62 * t / (243.12 + t)
+    return 243.12 * g / (17.62 - g)
+
+
+def absolute_humidity(t, rh):
+    """Water vapour per volume of air (g/m³)."""
+    return 6.112 * exp(17.67 * t / (t + 243.5)) * rh * 2.1674 / (273.15 + t)
+
+
+def heat_index(t, rh):
+    """Apparent temperature (°C): NOAA's simple formula, and the Rothfusz
+    regression once that reaches 80 °F."""
+    f = t * 1.8 + 32
+    hi = 0.5 * (f + 61 + (f - 68) * 1.2 + rh * 0.094)
+    if (hi + f) / 2 >= 80:
+        hi = (-42.379 + 2.04901523 * f + 10.14333127 * rh - 0.22475541 * f * rh
+              - 0.00683783 * f * f - 0.05481717 * rh * rh + 0.00122874 * f * f * rh
+              + 0.00085282 * f * rh * rh - 0.00000199 * f * f * rh * rh)
+    return (hi - 32) / 1.8
+
+
+class DerivedSeries(RingSeries):
+    """fn(temperature, RH) over a pair of source series, as a RingSeries of
+    the same size that fills itself when read.
+
+    Each entry is computed once and kept. last() first runs sync(), which
+    converts only what the sources gained since the previous call (at most
+    `size` entries), so a client polling every minute costs one evaluation
+    per new point. Memory is one int16 ring, like a source's.
+    """
+
+    def __init__(self, fn, t_series, h_series):
+        super().__init__(t_series.size, t_series.scale)
+        self.fn = fn
+        self.t_series = t_series
+        self.h_series = h_series
+
+    def sync(self):
+        t_series = self.t_series
+        pending = t_series.count - self.count
+        if pending > 0:
+            k = pending if pending < self.size else self.size
+            # Entries that left the sources before ever being read are skipped
+            self.count += pending - k
+            scale = self.scale
+            fn = self.fn
+            for off in range(k, 0, -1):
+                t = t_series.raw_at(off) / scale
+                h = self.h_series.raw_at(off) / scale
+                self.append_raw(int(round(fn(t, h) * scale)))
+        self.seq = t_series.seq
+
+    def last(self, n):
+        self.sync()
+        return super().last(n)
@@ -0,0 +1,154 @@
+# Append-only segment log of minute aggregates on the flash filesystem
+
+import os
+import struct
+from array import array
+
+# Record: seq (u32), Unix time (u32), mean/min/max for temp and hum as
+# int16 tenths (t, h, tmin, tmax, hmin, hmax), sample count (u16), then a
+# CRC-16/CCITT (u16) over the preceding 22 bytes. Little-endian, 24 bytes.
+REC_FMT = '<IIhhhhhhH'
+REC_PAYLOAD = struct.calcsize(REC_FMT)
+REC_SIZE = REC_PAYLOAD + 2
+
+
+def _crc_table():
+    table = array('H', bytes(512))
+    for i in range(256):
+        c = i << 8
+        for _ in range(8):
+            c = ((c << 1) ^ 0x1021) if c & 0x8000 else (c << 1)
+        table[i] = c & 0xFFFF
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def crc16(buf, start, end):
+    """CRC-16/CCITT-FALSE of buf[start:end]."""
+    crc = 0xFFFF
+    table = _CRC_TABLE
+    for i in range(start, end):
+        crc = ((crc << 8) & 0xFFFF) ^ table[((crc >> 8) ^ buf[i]) & 0xFF]
+    return crc
+
+
+class FlashLog:
+    """Minute records appended to fixed-size segment files in `path`.
+
+    Records are buffered in RAM and written `batch` at a time, so the flash
+    sees one append per batch rather than one per minute. When a segment
+    holds `segment_records` records the log moves on to a new file and the
+    oldest files beyond `max_segments` are deleted, spreading writes over
+    fresh blocks instead of rewriting one file.
+    """
+
+    def __init__(self, path, segment_records=720, max_segments=4, batch=10):
+        self.path = path
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self.batch = batch
+        self._buf = bytearray(REC_SIZE * batch)
+        self._pending = 0
+        self.writes = 0  # flash appends issued
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass  # already exists
+        self.segments = self._list_segments()
+        self._seg_id = self.segments[-1] if self.segments else 0
+        self._seg_count = 0
+        if self.segments:
+            size = os.stat(self._seg_path(self._seg_id))[6]
+            if size % REC_SIZE or size >= REC_SIZE * segment_records:
+                # Torn tail or full: keep records aligned by starting afresh
+                self._next_segment()
+            else:
+                self._seg_count = size // REC_SIZE
+        else:
+            self.segments.append(self._seg_id)
+
+    def _seg_path(self, seg_id):
+        return "{}/seg{:08d}.bin".format(self.path, seg_id)
+
+    def _list_segments(self):
+        ids = []
+        for name in os.listdir(self.path):
+            if name.startswith("seg") and name.endswith(".bin"):
+                try:
+                    ids.append(int(name[3:-4]))
+                except ValueError:
+                    pass
+        ids.sort()
+        return ids
+
+    def _next_segment(self):
+        self._seg_id += 1
+        self._seg_count = 0
+        self.segments.append(self._seg_id)
+        while len(self.segments) > self.max_segments:
+            old = self.segments.pop(0)
+            try:
+                os.remove(self._seg_path(old))
+            except OSError:
+                pass
+
+    def append(self, seq, ts, t, h, tmin, tmax, hmin, hmax, n):
+        """Queue one minute record; flushes when a batch is full."""
+        off = self._pending * REC_SIZE
+        struct.pack_into(REC_FMT, self._buf, off, seq, ts, t, h, tmin, tmax, hmin, hmax, n)
+        struct.pack_into('<H', self._buf, off + REC_PAYLOAD,
+                         crc16(self._buf, off, off + REC_PAYLOAD))
+        self._pending += 1
+        if self._pending >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """Write queued records, splitting across a segment boundary if needed."""
+        mv = memoryview(self._buf)
+        done = 0
+        while done < self._pending:
+            room = self.segment_records - self._seg_count
+            if room <= 0:
+                self._next_segment()
+                continue
+            k = self._pending - done
+            if k > room:
+                k = room
+            with open(self._seg_path(self._seg_id), "ab") as f:
+                f.write(mv[done * REC_SIZE:(done + k) * REC_SIZE])
+            self.writes += 1
+            self._seg_count += k
+            done += k
+        self._pending = 0
+
+    def replay(self, fn, chunk_records=64):
+        """Call fn(seq, ts, t, h, tmin, tmax, hmin, hmax, n) for every valid record,
+        oldest first, reading each segment sequentially. Records with a bad
+        checksum or a non-increasing seq are skipped. Returns the count.
+        """
+        buf = bytearray(REC_SIZE * chunk_records)
+        count = 0
+        last_seq = 0  # seq starts at 1; also rejects zero-filled records
+        for seg_id in self.segments:
+            try:
+                f = open(self._seg_path(seg_id), "rb")
+            except OSError:
+                continue
+            with f:
+                while True:
+                    got = f.readinto(buf)
+                    if not got:
+                        break
+                    for off in range(0, got - REC_SIZE + 1, REC_SIZE):
+                        crc = struct.unpack_from('<H', buf, off + REC_PAYLOAD)[0]
+                        if crc != crc16(buf, off, off + REC_PAYLOAD):
+                            continue
+                        rec = struct.unpack_from(REC_FMT, buf, off)
+                        if rec[0] <= last_seq:
+                            continue
+                        last_seq = rec[0]
+                        fn(*rec)
+                        count += 1
+        return count
@@ -0,0 +1,280 @@
+# HTTP/1.1 request heads read into a reusable buffer and parsed in place
+
+import micropython
+
+
+if hasattr(bytearray, "find"):
+    def _find(buf, c, i, end):
+        return buf.find(c, i, end)
+else:
+    @micropython.native
+    def _find(buf, c, i, end):
+        # MicroPython's bytearray has no find()
+        while i < end:
+            if buf[i] == c:
+                return i
+            i += 1
+        return -1
+
+
+@micropython.native
+def _ieq(buf, i, end, lower):
+    """buf[i:end] equals the lowercase ASCII bytes `lower`, ignoring case."""
+    if end - i != len(lower):
+        return False
+    for k in range(end - i):
+        b = buf[i + k]
+        if 65 <= b <= 90:
+            b += 32
+        if b != lower[k]:
+            return False
+    return True
+
+
+@micropython.native
+def _eq(buf, i, end, s):
+    if end - i != len(s):
+        return False
+    for k in range(end - i):
+        if buf[i + k] != s[k]:
+            return False
+    return True
+
+
+@micropython.native
+def _contains(buf, i, end, s):
+    n = len(s)
+    end -= n
+    while i <= end:
+        if _eq(buf, i, i + n, s):
+            return True
+        i += 1
+    return False
+
+
+@micropython.native
+def _uint(buf, i, end):
+    """Decimal digits buf[i:end] as an int, or -1 if empty or not digits."""
+    if i >= end:
+        return -1
+    v = 0
+    while i < end:
+        d = buf[i] - 48
+        if d < 0 or d > 9:
+            return -1
+        v = v * 10 + d
+        i += 1
+    return v
+
+
+class Request:
+    """The head of one request, read with readinto into a buffer that is
+    kept for the life of the connection (and then pooled).
+
+    Lines are parsed as they complete, so a head may arrive in any number
+    of reads and split anywhere. The request line and the headers the
+    server acts on are kept as offsets into the buffer; nothing is split,
+    decoded or copied. Bytes after the blank line (a pipelined request)
+    stay in the buffer for the next read().
+
+    After read() returns True:
+      post              the method is POST (a body is never read)
+      path, path_end    target up to '?'
+      query, query_end  the rest (empty if none)
+      keep_alive        HTTP/1.1 unless Connection: close, or Connection: keep-alive
+      etag, etag_end    If-None-Match value (etag == etag_end if absent)
+      gzip              Accept-Encoding lists gzip
+      range_lo, range_hi  a single Range: bytes=lo-hi, hi -1 when open;
+                        lo -1 for a suffix of hi bytes; both -1 if absent
+      bad               the request line could not be parsed
+    """
+
+    def __init__(self, size):
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.reset()
+
+    def reset(self):
+        """Forget everything held, for a new connection."""
+        self.n = 0  # bytes held
+        self.end = 0  # length of the head last returned, 0 once consumed
+        self._start()
+
+    def _start(self):
+        self.line = 0  # start of the first unparsed line
+        self.seen = False  # request line parsed
+        self.bad = False
+        self.post = False
+        self.path = self.path_end = 0
+        self.query = self.query_end = 0
+        self.keep_alive = False
+        self.etag = self.etag_end = 0
+        self.gzip = False
+        self.range_lo = self.range_hi = -1
+
+    async def read(self, reader):
+        """Read the next head; False once the peer closes. Raises ValueError
+        if the head does not fit the buffer."""
+        if self.end:
+            rest = self.n - self.end
+            if rest:
+                # Pipelined bytes move to the front (rare; copies once)
+                self.buf[:rest] = bytes(self.mv[self.end:self.n])
+            self.n = rest
+            self.end = 0
+            self._start()
+        while not self._parse():
+            if self.n == len(self.buf):
+                raise ValueError("request head too large")
+            readinto = getattr(reader, "readinto", None)
+            if readinto:
+                got = await readinto(self.mv[self.n:])
+            else:
+                # CPython's StreamReader has no readinto
+                data = await reader.read(len(self.buf) - self.n)
+                got = len(data)
+                self.mv[self.n:self.n + got] = data
+            if not got:
+                return False
+            self.n += got
+        return True
+
+    def _parse(self):
+        buf = self.buf
+        while True:
+            j = _find(buf, 10, self.line, self.n)
+            if j < 0:
+                return False
+            s = self.line
+            e = j - 1 if j > s and buf[j - 1] == 13 else j
+            self.line = j + 1
+            if not self.seen:
+                if e > s:  # blank lines before a request are ignored
+                    self._request_line(s, e)
+                    self.seen = True
+            elif e == s:
+                self.end = j + 1
+                return True
+            else:
+                self._header(s, e)
+
+    def _request_line(self, s, e):
+        buf = self.buf
+        sp = _find(buf, 32, s, e)
+        if sp < 0:
+            self.bad = True
+            return
+        self.post = _eq(buf, s, sp, b"POST")
+        t = sp + 1
+        sp = _find(buf, 32, t, e)
+        tend = e if sp < 0 else sp
+        if t >= tend:
+            self.bad = True
+            return
+        q = _find(buf, 63, t, tend)  # '?'
+        self.path = t
+        self.path_end = tend if q < 0 else q
+        self.query = tend if q < 0 else q + 1
+        self.query_end = tend
+        self.keep_alive = sp >= 0 and _eq(buf, sp + 1, e, b"HTTP/1.1")
+
+    def _header(self, s, e):
+        buf = self.buf
+        c = _find(buf, 58, s, e)  # ':'
+        if c < 0:
+            return
+        v = c + 1
+        while v < e and (buf[v] == 32 or buf[v] == 9):
+            v += 1
+        while e > v and (buf[e - 1] == 32 or buf[e - 1] == 9):
+            e -= 1
+        n = c - s
+        if n == 10 and _ieq(buf, s, c, b"connection"):
+            if _ieq(buf, v, e, b"close"):
+                self.keep_alive = False
+            elif _ieq(buf, v, e, b"keep-alive"):
+                self.keep_alive = True
+        elif n == 13 and _ieq(buf, s, c, b"if-none-match"):
+            self.etag = v
+            self.etag_end = e
+        elif n == 15 and _ieq(buf, s, c, b"accept-encoding"):
+            self.gzip = _contains(buf, v, e, b"gzip")
+        elif n == 5 and _ieq(buf, s, c, b"range"):
+            self._range(v, e)
+
+    def _range(self, v, e):
+        # Only "bytes=lo-hi", "bytes=lo-" and "bytes=-n"; other forms are
+        # ignored, which the spec allows
+        buf = self.buf
+        if e - v < 7 or not _ieq(buf, v, v + 6, b"bytes=") or _find(buf, 44, v, e) >= 0:
+            return
+        dash = _find(buf, 45, v + 6, e)
+        if dash < 0:
+            return
+        lo = _uint(buf, v + 6, dash)
+        hi = _uint(buf, dash + 1, e)
+        if lo < 0 and hi < 0 or 0 <= hi < lo:
+            return
+        if lo < 0 and dash != v + 6 or hi < 0 and dash + 1 != e:
+            return  # not digits
+        self.range_lo = lo
+        self.range_hi = hi
+
+    # ---- Lookups; names and values are bytes constants ----
+
+    def path_is(self, path):
+        return _eq(self.buf, self.path, self.path_end, path)
+
+    def etag_is(self, etag):
+        return self.etag < self.etag_end and _eq(self.buf, self.etag, self.etag_end, etag)
+
+    def param(self, name):
+        """Offset of the value of query parameter `name`, or -1; the value
+        ends at value_end()."""
+        buf = self.buf
+        i = self.query
+        end = self.query_end
+        n = len(name)
+        while i < end:
+            amp = _find(buf, 38, i, end)  # '&'
+            if amp < 0:
+                amp = end
+            if i + n < amp and buf[i + n] == 61 and _eq(buf, i, i + n, name):
+                return i + n + 1
+            i = amp + 1
+        return -1
+
+    def value_end(self, v):
+        e = _find(self.buf, 38, v, self.query_end)
+        return self.query_end if e < 0 else e
+
+    def int_param(self, name, default):
+        """Query parameter as an int (digits, optional '-'), or default."""
+        v = self.param(name)
+        if v < 0:
+            return default
+        e = self.value_end(v)
+        if v < e and self.buf[v] == 45:  # '-'
+            x = _uint(self.buf, v + 1, e)
+            return -x if x >= 0 else default
+        x = _uint(self.buf, v, e)
+        return x if x >= 0 else default
+
+    def param_choice(self, name, choices):
+        """The value paired with the query parameter's bytes in `choices`
+        ((bytes, value) pairs), or None."""
+        v = self.param(name)
+        if v < 0:
+            return None
+        e = self.value_end(v)
+        for b, value in choices:
+            if _eq(self.buf, v, e, b):
+                return value
+        return None
+
+    def param_str(self, name):
+        """Query parameter decoded as a str ("" if absent); allocates."""
+        v = self.param(name)
+        if v < 0:
+            return ""
+        return bytes(self.mv[v:self.value_end(v)]).decode()
@@ -0,0 +1,219 @@
+# Streaming JSON/binary output for fixed-point series, without building the payload
+
+import struct
+import sys
+
+# CPython's asyncio transports may keep a reference to a partially sent
+# buffer, so the host gets a copy of each chunk. MicroPython's Stream.write
+# copies or sends immediately, so the device writes the view directly.
+_COPY = sys.implementation.name != "micropython"
+
+
+def tenths_len(raw):
+    """Length of raw tenths formatted as JSON, e.g. -53 -> len("-5.3")."""
+    n = 3 if raw >= 0 else 4
+    q = (raw if raw >= 0 else -raw) // 10
+    while q >= 10:
+        q //= 10
+        n += 1
+    return n
+
+
+def tenths_list_len(views):
+    """Length of "[a,b,...]" for the raw values in views."""
+    n = 2
+    count = 0
+    for mv in views:
+        for v in mv:
+            n += tenths_len(v)
+            count += 1
+    if count > 1:
+        n += count - 1
+    return n
+
+
+def uint_list_len(values):
+    """Length of "[a,b,...]" for the non-negative ints in values."""
+    n = 2
+    count = 0
+    for v in values:
+        n += 1
+        while v >= 10:
+            v //= 10
+            n += 1
+        count += 1
+    if count > 1:
+        n += count - 1
+    return n
+
+
+class ChunkWriter:
+    """Formats JSON or packed binary into a small reusable bytearray and
+    flushes it to an asyncio stream whenever it fills up.
+    """
+
+    def __init__(self, size=256):
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.n = 0
+        # Room left for the longest number plus a separator
+        self.limit = size - 8
+        self.writer = None
+        self.sent = 0
+
+    def bind(self, writer):
+        self.writer = writer
+        self.n = 0
+        self.sent = 0
+
+    async def flush(self):
+        if self.n:
+            chunk = self.mv[:self.n]
+            self.writer.write(bytes(chunk) if _COPY else chunk)
+            self.sent += self.n
+            self.n = 0
+        await self.writer.drain()
+
+    async def write(self, data):
+        """Append a bytes constant, flushing first if it would not fit."""
+        size = len(data)
+        if self.n + size > len(self.buf):
+            await self.flush()
+            if size > len(self.buf):
+                self.writer.write(data)
+                self.sent += size
+                return
+        self.buf[self.n:self.n + size] = data
+        self.n += size
+
+    def _put_tenths(self, raw):
+        buf = self.buf
+        n = self.n
+        if raw < 0:
+            buf[n] = 45  # '-'
+            n += 1
+            raw = -raw
+        q = raw // 10
+        d = 1
+        while d * 10 <= q:
+            d *= 10
+        while d:
+            buf[n] = 48 + (q // d) % 10
+            n += 1
+            d //= 10
+        buf[n] = 46  # '.'
+        buf[n + 1] = 48 + raw % 10
+        self.n = n + 2
+
+    async def tenths_list(self, views):
+        """Write the raw tenths in views as a JSON array of decimals."""
+        if self.n + 1 > len(self.buf):
+            await self.flush()
+        self.buf[self.n] = 91  # '['
+        self.n += 1
+        first = True
+        for mv in views:
+            for v in mv:
+                if self.n > self.limit:
+                    await self.flush()
+                if first:
+                    first = False
+                else:
+                    self.buf[self.n] = 44  # ','
+                    self.n += 1
+                self._put_tenths(v)
+        if self.n + 1 > len(self.buf):
+            await self.flush()
+        self.buf[self.n] = 93  # ']'
+        self.n += 1
+
+    def _put_uint(self, v):
+        buf = self.buf
+        n = self.n
+        d = 1
+        while d * 10 <= v:
+            d *= 10
+        while d:
+            buf[n] = 48 + (v // d) % 10
+            n += 1
+            d //= 10
+        self.n = n
+
+    async def uint(self, v):
+        """Write a non-negative int (up to 10 digits) in decimal."""
+        if self.n + 10 > len(self.buf):
+            await self.flush()
+        self._put_uint(v)
+
+    async def uint_list(self, values):
+        """Write the non-negative ints in values as a JSON array."""
+        if self.n + 1 > len(self.buf):
+            await self.flush()
+        buf = self.buf
+        buf[self.n] = 91  # '['
+        self.n += 1
+        first = True
+        for v in values:
+            if self.n > self.limit:
+                await self.flush()
+            if first:
+                first = False
+            else:
+                buf[self.n] = 44  # ','
+                self.n += 1
+            self._put_uint(v)
+        if self.n + 1 > len(buf):
+            await self.flush()
+        buf[self.n] = 93  # ']'
+        self.n += 1
+
+    async def pack(self, fmt, *args):
+        """struct.pack_into the values at the current position."""
+        size = struct.calcsize(fmt)
+        if self.n + size > len(self.buf):
+            await self.flush()
+        struct.pack_into(fmt, self.buf, self.n, *args)
+        self.n += size
+
+    async def int16_list(self, views):
+        """Write the raw values in views as packed little-endian int16."""
+        buf = self.buf
+        limit = len(buf) - 2
+        for mv in views:
+            for v in mv:
+                if self.n > limit:
+                    await self.flush()
+                struct.pack_into('<h', buf, self.n, v)
+                self.n += 2
+
+    async def uint16_list(self, views):
+        """Write the raw values in views as packed little-endian uint16."""
+        buf = self.buf
+        limit = len(buf) - 2
+        for mv in views:
+            for v in mv:
+                if self.n > limit:
+                    await self.flush()
+                struct.pack_into('<H', buf, self.n, v)
+                self.n += 2
+
+    async def copy_from(self, f, length=-1):
+        """Stream the rest of file f, or its next `length` bytes, through
+        the buffer, after what it already holds (a response head, say)."""
+        size = len(self.buf)
+        while length:
+            room = size - self.n
+            if 0 < length < room:
+                room = length
+            if self.n or room < size:
+                n = f.readinto(self.mv[self.n:self.n + room])
+            else:
+                n = f.readinto(self.buf)
+            if not n:
+                break
+            self.n += n
+            if length > 0:
+                length -= n
+            await self.flush()
+        if self.n:
+            await self.flush()
@@ -0,0 +1,75 @@
+# Fixed-bucket timing histograms and Prometheus text rendering for /metrics
+
+from array import array
+
+# Upper bounds (microseconds) shared by the stage histograms: 100 us .. 1 s
+STAGE_BOUNDS_US = (100, 300, 1000, 3000, 10000, 30000, 100000, 300000, 1000000)
+
+
+class Histogram:
+    """Durations in microseconds counted into fixed buckets, plus sum and count.
+
+    observe() only updates preallocated storage, so it can sit on the
+    per-tick path. The sum is kept as whole seconds plus a microsecond
+    remainder so both stay small ints however long the device runs.
+    """
+
+    def __init__(self, bounds=STAGE_BOUNDS_US):
+        self.bounds = bounds
+        self.counts = array('I', bytes(4 * (len(bounds) + 1)))  # last is +Inf
+        self.count = 0
+        self.sum_s = 0
+        self.sum_us = 0
+
+    def observe(self, us):
+        bounds = self.bounds
+        n = len(bounds)
+        i = 0
+        while i < n and us > bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        us += self.sum_us
+        while us >= 1000000:
+            us -= 1000000
+            self.sum_s += 1
+        self.sum_us = us
+
+
+def seconds(us):
+    """Microseconds as a decimal seconds string without float formatting."""
+    s = "{}.{:06d}".format(us // 1000000, us % 1000000).rstrip("0")
+    return s + "0" if s.endswith(".") else s
+
+
+def histogram_family(name, help, label, items):
+    """Yield the Prometheus text for one histogram family, one string per
+    labelled histogram (after the HELP/TYPE header), so callers can stream
+    it in small pieces. items is a sequence of (label value, Histogram).
+    """
+    yield "# HELP {} {}\n# TYPE {} histogram\n".format(name, help, name)
+    for value, h in items:
+        sel = '{}="{}"'.format(label, value)
+        lines = []
+        acc = 0
+        for i, b in enumerate(h.bounds):
+            acc += h.counts[i]
+            lines.append('{}_bucket{{{},le="{}"}} {}\n'.format(name, sel, seconds(b), acc))
+        acc += h.counts[len(h.bounds)]
+        lines.append('{}_bucket{{{},le="+Inf"}} {}\n'.format(name, sel, acc))
+        lines.append('{}_sum{{{}}} {}.{:06d}\n'.format(name, sel, h.sum_s, h.sum_us))
+        lines.append('{}_count{{{}}} {}\n'.format(name, sel, h.count))
+        yield "".join(lines)
+
+
+def sample_family(name, help, kind, samples):
+    """Text for a counter or gauge family. samples is a sequence of
+    (label string or "", value), e.g. ('path="/data"', 12).
+    """
+    lines = ["# HELP {} {}\n# TYPE {} {}\n".format(name, help, name, kind)]
+    for labels, value in samples:
+        if labels:
+            lines.append("{}{{{}}} {}\n".format(name, labels, value))
+        else:
+            lines.append("{} {}\n".format(name, value))
+    return "".join(lines)
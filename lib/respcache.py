@@ -0,0 +1,91 @@
+# Encoded response bodies kept between requests, under a byte budget
+
+
+class BodyBuffer:
+    """Writer stand-in for a ChunkWriter: keeps what it flushes in one
+    bytearray of the length announced up front, ready to be cached."""
+
+    def __init__(self, size):
+        self.buf = bytearray(size)
+        self.n = 0
+
+    def write(self, data):
+        k = len(data)
+        self.buf[self.n:self.n + k] = data
+        self.n += k
+
+    async def drain(self):
+        pass
+
+
+class ResponseCache:
+    """Bodies by key, least recently used evicted first once the bytes held
+    would pass `budget`. A body over half the budget is never kept, so one
+    large reply cannot flush every other entry.
+
+    MicroPython's OrderedDict cannot move an entry to the end, so each entry
+    carries the tick of its last use and eviction scans for the oldest.
+    Entries are few (one per distinct request shape), so that is cheap.
+    Bodies are stored as given and must not be modified afterwards.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.held = 0  # bytes in bodies kept
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.clears = 0
+        self._entries = {}  # key -> [body, tick of last use]
+        self._tick = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        e = self._entries.get(key)
+        if e is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._tick += 1
+        e[1] = self._tick
+        return e[0]
+
+    def fits(self, size):
+        return size <= self.budget // 2
+
+    def put(self, key, body):
+        size = len(body)
+        if not self.fits(size):
+            return
+        old = self._entries.pop(key, None)
+        if old:
+            self.held -= len(old[0])
+        while self.held + size > self.budget:
+            self._evict()
+        self._tick += 1
+        self._entries[key] = [body, self._tick]
+        self.held += size
+
+    def _evict(self):
+        oldest = None
+        tick = 0
+        for key in self._entries:
+            t = self._entries[key][1]
+            if oldest is None or t < tick:
+                oldest = key
+                tick = t
+        self.held -= len(self._entries.pop(oldest)[0])
+        self.evictions += 1
+
+    def clear(self):
+        """Drop every body (the data behind them changed)."""
+        if self._entries:
+            self._entries.clear()
+            self.held = 0
+        self.clears += 1
+
+    def hit_rate(self):
+        n = self.hits + self.misses
+        return self.hits / n if n else 0.0
@@ -0,0 +1,77 @@
+# Fixed-point circular series for minute-averaged readings
+
+from array import array
+
+
+class RingSeries:
+    """Circular buffer of readings stored as scaled int16 (tenths by default).
+
+    Appends are O(1) and overwrite the oldest entry once full. Values are
+    stored as round(value * scale), so a 1440-point series takes ~2.9 KB
+    instead of a list of boxed floats.
+    """
+
+    def __init__(self, size, scale=10):
+        self.size = size
+        self.scale = scale
+        self.buf = array('h', bytes(2 * size))
+        self.head = 0  # next slot to write
+        self.count = 0  # total values ever appended
+        # Sequence number of the newest value; equals count unless the owner
+        # resumes numbering (e.g. after restoring history from flash)
+        self.seq = 0
+
+    def __len__(self):
+        return self.count if self.count < self.size else self.size
+
+    def append(self, value):
+        self.append_raw(int(round(value * self.scale)))
+
+    def append_raw(self, raw):
+        if raw > 32767:
+            raw = 32767
+        elif raw < -32768:
+            raw = -32768
+        self.buf[self.head] = raw
+        self.head = (self.head + 1) % self.size
+        self.count += 1
+        self.seq += 1
+
+    def raw_at(self, offset):
+        """Raw stored value `offset` entries back (1 = newest), or None."""
+        if offset < 1 or offset > len(self):
+            return None
+        return self.buf[(self.head - offset) % self.size]
+
+    def at(self, offset):
+        """Value `offset` entries back (1 = newest) as a float, or None."""
+        raw = self.raw_at(offset)
+        if raw is None:
+            return None
+        return raw / self.scale
+
+    def last(self, n):
+        """Zero-copy view of the newest n raw values, oldest first.
+
+        Returns a pair of memoryviews (older, newer); the first is empty
+        unless the window wraps around the end of the buffer.
+        """
+        available = len(self)
+        if n > available:
+            n = available
+        mv = memoryview(self.buf)
+        start = (self.head - n) % self.size
+        if n == 0:
+            return mv[0:0], mv[0:0]
+        if start + n <= self.size:
+            return mv[0:0], mv[start:start + n]
+        return mv[start:self.size], mv[0:self.head]
+
+    def iter_last(self, n):
+        """Yield the newest n values as floats, oldest first."""
+        a, b = self.last(n)
+        scale = self.scale
+        for v in a:
+            yield v / scale
+        for v in b:
+            yield v / scale
@@ -0,0 +1,113 @@
+# Cascading min/max/mean rollup tiers over minute samples
+
+from ringseries import RingSeries
+
+
+class RollupTier:
+    """Fixed-size history of buckets, each folding the entries of the tier
+    below that end within one `width`-second slot of wall time into min,
+    max, mean and sample count.
+
+    Values are raw fixed-point ints (tenths by default), one per channel.
+    Feed entries with add(), each stamped with the Unix time it ends. A
+    bucket closes once an entry ends exactly on the slot's end or belongs
+    to a later slot, so a gap in the input leaves slots out rather than
+    stretching a bucket. Closed buckets come back from add() in the same
+    shape, stamped with the slot's end, ready for the next tier.
+    """
+
+    def __init__(self, size, width, channels=2, scale=10):
+        self.size = size
+        self.width = width
+        self.channels = channels
+        self.mean = [RingSeries(size, scale) for _ in range(channels)]
+        self.min = [RingSeries(size, scale) for _ in range(channels)]
+        self.max = [RingSeries(size, scale) for _ in range(channels)]
+        self.count = RingSeries(size, 1)  # raw samples behind each bucket
+        # Open bucket accumulators
+        self._sum = [0] * channels  # raw means weighted by sample count
+        self._lo = [0] * channels
+        self._hi = [0] * channels
+        self._n = 0  # samples folded in so far
+        self._end = 0  # end of the open bucket's slot, 0 if none is open
+        self.last_end = 0  # end of the newest closed bucket's slot
+
+    def __len__(self):
+        return len(self.count)
+
+    @property
+    def seq(self):
+        """Number of buckets closed so far (sequence number of the newest)."""
+        return self.count.seq
+
+    def slot_end(self, ts):
+        """End of the slot holding an entry that ends at ts."""
+        return ((ts - 1) // self.width + 1) * self.width
+
+    def add(self, ts, means, mins, maxs, n):
+        """Fold in one lower-tier entry ending at ts and covering n raw
+        samples.
+
+        Returns the buckets this closes as a tuple (empty, one or, after a
+        gap, two) of (end, means, mins, maxs, n).
+        """
+        end = self.slot_end(ts)
+        if end <= self.last_end:
+            return ()  # that slot is closed (restored from a log, say)
+        stale = None
+        if self._end and self._end != end:
+            stale = self._close()
+        self._end = end
+        if n > 0:
+            first = self._n == 0
+            for c in range(self.channels):
+                if first or mins[c] < self._lo[c]:
+                    self._lo[c] = mins[c]
+                if first or maxs[c] > self._hi[c]:
+                    self._hi[c] = maxs[c]
+                self._sum[c] += means[c] * n
+            self._n += n
+        if ts != end:
+            return (stale,) if stale else ()
+        return (stale, self._close()) if stale else (self._close(),)
+
+    def rebase(self, shift):
+        """The clock moved by `shift` seconds: the open bucket continues in
+        the slot its time moved to."""
+        if self._end:
+            self._end = self.slot_end(self._end + shift)
+        if self.last_end:
+            self.last_end += shift
+
+    def restore(self, seq, end, means, mins, maxs, n):
+        """Append bucket number seq, closed before a reboot, as kept by the
+        owner (e.g. in a flash log)."""
+        self._append(means, mins, maxs, n)
+        for series in self.mean + self.min + self.max:
+            series.seq = seq
+        self.count.seq = seq
+        self.last_end = end
+
+    def _append(self, means, mins, maxs, n):
+        for c in range(self.channels):
+            self.mean[c].append_raw(means[c])
+            self.min[c].append_raw(mins[c])
+            self.max[c].append_raw(maxs[c])
+        self.count.append_raw(n if n < 32767 else 32767)
+
+    def _close(self):
+        n = self._n
+        means = [0] * self.channels
+        for c in range(self.channels):
+            if n:
+                means[c] = int(round(self._sum[c] / n))
+            else:
+                # No samples reached this bucket; record an empty one
+                self._lo[c] = self._hi[c] = 0
+            self._sum[c] = 0
+        self._append(means, self._lo, self._hi, n)
+        closed = (self._end, means, self._lo[:], self._hi[:], n)
+        self.last_end = self._end
+        self._n = 0
+        self._end = 0
+        return closed
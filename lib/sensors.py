@@ -0,0 +1,185 @@
+# DHT probe channels: staggered reads, median-of-3 filtering, retry backoff
+
+from array import array
+from time import ticks_add, ticks_diff
+from ringseries import RingSeries
+from timeindex import TimeIndex
+
+# Shortest time between reads each part tolerates (ms, from the datasheets)
+MIN_INTERVAL_MS = {"DHT11": 1000, "DHT22": 2000}
+# Failed reads double the wait up to this, then keep retrying at it
+BACKOFF_MAX_MS = 32000
+# Adaptive schedule: after this many reads within the steps below of where
+# the run started the interval doubles (up to max_interval); a reading that
+# moves further puts it straight back to the base interval
+ADAPT_STABLE_READS = 10
+ADAPT_STEP_T10 = 10  # tenths of a degree
+ADAPT_STEP_H10 = 20  # tenths of a %RH
+
+
+def median3_index(v):
+    """Index of the median of v[0], v[1], v[2]."""
+    a, b, c = v[0], v[1], v[2]
+    if a > b:
+        if b >= c:
+            return 1
+        return 0 if a < c else 2
+    if a >= c:
+        return 0
+    return 1 if b < c else 2
+
+
+class Channel:
+    """One DHT probe: its read schedule, median filter and minute sums.
+
+    The owner calls read(now) once `due` has passed. A successful read moves
+    `due` on by `interval` and folds the median of the last three readings
+    into the minute, so a single corrupt frame never reaches the averages.
+    A failed read waits interval * 2**failures (capped at BACKOFF_MAX_MS)
+    before the next attempt. Either way the schedule keeps its phase, so
+    probes staggered at start stay staggered.
+
+    With max_interval above the base interval the schedule adapts: the
+    interval doubles while readings hold steady and drops back to the base
+    as soon as they move (see ADAPT_*). A reading then stands for the slots
+    it was taken for, so the minute sums carry `weight` = interval // base
+    per read and `count` is in base-rate samples whatever the interval was.
+
+    temp/hum hold the driver's own value for the median reading (int on a
+    DHT11, float on a DHT22); t10/h10 are the same in int tenths. Nothing
+    here allocates on a successful read.
+    """
+
+    def __init__(self, name, driver, interval, phase, points, max_interval=0):
+        self.name = name
+        self.driver = driver
+        self.base = interval
+        self.interval = interval
+        self.max_interval = max_interval if max_interval > interval else interval
+        self.due = phase
+        self.weight = 1  # base-rate slots the last read stands for
+        self._stable = 0  # reads since the run started
+        self._t_ref = 0  # readings the run started from (tenths)
+        self._h_ref = 0
+        self.speedups = 0  # times a moving reading cut the interval back
+        self.fails = 0  # consecutive failed reads
+        self.reads = 0
+        self.errors = 0
+        self.missed = 0  # slots skipped because the owner came late
+        self.last_error = None
+        # Last three readings (tenths for ordering, driver values for display)
+        self._t10 = array('h', bytes(6))
+        self._h10 = array('h', bytes(6))
+        self._t = [0, 0, 0]
+        self._h = [0, 0, 0]
+        self._filled = 0
+        self._i = 0
+        self.temp = 0
+        self.hum = 0
+        self.t10 = 0
+        self.h10 = 0
+        # Minute accumulators (tenths)
+        self.t_sum = 0
+        self.h_sum = 0
+        self.t_min = 0
+        self.t_max = 0
+        self.h_min = 0
+        self.h_max = 0
+        self.count = 0
+        self.temp_series = RingSeries(points)
+        self.hum_series = RingSeries(points)
+        self.times = TimeIndex(points)
+
+    def _reschedule(self, now, periods):
+        due = ticks_add(self.due, self.interval * periods)
+        while ticks_diff(due, now) <= 0:
+            due = ticks_add(due, self.interval)  # skip missed slots
+            self.missed += 1
+        self.due = due
+
+    def _adapt(self, t10, h10):
+        if (self._stable and abs(t10 - self._t_ref) <= ADAPT_STEP_T10
+                and abs(h10 - self._h_ref) <= ADAPT_STEP_H10):
+            self._stable += 1
+            if self._stable > ADAPT_STABLE_READS and self.interval < self.max_interval:
+                self.interval = min(2 * self.interval, self.max_interval)
+                self._stable = 1
+            return
+        if self._stable and self.interval != self.base:
+            self.interval = self.base
+            self.speedups += 1
+        # A new run starts from here
+        self._stable = 1
+        self._t_ref = t10
+        self._h_ref = h10
+
+    def read(self, now):
+        """Take one reading; returns False (and backs off) if it failed."""
+        self.reads += 1
+        self.weight = w = self.interval // self.base
+        d = self.driver
+        try:
+            d.measure()
+        except OSError as e:
+            self.errors += 1
+            self.fails += 1
+            self.last_error = e
+            k = 1
+            n = self.fails
+            while n and 2 * k * self.interval <= BACKOFF_MAX_MS:
+                k <<= 1
+                n -= 1
+            self._reschedule(now, k)
+            return False
+        self.fails = 0
+        t = d.temperature()
+        h = d.humidity()
+        i = self._i
+        self._t[i] = t
+        self._h[i] = h
+        self._t10[i] = int(round(t * 10))
+        self._h10[i] = int(round(h * 10))
+        self._i = (i + 1) % 3
+        if self._filled < 3:
+            # Not enough for a median yet; pass the reading through
+            self._filled += 1
+            ti = hi = i
+        else:
+            ti = median3_index(self._t10)
+            hi = median3_index(self._h10)
+        self.temp = self._t[ti]
+        self.hum = self._h[hi]
+        t10 = self.t10 = self._t10[ti]
+        h10 = self.h10 = self._h10[hi]
+        if self.max_interval > self.base:
+            self._adapt(t10, h10)
+        if self.count == 0:
+            self.t_min = self.t_max = t10
+            self.h_min = self.h_max = h10
+        else:
+            if t10 < self.t_min:
+                self.t_min = t10
+            if t10 > self.t_max:
+                self.t_max = t10
+            if h10 < self.h_min:
+                self.h_min = h10
+            if h10 > self.h_max:
+                self.h_max = h10
+        self.t_sum += t10 * w
+        self.h_sum += h10 * w
+        self.count += w
+        self._reschedule(now, 1)  # after _adapt, so a new interval applies at once
+        return True
+
+    def close_minute(self):
+        """(t, h, tmin, tmax, hmin, hmax, n) for the minute in tenths, n in
+        base-rate samples, then reset; None if no read succeeded."""
+        n = self.count
+        if n == 0:
+            return None
+        rec = ((2 * self.t_sum + n) // (2 * n), (2 * self.h_sum + n) // (2 * n),
+               self.t_min, self.t_max, self.h_min, self.h_max, n)
+        self.t_sum = 0
+        self.h_sum = 0
+        self.count = 0
+        return rec
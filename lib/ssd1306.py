@@ -24,6 +24,11 @@ SET_PRECHARGE = const(0xD9)
 SET_VCOM_DESEL = const(0xDB)
 SET_CHARGE_PUMP = const(0x8D)
 
+# Column granularity of partial updates in show(). Windows snap to these
+# chunks so each page has only a few distinct ones (10 on a 128-wide panel),
+# whose views are made once instead of sliced anew on every changed frame.
+WINDOW_ALIGN = const(32)
+
 
 # Subclassing FrameBuffer provides support for graphics primitives
 # http://docs.micropython.org/en/latest/pyboard/library/framebuf.html
@@ -34,11 +39,33 @@ class SSD1306(framebuf.FrameBuffer):
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        self._mv = memoryview(self.buffer)  # made once; show() runs every tick
+        self._chunks = (self.width + WINDOW_ALIGN - 1) // WINDOW_ALIGN
+        self._views = self._make_views()
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
+        # Copy of what was last flushed to GDDRAM, used to diff frames
+        self._shadow = bytearray(self.pages * self.width)
+        # Per-page dirty column window [lo, hi]; lo > hi means clean
+        self._dirty_lo = bytearray(self.pages)
+        self._dirty_hi = bytearray(self.pages)
+        self._force = True  # GDDRAM contents unknown until first full flush
+        # Last state sent to the panel, so repeated settings cost nothing
+        self._powered = True
+        self._contrast = 0xFF
+        self._inverted = 0
+        # Preallocated command batches: a two-byte setting and the six-byte
+        # column/page window that precedes each data write in show()
+        self._cmd2 = bytearray(2)
+        self._win = bytearray(6)
+        # Picture offset set by jitter(); drawing is shifted by _dx
+        self._dx = 0
+        self._dy = 0
+        self.bytes_sent = 0  # bytes actually written to the bus (cmd + data)
+        self._clear_dirty()
         self.init_display()
 
     def init_display(self):
-        for cmd in (
+        self.write_cmds(bytes((
             SET_DISP,  # display off
             # address setting
             SET_MEM_ADDR,
@@ -71,43 +98,247 @@ class SSD1306(framebuf.FrameBuffer):
             SET_CHARGE_PUMP,
             0x10 if self.external_vcc else 0x14,
             SET_DISP | 0x01,  # display on
-        ):  # on
-            self.write_cmd(cmd)
+        )))
+        self._powered = True
+        self._contrast = 0xFF
+        self._inverted = 0
+        self._dy = 0
         self.fill(0)
         self.show()
+        if self.pages < 8:
+            # jitter() shifts the 64-row GDDRAM, rows past the panel included;
+            # blank them once so nothing stale scrolls into view
+            blank = bytes(self.width)
+            for p in range(self.pages, 8):
+                self.write_cmds(bytes((SET_PAGE_ADDR, p, p)))
+                self.write_data(blank)
+
+    # Settings below skip the bus when the panel already has them, so they
+    # are cheap to call every frame.
 
     def poweroff(self):
-        self.write_cmd(SET_DISP)
+        if self._powered:
+            self.write_cmd(SET_DISP)
+            self._powered = False
 
     def poweron(self):
-        self.write_cmd(SET_DISP | 0x01)
+        if not self._powered:
+            self.write_cmd(SET_DISP | 0x01)
+            self._powered = True
 
     def contrast(self, contrast):
-        self.write_cmd(SET_CONTRAST)
-        self.write_cmd(contrast)
+        if contrast == self._contrast:
+            return
+        cmd = self._cmd2
+        cmd[0] = SET_CONTRAST
+        cmd[1] = contrast
+        self.write_cmds(cmd)
+        self._contrast = contrast
 
     def invert(self, invert):
-        self.write_cmd(SET_NORM_INV | (invert & 1))
+        invert &= 1
+        if invert != self._inverted:
+            self.write_cmd(SET_NORM_INV | invert)
+            self._inverted = invert
 
     def rotate(self, rotate):
-        self.write_cmd(SET_COM_OUT_DIR | ((rotate & 1) << 3))
-        self.write_cmd(SET_SEG_REMAP | (rotate & 1))
+        cmd = self._cmd2
+        cmd[0] = SET_COM_OUT_DIR | ((rotate & 1) << 3)
+        cmd[1] = SET_SEG_REMAP | (rotate & 1)
+        self.write_cmds(cmd)
+
+    def jitter(self, dx, dy):
+        """Move the picture dx columns right and dy rows down, for burn-in
+        protection without redrawing.
+
+        dy costs one command: the display start line moves and GDDRAM is left
+        alone. Rows pushed off the bottom come back at the top, so keep dy
+        within the blank rows under the content. The SSD1306 has no column
+        equivalent, so a new dx shifts the framebuffer instead and offsets
+        later drawing to match; the next show() sends only the columns that
+        changed, and content pushed past the right edge is lost.
+        """
+        dy &= 63
+        if dy != self._dy:
+            self.write_cmd(SET_DISP_START_LINE | ((64 - dy) & 63))
+            self._dy = dy
+        step = dx - self._dx
+        if step:
+            self._dx = dx
+            super().scroll(step, 0)
+            # scroll() leaves the vacated columns as they were
+            if step > 0:
+                super().fill_rect(0, 0, step, self.height, 0)
+            else:
+                super().fill_rect(self.width + step, 0, -step, self.height, 0)
+            self._mark_all()
+
+    # --- dirty region tracking ---
+    # Drawing primitives mark the pages/columns they touch; show() then
+    # diffs only those windows against the shadow copy of GDDRAM. They also
+    # apply the horizontal offset from jitter().
+
+    def _clear_dirty(self):
+        for p in range(self.pages):
+            self._dirty_lo[p] = 255
+            self._dirty_hi[p] = 0
+
+    def _mark(self, x, y, w, h):
+        if w <= 0 or h <= 0:
+            return
+        x0 = x if x > 0 else 0
+        x1 = x + w - 1
+        if x1 >= self.width:
+            x1 = self.width - 1
+        y0 = y if y > 0 else 0
+        y1 = y + h - 1
+        if y1 >= self.height:
+            y1 = self.height - 1
+        if x0 > x1 or y0 > y1:
+            return
+        lo = self._dirty_lo
+        hi = self._dirty_hi
+        for p in range(y0 >> 3, (y1 >> 3) + 1):
+            if x0 < lo[p]:
+                lo[p] = x0
+            if x1 > hi[p]:
+                hi[p] = x1
+
+    def _mark_all(self):
+        self._mark(0, 0, self.width, self.height)
+
+    def fill(self, c):
+        super().fill(c)
+        self._mark_all()
+
+    def pixel(self, x, y, *c):
+        x += self._dx
+        if not c:
+            return super().pixel(x, y)
+        super().pixel(x, y, c[0])
+        self._mark(x, y, 1, 1)
+
+    def hline(self, x, y, w, c):
+        x += self._dx
+        super().hline(x, y, w, c)
+        self._mark(x, y, w, 1)
+
+    def vline(self, x, y, h, c):
+        x += self._dx
+        super().vline(x, y, h, c)
+        self._mark(x, y, 1, h)
+
+    def line(self, x1, y1, x2, y2, c):
+        x1 += self._dx
+        x2 += self._dx
+        super().line(x1, y1, x2, y2, c)
+        self._mark(min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1)
 
-    def show(self):
-        x0 = 0
-        x1 = self.width - 1
+    def rect(self, x, y, w, h, c, *f):
+        x += self._dx
+        super().rect(x, y, w, h, c, *f)
+        self._mark(x, y, w, h)
+
+    def fill_rect(self, x, y, w, h, c):
+        x += self._dx
+        super().fill_rect(x, y, w, h, c)
+        self._mark(x, y, w, h)
+
+    def text(self, s, x, y, *c):
+        x += self._dx
+        super().text(s, x, y, *c)
+        self._mark(x, y, 8 * len(s), 8)
+
+    def blit(self, fbuf, x, y, *args):
+        x += self._dx
+        super().blit(fbuf, x, y, *args)
+        # Source size is not exposed by FrameBuffer; be conservative
+        self._mark(x, y, self.width, self.height)
+
+    def scroll(self, xstep, ystep):
+        super().scroll(xstep, ystep)
+        self._mark_all()
+
+    def show(self, full=False):
+        """Flush changed regions of the framebuffer to the panel.
+
+        Only the column window of each dirty page that actually differs from
+        the last flushed frame is sent. Nothing is sent while powered off or
+        when the frame is unchanged. Pass full=True to resend everything.
+        """
+        if not self._powered and not full:
+            return
+        col_offset = 0
         if self.width != 128:
             # narrow displays use centred columns
             col_offset = (128 - self.width) // 2
-            x0 += col_offset
-            x1 += col_offset
-        self.write_cmd(SET_COL_ADDR)
-        self.write_cmd(x0)
-        self.write_cmd(x1)
-        self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        buf = self.buffer
+        shadow = self._shadow
+        if full or self._force:
+            self._window(col_offset, col_offset + self.width - 1, 0, self.pages - 1)
+            self.write_data(buf)
+            shadow[:] = buf
+            self._force = False
+            self._clear_dirty()
+            return
+        width = self.width
+        lo = self._dirty_lo
+        hi = self._dirty_hi
+        for p in range(self.pages):
+            c0 = lo[p]
+            c1 = hi[p]
+            if c0 > c1:
+                continue
+            base = p * width
+            # Narrow the window to the bytes that really changed
+            while c0 <= c1 and buf[base + c0] == shadow[base + c0]:
+                c0 += 1
+            while c1 >= c0 and buf[base + c1] == shadow[base + c1]:
+                c1 -= 1
+            if c0 > c1:
+                continue
+            # Widen to whole chunks so the window has a cached view; the
+            # extra bytes equal what GDDRAM already holds
+            k0 = c0 // WINDOW_ALIGN
+            k1 = c1 // WINDOW_ALIGN
+            c0 = k0 * WINDOW_ALIGN
+            c1 = (k1 + 1) * WINDOW_ALIGN - 1
+            if c1 >= width:
+                c1 = width - 1
+            view = self._view(p, k0, k1)
+            self._window(col_offset + c0, col_offset + c1, p, p)
+            self.write_data(view)
+            shadow[base + c0 : base + c1 + 1] = view
+        self._clear_dirty()
+
+    def _window(self, c0, c1, p0, p1):
+        # Column and page address window in one command batch
+        w = self._win
+        w[0] = SET_COL_ADDR
+        w[1] = c0
+        w[2] = c1
+        w[3] = SET_PAGE_ADDR
+        w[4] = p0
+        w[5] = p1
+        self.write_cmds(w)
+
+    def _make_views(self):
+        # One view per (page, first chunk, last chunk), indexed by _view()
+        k = self._chunks
+        views = [None] * (self.pages * k * k)
+        for p in range(self.pages):
+            base = p * self.width
+            for k0 in range(k):
+                for k1 in range(k0, k):
+                    end = (k1 + 1) * WINDOW_ALIGN
+                    if end > self.width:
+                        end = self.width
+                    views[(p * k + k0) * k + k1] = self._mv[base + k0 * WINDOW_ALIGN : base + end]
+        return views
+
+    def _view(self, p, k0, k1):
+        k = self._chunks
+        return self._views[(p * k + k0) * k + k1]
 
 
 class SSD1306_I2C(SSD1306):
@@ -116,16 +347,25 @@ class SSD1306_I2C(SSD1306):
         self.addr = addr
         self.temp = bytearray(2)
         self.write_list = [b"\x40", None]  # Co=0, D/C#=1
+        self.cmd_list = [b"\x00", None]  # Co=0, D/C#=0: a run of commands
         super().__init__(width, height, external_vcc)
 
     def write_cmd(self, cmd):
         self.temp[0] = 0x80  # Co=1, D/C#=0
         self.temp[1] = cmd
         self.i2c.writeto(self.addr, self.temp)
+        self.bytes_sent += 2
+
+    def write_cmds(self, buf):
+        # Several commands in one transaction
+        self.cmd_list[1] = buf
+        self.i2c.writevto(self.addr, self.cmd_list)
+        self.bytes_sent += len(buf) + 1
 
     def write_data(self, buf):
         self.write_list[1] = buf
         self.i2c.writevto(self.addr, self.write_list)
+        self.bytes_sent += len(buf) + 1
 
 
 class SSD1306_SPI(SSD1306):
@@ -138,6 +378,10 @@ class SSD1306_SPI(SSD1306):
         self.dc = dc
         self.res = res
         self.cs = cs
+        self._cmd1 = bytearray(1)
+        # Configure the bus once rather than per write; call
+        # spi.init(baudrate=oled.rate) again if another device changes it
+        spi.init(baudrate=self.rate, polarity=0, phase=0)
         import time
 
         self.res(1)
@@ -148,20 +392,24 @@ class SSD1306_SPI(SSD1306):
         super().__init__(width, height, external_vcc)
 
     def write_cmd(self, cmd):
-        self.spi.init(baudrate=self.rate, polarity=0, phase=0)
+        self._cmd1[0] = cmd
+        self.write_cmds(self._cmd1)
+
+    def write_cmds(self, buf):
         self.cs(1)
         self.dc(0)
         self.cs(0)
-        self.spi.write(bytearray([cmd]))
+        self.spi.write(buf)
         self.cs(1)
+        self.bytes_sent += len(buf)
 
     def write_data(self, buf):
-        self.spi.init(baudrate=self.rate, polarity=0, phase=0)
         self.cs(1)
         self.dc(1)
         self.cs(0)
         self.spi.write(buf)
         self.cs(1)
+        self.bytes_sent += len(buf)
 
 
 __version__ = '0.1.0'
@@ -0,0 +1,100 @@
+# Timestamps for a ring of entries, stored as per-entry uint16 deltas
+
+from array import array
+
+# Deltas up to 32767 s are stored as seconds; longer gaps as minutes with the
+# top bit set (up to ~22 days, then clamped). 0 means unknown: the first
+# entry, or a clock that went backwards.
+MINUTES_FLAG = 0x8000
+DELTA_MAX = 0x7FFF
+
+
+def encode_delta(d):
+    if d <= 0:
+        return 0
+    if d <= DELTA_MAX:
+        return d
+    d //= 60
+    return MINUTES_FLAG | (d if d < DELTA_MAX else DELTA_MAX)
+
+
+def decode_delta(v):
+    return (v & DELTA_MAX) * 60 if v & MINUTES_FLAG else v
+
+
+def iter_deltas(views):
+    """Yield the gaps in seconds stored in views (from last()), oldest first."""
+    for mv in views:
+        for v in mv:
+            yield decode_delta(v)
+
+
+class TimeIndex:
+    """Unix timestamps of the entries of a RingSeries of the same size.
+
+    Only the newest timestamp is kept whole; every entry stores the gap to
+    the one before it in 2 bytes, and older timestamps are rebuilt by walking
+    back from the newest. A shifted clock therefore only touches two values:
+    see rebase().
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.buf = array('H', bytes(2 * size))
+        self.head = 0  # next slot to write
+        self.count = 0
+        self.newest = 0  # timestamp of the newest entry, 0 if none
+        # Entries stamped by a clock not yet set, and the timestamp of the
+        # entry before them (0 if none)
+        self.provisional = 0
+        self._anchor = 0
+
+    def __len__(self):
+        return self.count if self.count < self.size else self.size
+
+    def append(self, ts, provisional=False):
+        if provisional and not self.provisional:
+            self._anchor = self.newest
+        if provisional:
+            self.provisional += 1
+        self.buf[self.head] = encode_delta(ts - self.newest) if self.count else 0
+        self.head = (self.head + 1) % self.size
+        self.count += 1
+        self.newest = ts
+
+    def rebase(self, shift):
+        """The clock moved by `shift` seconds: move the provisional entries
+        with it and work out the gap between them and the older ones."""
+        k = self.provisional
+        self.provisional = 0
+        if not k:
+            return
+        self.newest += shift
+        if k >= len(self):
+            return  # the oldest provisional entry has no predecessor here
+        # Walk back to the oldest provisional entry's (shifted) timestamp
+        ts = self.newest
+        i = self.head
+        for _ in range(k - 1):
+            i = (i - 1) % self.size
+            ts -= decode_delta(self.buf[i])
+        i = (i - 1) % self.size
+        self.buf[i] = encode_delta(ts - self._anchor) if self._anchor else 0
+
+    def last(self, n):
+        """Zero-copy views (older, newer) of the newest n encoded deltas,
+        oldest first, like RingSeries.last()."""
+        available = len(self)
+        if n > available:
+            n = available
+        mv = memoryview(self.buf)
+        start = (self.head - n) % self.size
+        if n == 0:
+            return mv[0:0], mv[0:0]
+        if start + n <= self.size:
+            return mv[0:0], mv[start:start + n]
+        return mv[start:self.size], mv[0:self.head]
+
+    def iter_last(self, n):
+        """Yield the newest n gaps in seconds, oldest first."""
+        return iter_deltas(self.last(n))
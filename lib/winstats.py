@@ -0,0 +1,105 @@
+# Trailing-window mean, min, max and standard deviation, O(1) per sample
+
+from array import array
+
+
+class _Deque:
+    """Sample numbers, oldest first, in a fixed ring of `size` slots."""
+
+    def __init__(self, size):
+        self.buf = array('I', bytes(4 * size))
+        self.head = 0
+        self.n = 0
+
+
+class WindowStats:
+    """Statistics over several trailing windows of one series of int samples
+    (tenths here), e.g. the last 5, 10, 30 and 60 minutes.
+
+    Each window keeps a running sum and sum of squares, adding the new
+    sample and taking off the one that just left, and a monotonic deque per
+    extreme holding only the samples that can still become its min or max.
+    add() is therefore O(1) per window, amortised, and allocates nothing;
+    the last max(windows) samples are kept to find the ones that leave.
+
+    add(v, lo, hi) lets the extremes come from their own values, such as a
+    minute's min and max next to its mean; both default to v.
+    """
+
+    def __init__(self, windows):
+        self.windows = windows
+        self.size = max(windows)
+        self.seq = 0  # samples added
+        self._v = array('h', bytes(2 * self.size))
+        self._lo = array('h', bytes(2 * self.size))
+        self._hi = array('h', bytes(2 * self.size))
+        self._sum = [0] * len(windows)
+        self._sq = [0] * len(windows)
+        self._min = [_Deque(w) for w in windows]
+        self._max = [_Deque(w) for w in windows]
+
+    def add(self, v, lo=None, hi=None):
+        s = self.seq
+        size = self.size
+        windows = self.windows
+        for k in range(len(windows)):
+            w = windows[k]
+            self._sum[k] += v
+            self._sq[k] += v * v
+            if s >= w:
+                # Read before the slot is reused: the largest window's
+                # leaving sample sits where the new one goes
+                old = self._v[(s - w) % size]
+                self._sum[k] -= old
+                self._sq[k] -= old * old
+        i = s % size
+        self._v[i] = v
+        self._lo[i] = v if lo is None else lo
+        self._hi[i] = v if hi is None else hi
+        for k in range(len(windows)):
+            self._push(self._min[k], self._lo, s, windows[k], True)
+            self._push(self._max[k], self._hi, s, windows[k], False)
+        self.seq = s + 1
+
+    def _push(self, d, vals, s, w, lower):
+        buf = d.buf
+        size = self.size
+        x = vals[s % size]
+        # Older samples the new one beats can never be the extreme again
+        while d.n:
+            y = vals[buf[(d.head + d.n - 1) % w] % size]
+            if (y < x) if lower else (y > x):
+                break
+            d.n -= 1
+        if d.n and buf[d.head] <= s - w:
+            d.head = (d.head + 1) % w
+            d.n -= 1
+        buf[(d.head + d.n) % w] = s
+        d.n += 1
+
+    def count(self, k):
+        w = self.windows[k]
+        return self.seq if self.seq < w else w
+
+    def mean(self, k):
+        """Rounded mean of window k, in the samples' units; 0 if empty."""
+        n = self.count(k)
+        if n == 0:
+            return 0
+        return (2 * self._sum[k] + n) // (2 * n)
+
+    def min(self, k):
+        d = self._min[k]
+        return self._lo[d.buf[d.head] % self.size] if d.n else None
+
+    def max(self, k):
+        d = self._max[k]
+        return self._hi[d.buf[d.head] % self.size] if d.n else None
+
+    def std(self, k):
+        """Population standard deviation of window k as a float, or None."""
+        n = self.count(k)
+        if n == 0:
+            return None
+        var = (n * self._sq[k] - self._sum[k] * self._sum[k]) / (n * n)
+        return var ** 0.5 if var > 0 else 0.0
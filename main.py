@@ -1,22 +1,40 @@
 # Complete project details at https://RandomNerdTutorials.com/raspberry-pi-pico-dht11-dht22-micropython/
 
 from machine import Pin, I2C
-from time import sleep, ticks_ms, ticks_diff
+from time import ticks_ms, ticks_us, ticks_diff, ticks_add, time, gmtime
 import machine
-import network
 try:
-    import usocket as socket  # MicroPython
+    import uasyncio as asyncio  # MicroPython
 except ImportError:
-    import socket  # Fallback
+    import asyncio  # CPython (host runs with stubbed hardware)
+import network
 try:
     import ujson as json
 except Exception:
     import json
+try:
+    import ntptime
+except ImportError:
+    ntptime = None  # port without NTP; clients can still set the clock
 import dht
+import struct
+from array import array
 from ssd1306 import SSD1306_I2C
+from rollup import RollupTier
+from flashlog import FlashLog
+from jsonstream import ChunkWriter, tenths_list_len, uint_list_len
+from metrics import Histogram, histogram_family, sample_family
+from sensors import Channel, MIN_INTERVAL_MS
+from timeindex import TimeIndex, iter_deltas
+from winstats import WindowStats
+from derived import DerivedSeries, dew_point, absolute_humidity, heat_index
+from httpreq import Request
+from respcache import ResponseCache, BodyBuffer
 import random
 import gc
 
+BOOT_MS = ticks_ms()  # time-to-first-sample is counted from here
+
 # ---- WiFi configuration ----
 # Create a file `secrets.py` next to this file with:
 # WIFI_SSID = "your-ssid"
@@ -27,174 +45,815 @@ except Exception:
     WIFI_SSID = None
     WIFI_PASSWORD = None
 
-def connect_wifi(ssid: str, password: str, retries: int = 20):
-    wlan = network.WLAN(network.STA_IF)
-    if not wlan.active():
-        wlan.active(True)
-    if not wlan.isconnected():
-        print("Connecting to WiFi…")
-        wlan.connect(ssid, password)
-        attempts = 0
-        while not wlan.isconnected() and attempts < retries:
-            sleep(0.5)
-            attempts += 1
-            if attempts % 4 == 0:
-                print("…waiting for connection")
-    if wlan.isconnected():
-        print("WiFi connected:", wlan.ifconfig())
-        return wlan
-    print("WiFi connect failed")
-    return None
-
-# HTTP server (non-blocking accept inside the main loop)
-server_sock = None
+# HTTP server (asyncio.start_server; one handler task per connection,
+# HTTP/1.1 keep-alive, capped at HTTP_MAX_CONNECTIONS concurrent sockets)
+server = None
+HTTP_PORT = 80
+HTTP_BACKLOG = 8
+HTTP_READ_TIMEOUT = 2  # seconds to wait for the request head
+HTTP_IDLE_TIMEOUT = 5  # seconds a keep-alive connection may sit idle
+HTTP_KEEPALIVE_MAX = 100  # requests served per connection before closing
+HTTP_MAX_CONNECTIONS = 12  # concurrent sockets; extra clients get a 503
+HTTP_HEAD_MAX = 1536  # request head buffer per open connection; larger heads get a 431
+http_active = 0
+_req_pool = []  # Request buffers of closed connections, reused by new ones
+
+# ---- Metrics (/metrics, Prometheus text format) ----
+# Stage timings come from ticks_us around each hot-path stage and land in
+# preallocated histograms; counters are plain ints. Nothing here allocates
+# on the tick path.
+stage_sensor = Histogram()     # one probe's measure(), any probe
+stage_sample = Histogram()     # whole sampler pass
+stage_display = Histogram()    # whole display tick, including show()
+stage_oled_show = Histogram()  # oled.show()
+stage_aggregate = Histogram()  # minute close: series, tiers, history strings
+stage_flash = Histogram()      # flash log append (and batch write)
+stage_http = Histogram()       # one request, head parsed to response drained
+stage_gc = Histogram()         # explicit gc.collect()
+STAGES = (
+    ("sensor", stage_sensor), ("sample", stage_sample), ("display", stage_display),
+    ("oled_show", stage_oled_show), ("aggregate", stage_aggregate),
+    ("flash", stage_flash), ("http", stage_http), ("gc", stage_gc),
+)
+gc_collections = 0  # explicit collections plus automatic ones inferred
+http_bytes_sent = 0
+# Requests by route; static files share one label to keep cardinality fixed
+http_requests = {"/data": 0, "/data.bin": 0, "/text": 0, "/info": 0, "/stats": 0,
+                 "/metrics": 0, "/time": 0, "/stream": 0, "static": 0, "other": 0}
 
 # Configurable history for HTTP /data (points of recent seconds)
 # Points now represent minutes of averaged data
 POINTS_DEFAULT = 60   # 1 hour of minute-averaged samples
 POINTS_MAX = 1440     # up to 24 hours of history
 
-def start_http_server():
-    global server_sock
-    if server_sock:
-        return server_sock
+async def start_http_server():
+    global server
+    if server:
+        return server
     try:
-        s = socket.socket()
-        try:
-            # Not always available, best-effort
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        except Exception:
-            pass
-        s.bind(("0.0.0.0", 80))
-        s.listen(2)
-        s.settimeout(0)  # non-blocking accept
-        server_sock = s
-        print("HTTP server listening on :80")
-        return s
+        server = await asyncio.start_server(
+            http_handle, "0.0.0.0", HTTP_PORT, backlog=HTTP_BACKLOG
+        )
+        print("HTTP server listening on :{}".format(HTTP_PORT))
+        return server
     except Exception as e:
         print("HTTP server error:", e)
-        server_sock = None
+        server = None
         return None
 
-def _send_all(conn, data):
-    """Reliable send that handles partial writes.
-    Accepts str or bytes; encodes str as UTF-8 once, then loops until sent.
+# Response heads are bytes constants built once at import: status line and
+# Content-Type up to "Content-Length: ", then the length, a cache block
+# (ETag and revalidate, or never store) and the Connection line.
+_HDR_JSON = (b"HTTP/1.1 200 OK\r\n"
+             b"Content-Type: application/json; charset=utf-8\r\n"
+             b"Content-Length: ")
+_HDR_TEXT = (b"HTTP/1.1 200 OK\r\n"
+             b"Content-Type: text/plain; charset=utf-8\r\n"
+             b"Content-Length: ")
+_HDR_BIN = (b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/octet-stream\r\n"
+            b"Content-Length: ")
+_HDR_BAD_REQUEST = (b"HTTP/1.1 400 Bad Request\r\n"
+                    b"Content-Type: text/plain; charset=utf-8\r\n"
+                    b"Content-Length: ")
+_HDR_TOO_LARGE = (b"HTTP/1.1 431 Request Header Fields Too Large\r\n"
+                  b"Content-Type: text/plain; charset=utf-8\r\n"
+                  b"Content-Length: ")
+_HDR_ERROR = (b"HTTP/1.1 500 Internal Server Error\r\n"
+              b"Content-Type: text/plain; charset=utf-8\r\n"
+              b"Content-Length: ")
+_HDR_BUSY = (b"HTTP/1.1 503 Service Unavailable\r\n"
+             b"Content-Type: text/plain; charset=utf-8\r\n"
+             b"Content-Length: ")
+_HDR_NOT_MODIFIED = (b"HTTP/1.1 304 Not Modified\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"ETag: ")
+_NO_STORE = b"\r\nCache-Control: no-store\r\n"
+_REVALIDATE = b"\r\nCache-Control: no-cache\r\nETag: "
+_CRLF = b"\r\n"
+_CONN_KEEP = b"Connection: keep-alive\r\n\r\n"
+_CONN_CLOSE = b"Connection: close\r\n\r\n"
+
+def _write(writer, data):
+    global http_bytes_sent
+    http_bytes_sent += len(data)
+    writer.write(data)
+
+async def _send_head(cw, hdr, length, keep_alive, etag=None):
+    # With an ETag the client may cache and revalidate; otherwise never store
+    await cw.write(hdr)
+    await cw.uint(length)
+    if etag:
+        await cw.write(_REVALIDATE)
+        await cw.write(etag)
+        await cw.write(_CRLF)
+    else:
+        await cw.write(_NO_STORE)
+    await cw.write(_CONN_KEEP if keep_alive else _CONN_CLOSE)
+
+async def _send_not_modified(writer, etag, keep_alive):
+    cw = _chunk_acquire()
+    try:
+        cw.bind(writer)
+        await cw.write(_HDR_NOT_MODIFIED)
+        await cw.write(etag)
+        await cw.write(_CRLF)
+        await cw.write(_CONN_KEEP if keep_alive else _CONN_CLOSE)
+        await cw.flush()
+    finally:
+        _chunk_release(cw)
+
+async def _send_response(writer, hdr, payload, keep_alive, etag=None):
+    """Write the head (from one of the _HDR_ constants) and body, then wait
+    until flushed. Accepts str or bytes payloads; encodes str as UTF-8 once.
     """
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    cw = _chunk_acquire()
     try:
-        if isinstance(data, str):
-            data = data.encode('utf-8')
-        mv = memoryview(data)
-        total = len(mv)
-        sent = 0
-        while sent < total:
-            n = conn.send(mv[sent:])
-            if n is None:
-                # Some stacks return None on non-blocking progress; treat as 0
-                n = 0
-            if n <= 0:
-                # Avoid tight spin; yield briefly
-                sleep(0.001)
-                continue
-            sent += n
-    except Exception:
-        # Re-raise to let caller decide how to handle
-        raise
-
-def http_poll_and_respond(build_text, build_json, build_html):
-    """Try to accept a single connection and respond; non-blocking.
-    build_text(): returns plain text status
-    build_json(points:int): returns JSON string with recent data
-    build_html(): returns HTML dashboard page
+        cw.bind(writer)
+        await _send_head(cw, hdr, len(payload), keep_alive, etag)
+        await cw.write(payload)
+        await cw.flush()
+    finally:
+        _chunk_release(cw)
+
+# Output buffers for streamed responses; one per concurrent sender at most
+CHUNK_SIZE = 256
+_chunk_pool = []
+
+def _chunk_acquire():
+    return _chunk_pool.pop() if _chunk_pool else ChunkWriter(CHUNK_SIZE)
+
+def _chunk_release(cw):
+    global http_bytes_sent
+    http_bytes_sent += cw.sent
+    cw.writer = None
+    _chunk_pool.append(cw)
+
+_JSON_SEQ = b'{"seq":'
+_JSON_RES = b',"res":"'
+_JSON_FIELD = b'",'  # closes the res string before the first field
+_JSON_SEP = b','
+_JSON_TIME = b',"time":'
+_JSON_DT = b',"dt":'
+_JSON_END = b'}'
+
+# /data.bin layout: 16-byte header, then count int16 temps, count int16 hums
+# and count u16 time gaps (see lib/timeindex.py for their encoding).
+# Header: magic b"PD", version, resolution in minutes, count (u16), scale (u16),
+# seq (u32), time (u32); little-endian. seq and time are the sequence number
+# and Unix time of the newest point.
+DATA_BIN_HDR = '<2sBBHHII'
+DATA_BIN_MAGIC = b'PD'
+DATA_BIN_VERSION = 3
+
+def data_etag(name, res, n, spec=""):
+    # A tier only changes when a bucket closes or the clock is first set, so
+    # (sensor, res, seq, newest time) identifies it. The reply is its newest
+    # n points, so the window's first sequence number (which points= and
+    # since= come down to) goes in as well; spec is the field list
+    minutes, fields, times = SENSOR_TIERS[name][res]
+    seq = fields[0][1].seq
+    if spec:
+        tag = '"{}-{}-{}-{}-{}-{}"'.format(name, res, seq - n + 1, seq, times.newest, spec)
+    else:
+        tag = '"{}-{}-{}-{}-{}"'.format(name, res, seq - n + 1, seq, times.newest)
+    return tag.encode()
+
+def data_fields(name, res, spec):
+    """(key, series) pairs for /data?fields=a,b,... and the field list as
+    accepted; the tier's own fields when spec is empty or names none.
+
+    Derived fields get a DerivedSeries per sensor and tier on first use.
+    """
+    fields = SENSOR_TIERS[name][res][1]
+    if not spec:
+        return fields, ""
+    out = []
+    names = []
+    for f in spec.split(","):
+        if f in names:
+            continue
+        d = DERIVED_FIELDS.get(f)
+        if d:
+            key = (name, res, f)
+            series = _derived.get(key)
+            if series is None:
+                series = _derived[key] = DerivedSeries(d[1], fields[0][1], fields[1][1])
+            out.append((d[0], series))
+            names.append(f)
+            continue
+        fb = f.encode()
+        for k, series in fields:
+            if k[1:-2] == fb:
+                out.append((k, series))
+                names.append(f)
+                break
+    if not out:
+        return fields, ""
+    return out, ",".join(names)
+
+def select_tier(name, span):
+    """Finest resolution of sensor `name` whose history covers `span` minutes."""
+    tiers = SENSOR_TIERS[name]
+    res = "1m"
+    for res in DATA_RES_ORDER:
+        if res not in tiers:
+            break
+        minutes, fields, times = tiers[res]
+        if span <= minutes * fields[0][1].size:
+            return res
+    return res if res in tiers else "1m"
+
+def data_window(name, res, points, since):
+    """Number of newest points to send: the last `points`, or only those
+    newer than sequence number `since` when the client already has the rest.
+    """
+    series = SENSOR_TIERS[name][res][1][0][1]
+    seq = series.seq
+    n = points if points < len(series) else len(series)
+    if 0 <= since <= seq and seq - since < n:
+        n = seq - since
+    return n
+
+def data_bin_len(n):
+    return struct.calcsize(DATA_BIN_HDR) + 6 * n
+
+def data_window_views(name, res, n, fields):
+    """The newest n points of a tier as (minutes, n, scale, seq, newest time,
+    [(key, views)], time-gap views), each views a pair of memoryviews as
+    from last(). Everything is read at once, so the arrays line up."""
+    minutes, tier_fields, times = SENSOR_TIERS[name][res]
+    first = tier_fields[0][1]
+    return (minutes, n, first.scale, first.seq, times.newest,
+            [(key, series.last(n)) for key, series in fields], times.last(n))
+
+def _copy_views(views, typecode):
+    a, b = views
+    out = array(typecode, a)
+    out.extend(b)
+    return (out,)
+
+def data_snapshot(win):
+    """Copy of a data_window_views() window. store_minute() writes into the
+    rings in place, so a body sent across several writer.drain() calls is
+    written from a copy; that keeps it the length announced in the head."""
+    minutes, n, scale, seq, newest, cols, dts = win
+    return (minutes, n, scale, seq, newest,
+            [(key, _copy_views(views, 'h')) for key, views in cols], _copy_views(dts, 'H'))
+
+async def data_bin_body(cw, win):
+    """Write the window's means as packed little-endian int16 tenths."""
+    minutes, n, scale, seq, newest, cols, dts = win
+    await cw.pack(DATA_BIN_HDR, DATA_BIN_MAGIC, DATA_BIN_VERSION, minutes, n, scale, seq, newest)
+    await cw.int16_list(cols[0][1])
+    await cw.int16_list(cols[1][1])
+    await cw.uint16_list(dts)
+
+def data_json_len(res, win):
+    minutes, n, scale, seq, newest, cols, dts = win
+    length = (len(_JSON_SEQ) + len(str(seq)) + len(_JSON_RES) + len(res)
+              + len(_JSON_FIELD) + len(_JSON_TIME) + len(str(newest)) + len(_JSON_DT)
+              + uint_list_len(iter_deltas(dts)) + len(_JSON_END))
+    for i, (key, views) in enumerate(cols):
+        length += len(key) + tenths_list_len(views)
+        if i:
+            length += len(_JSON_SEP)
+    return length
+
+async def data_json_body(cw, res, win):
+    """Write {"seq":S,"res":R,"t":[...],"h":[...],...,"time":T,"dt":[...]}
+    for the window, one CHUNK_SIZE buffer at a time. Rollup tiers add
+    tmin/tmax/hmin/hmax arrays, and fields= (see data_fields()) replaces
+    them with the ones asked for. time is the newest point's Unix time and
+    dt[i] the seconds from point i-1 to point i (0 if unknown).
     """
-    global server_sock
-    if not server_sock:
+    minutes, n, scale, seq, newest, cols, dts = win
+    await cw.write(_JSON_SEQ)
+    await cw.write(str(seq).encode())
+    await cw.write(_JSON_RES)
+    await cw.write(res.encode())
+    await cw.write(_JSON_FIELD)
+    for i, (key, views) in enumerate(cols):
+        if i:
+            await cw.write(_JSON_SEP)
+        await cw.write(key)
+        await cw.tenths_list(views)
+    await cw.write(_JSON_TIME)
+    await cw.write(str(newest).encode())
+    await cw.write(_JSON_DT)
+    await cw.uint_list(iter_deltas(dts))
+    await cw.write(_JSON_END)
+
+# Encoded /data and /data.bin bodies, keyed by the normalised request and the
+# tier's sequence number. The data only changes when a minute closes (or the
+# clock is set), so pollers between minutes get a copy instead of a fresh
+# serialisation; store_minute() and _clock_moved() empty it. Bodies over half
+# the budget (a full day of JSON, say) are never held: they are streamed from
+# a data_snapshot() copy of the window instead.
+DATA_CACHE_BYTES = 16 * 1024
+data_cache = ResponseCache(DATA_CACHE_BYTES)
+
+async def _send_data(writer, hdr, length, keep_alive, etag, key, body_fn, *args):
+    """Send a head and the `length`-byte body that body_fn(cw, *args)
+    writes. A body that fits data_cache is rendered once into it under key
+    and sent from there; a larger one is streamed."""
+    cw = _chunk_acquire()
+    try:
+        body = None
+        if data_cache.fits(length):
+            out = BodyBuffer(length)
+            cw.bind(out)
+            await body_fn(cw, *args)
+            await cw.flush()
+            body = out.buf
+            data_cache.put(key, body)
+        cw.bind(writer)
+        await _send_head(cw, hdr, length, keep_alive, etag)
+        if body is None:
+            await body_fn(cw, *args)
+        else:
+            await cw.write(body)
+        await cw.flush()
+    finally:
+        _chunk_release(cw)
+
+# ---- Static dashboard assets ----
+# tools/build_web.py gzips web/ into www/ with a manifest (www/assets.json).
+# Headers are built once at boot; serving a page is one streamed flash read.
+# A single byte range (Range: bytes=...) is served as a 206 from the same file.
+# The page also has a plain copy for clients that do not take gzip (curl).
+WWW_DIR = "www"
+# (url, gzipped copy, plain copy or None); url is bytes to match against the
+# request buffer. A copy is (file path, 200 head up to Connection, etag,
+# size, 206 head up to the range, 304 head up to Connection), etag bytes.
+static_assets = []
+static_index = None  # the "/" entry, served for unknown paths
+_HDR_RANGE_BAD = (b"HTTP/1.1 416 Range Not Satisfiable\r\n"
+                  b"Content-Range: bytes */")
+_RANGE_LEN = b"\r\nContent-Length: "
+
+def _static_copy(a, copy, encoding):
+    # Heads for one stored copy of manifest entry a; a 304 carries the same
+    # caching headers as the 200, so immutable assets stay immutable
+    vary = "Vary: Accept-Encoding\r\n" if "plain" in a else ""
+    cache = "ETag: {}\r\nCache-Control: {}\r\n{}".format(copy["etag"], a["cache"], vary)
+    common = "Content-Type: {}\r\n{}Accept-Ranges: bytes\r\n{}".format(a["type"], encoding, cache)
+    hdr = "HTTP/1.1 200 OK\r\n{}Content-Length: {}\r\n".format(common, copy["size"])
+    partial = "HTTP/1.1 206 Partial Content\r\n{}Content-Range: bytes ".format(common)
+    not_modified = "HTTP/1.1 304 Not Modified\r\n" + cache
+    return (WWW_DIR + "/" + copy["file"], hdr.encode(), copy["etag"].encode(), copy["size"],
+            partial.encode(), not_modified.encode())
+
+def load_static_assets():
+    global static_index
+    try:
+        with open(WWW_DIR + "/assets.json") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print("No dashboard assets in /{} ({}); run tools/build_web.py".format(WWW_DIR, e))
+        return
+    for url, a in manifest.items():
+        plain = a.get("plain")
+        asset = (url.encode(), _static_copy(a, a, "Content-Encoding: gzip\r\n"),
+                 _static_copy(a, plain, "") if plain else None)
+        static_assets.append(asset)
+        if url == "/":
+            static_index = asset
+
+async def send_static(writer, asset, req, keep_alive):
+    url, gz, plain = asset
+    # A client whose Accept-Encoding does not list gzip gets the plain copy
+    # if there is one; otherwise the gzipped one, which every browser takes
+    path, hdr, etag, size, partial, not_modified = plain if plain and not req.gzip else gz
+    if req.etag_is(etag):
+        cw = _chunk_acquire()
+        try:
+            cw.bind(writer)
+            await cw.write(not_modified)
+            await cw.write(_CONN_KEEP if keep_alive else _CONN_CLOSE)
+            await cw.flush()
+        finally:
+            _chunk_release(cw)
         return
+    lo = req.range_lo
+    hi = req.range_hi
+    cw = _chunk_acquire()
     try:
-        conn, addr = server_sock.accept()
-    except Exception:
-        return  # nothing to accept right now
+        cw.bind(writer)
+        if lo < 0 and hi < 0:
+            await cw.write(hdr)
+            await cw.write(_CONN_KEEP if keep_alive else _CONN_CLOSE)
+            with open(path, "rb") as f:
+                await cw.copy_from(f)
+            return
+        if lo < 0:  # the last hi bytes
+            lo = size - hi if hi < size else 0
+            hi = size - 1
+        elif hi < 0 or hi >= size:
+            hi = size - 1
+        if lo >= size:
+            await cw.write(_HDR_RANGE_BAD)
+            await cw.uint(size)
+            await cw.write(_RANGE_LEN)
+            await cw.uint(0)
+            await cw.write(_CRLF)
+            await cw.write(_CONN_KEEP if keep_alive else _CONN_CLOSE)
+            await cw.flush()
+            return
+        await cw.write(partial)
+        await cw.uint(lo)
+        await cw.write(b"-")
+        await cw.uint(hi)
+        await cw.write(b"/")
+        await cw.uint(size)
+        await cw.write(_RANGE_LEN)
+        await cw.uint(hi - lo + 1)
+        await cw.write(_CRLF)
+        await cw.write(_CONN_KEEP if keep_alive else _CONN_CLOSE)
+        with open(path, "rb") as f:
+            f.seek(lo)
+            await cw.copy_from(f, hi - lo + 1)
+    finally:
+        _chunk_release(cw)
+
+async def _close(writer):
     try:
-        conn.settimeout(0.5)
-        req = conn.recv(512)  # Read request head
-        if not req:
+        writer.close()
+        await writer.wait_closed()
+    except Exception:
+        pass
+
+def _parse_data_query(req):
+    """Parse a /data query into (sensor, res, n, since, fields).
+
+    sensor=NAME (or its index) picks a probe, the primary by default.
+    points=N asks for N points; span=M asks for M minutes instead. res picks
+    a tier (1m, 10m, 1h; extra probes only keep 1m); without it the finest
+    tier covering the span is used. since=SEQ (default -1) limits the reply
+    to newer points. fields=t,h,dp,... is passed through for data_fields().
+    Values are read from the request buffer; only fields= becomes a str.
+    """
+    name = req.param_choice(b"sensor", SENSOR_NAMES)
+    if name is None:
+        i = req.int_param(b"sensor", 0)
+        name = channels[i if 0 <= i < len(channels) else 0].name
+    res = req.param_choice(b"res", RES_NAMES)
+    spec = req.param_str(b"fields")
+    # Clamped to [10, POINTS_MAX] for backwards compatibility
+    points = req.int_param(b"points", POINTS_DEFAULT)
+    if points < 10:
+        points = 10
+    elif points > POINTS_MAX:
+        points = POINTS_MAX
+    span = req.int_param(b"span", None)
+    if span is None:
+        span = -1
+    elif span < 1:
+        span = 1
+    since = req.int_param(b"since", -1)
+    tiers = SENSOR_TIERS[name]
+    if res is None or res not in tiers:
+        res = select_tier(name, span) if span > 0 else "1m"
+    if span > 0:
+        minutes = tiers[res][0]
+        points = (span + minutes - 1) // minutes
+    return name, res, points, since, spec
+
+async def _serve_data(writer, req, keep_alive, binary):
+    name, res, points, since, spec = _parse_data_query(req)
+    fields = None
+    if binary:
+        spec = ""  # /data.bin has a fixed layout
+    else:
+        fields, spec = data_fields(name, res, spec)
+    n = data_window(name, res, points, since)
+    etag = data_etag(name, res, n, spec)
+    if req.etag_is(etag):
+        await _send_not_modified(writer, etag, keep_alive)
+        return
+    key = (name, res, n, spec, binary, SENSOR_TIERS[name][res][1][0][1].seq)
+    body = data_cache.get(key)
+    if body is not None:
+        await _send_response(writer, _HDR_BIN if binary else _HDR_JSON, body, keep_alive, etag)
+        return
+    if binary:
+        win = data_window_views(name, res, n, SENSOR_TIERS[name][res][1][:2])
+        length = data_bin_len(n)
+    else:
+        win = data_window_views(name, res, n, fields)
+        length = data_json_len(res, win)
+    # Rendering into the cache never yields, so a body that fits is written
+    # from the ring buffers. A larger one is streamed across writer.drain()
+    # calls while a minute may close, so it comes from a copy of the window
+    if not data_cache.fits(length):
+        win = data_snapshot(win)
+    if binary:
+        await _send_data(writer, _HDR_BIN, length, keep_alive, etag, key, data_bin_body, win)
+    else:
+        await _send_data(writer, _HDR_JSON, length, keep_alive, etag, key,
+                         data_json_body, res, win)
+
+async def _get_data(writer, req, keep_alive):
+    await _serve_data(writer, req, keep_alive, False)
+
+async def _get_data_bin(writer, req, keep_alive):
+    await _serve_data(writer, req, keep_alive, True)
+
+async def _get_metrics(writer, req, keep_alive):
+    await send_metrics(writer, keep_alive)
+
+async def _get_time(writer, req, keep_alive):
+    # POST /time?epoch=S sets the clock if nothing has yet (a clock set by a
+    # client stays until NTP replaces it); any request gets the time back
+    epoch = req.int_param(b"epoch", -1) if req.post else -1
+    if epoch >= 0 and not clock_source:
+        set_clock_epoch(epoch)
+    payload = json.dumps({"time": wall_time(), "clock": clock_source})
+    await _send_response(writer, _HDR_JSON, payload, keep_alive)
+
+async def _get_text(writer, req, keep_alive):
+    await _send_response(writer, _HDR_TEXT, build_status_text(temp, hum), keep_alive)
+
+async def _get_info(writer, req, keep_alive):
+    await _send_response(writer, _HDR_JSON, build_info_json(), keep_alive)
+
+async def _get_stats(writer, req, keep_alive):
+    await _send_response(writer, _HDR_JSON, build_stats_json(), keep_alive)
+
+# Path, http_requests label, handler(writer, req, keep_alive). /stream takes
+# over the connection, so http_handle dispatches it itself.
+ROUTES = (
+    (b"/data", "/data", _get_data),
+    (b"/data.bin", "/data.bin", _get_data_bin),
+    (b"/text", "/text", _get_text),
+    (b"/metrics", "/metrics", _get_metrics),
+    (b"/time", "/time", _get_time),
+    (b"/info", "/info", _get_info),
+    (b"/stats", "/stats", _get_stats),
+)
+
+async def _route(writer, req, keep_alive):
+    """Send the response for one parsed request."""
+    for path, label, handler in ROUTES:
+        if req.path_is(path):
+            http_requests[label] += 1
+            await handler(writer, req, keep_alive)
             return
-        # Parse very small subset of HTTP
+    # Static assets; anything unknown gets the dashboard
+    asset = None
+    for a in static_assets:
+        if req.path_is(a[0]):
+            asset = a
+            break
+    http_requests["static" if asset else "other"] += 1
+    asset = asset or static_index
+    if asset:
+        await send_static(writer, asset, req, keep_alive)
+        return
+    await _send_response(writer, _HDR_TEXT,
+                         "Dashboard not installed; copy www/ to the board.\n", keep_alive)
+
+_METRICS_HDR = (b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                b"Transfer-Encoding: chunked\r\n"
+                b"Cache-Control: no-store\r\n")
+
+def metrics_blocks():
+    """Yield /metrics text in pieces of at most one histogram each."""
+    for block in histogram_family("pico_stage_seconds",
+                                  "Time spent in each main-loop stage.",
+                                  "stage", STAGES):
+        yield block
+    yield sample_family("pico_sensor_reads_total", "Sensor reads attempted.",
+                        "counter",
+                        [('sensor="{}"'.format(ch.name), ch.reads) for ch in channels])
+    yield sample_family("pico_sensor_errors_total", "Sensor reads that failed.",
+                        "counter",
+                        [('sensor="{}"'.format(ch.name), ch.errors) for ch in channels])
+    yield sample_family("pico_sensor_interval_seconds",
+                        "Current read interval (stretched while readings hold steady).",
+                        "gauge",
+                        [('sensor="{}"'.format(ch.name), ch.interval / 1000) for ch in channels])
+    yield sample_family("pico_sensor_speedups_total",
+                        "Times a moving reading cut the read interval back to the base.",
+                        "counter",
+                        [('sensor="{}"'.format(ch.name), ch.speedups) for ch in channels])
+    yield sample_family("pico_sensor_missed_total",
+                        "Sensor read slots skipped because the sampler ran late.",
+                        "counter",
+                        [('sensor="{}"'.format(ch.name), ch.missed) for ch in channels])
+    if first_sample_ms >= 0:
+        yield sample_family("pico_first_sample_seconds",
+                            "Time from boot to the first good primary reading.",
+                            "gauge", (("", first_sample_ms / 1000),))
+    yield sample_family("pico_wifi_state", "Wi-Fi state machine state (1 for the current one).",
+                        "gauge",
+                        [('state="{}"'.format(n), int(i == wifi_state))
+                         for i, n in enumerate(WIFI_STATE_NAMES)])
+    yield sample_family("pico_wifi_connects_total", "Wi-Fi connects by result.",
+                        "counter", (('result="ok"', wifi_connects),
+                                    ('result="failed"', wifi_failures)))
+    yield sample_family("pico_wifi_drops_total", "Times the Wi-Fi link was lost.",
+                        "counter", (("", wifi_drops),))
+    yield sample_family("pico_http_requests_total", "HTTP requests by route.",
+                        "counter",
+                        [('path="{}"'.format(k), v) for k, v in http_requests.items()])
+    yield sample_family("pico_http_sent_bytes_total", "HTTP response bytes written.",
+                        "counter", (("", http_bytes_sent),))
+    yield sample_family("pico_http_connections", "Open HTTP connections.",
+                        "gauge", (("", http_active),))
+    yield sample_family("pico_stream_subscribers", "Open /stream connections.",
+                        "gauge", (("", stream_subscribers),))
+    yield sample_family("pico_stream_dropped_total",
+                        "/stream subscribers dropped for not keeping up.",
+                        "counter", (("", stream_dropped),))
+    yield sample_family("pico_data_cache_lookups_total",
+                        "/data and /data.bin body cache lookups.",
+                        "counter", (('result="hit"', data_cache.hits),
+                                    ('result="miss"', data_cache.misses)))
+    yield sample_family("pico_data_cache_bytes", "Bytes held in cached /data bodies.",
+                        "gauge", (("", data_cache.held),))
+    yield sample_family("pico_lightsleep_seconds_total", "Time spent in machine.lightsleep.",
+                        "counter", (("", slept_ms / 1000),))
+    yield sample_family("pico_lightsleeps_total", "machine.lightsleep calls.",
+                        "counter", (("", naps),))
+    yield sample_family("pico_duty_cycle",
+                        "Awake share of the last minute, and of the last hour.",
+                        "gauge", (('window="1m"', duty_permille / 1000),
+                                  ('window="1h"', awake_s_per_hour() / 3600)))
+    yield sample_family("pico_awake_seconds_per_hour",
+                        "Estimated awake time per hour, from the minutes of the last hour.",
+                        "gauge", (("", awake_s_per_hour()),))
+    yield sample_family("pico_gc_collections_total",
+                        "Heap collections: explicit, plus automatic ones inferred "
+                        "from free heap growing between sampler ticks.",
+                        "counter", (("", gc_collections),))
+    yield sample_family("pico_heap_free_bytes", "Free heap now and its low-water mark.",
+                        "gauge", (('kind="now"', gc.mem_free()), ('kind="low"', mem_min_free)))
+    yield sample_family("pico_oled_sent_bytes_total", "Bytes written to the OLED bus.",
+                        "counter", (("", oled.bytes_sent),))
+    yield sample_family("pico_flash_writes_total", "Flash log appends issued.",
+                        "counter", (("", flash_writes()),))
+    yield sample_family("pico_minutes_stored_total", "Minute aggregates recorded.",
+                        "counter", (("", readings_count),))
+
+async def send_metrics(writer, keep_alive):
+    """Stream the metrics with chunked encoding, so the page is never held
+    in RAM whole and needs no length up front."""
+    _write(writer, _METRICS_HDR)
+    _write(writer, _CONN_KEEP if keep_alive else _CONN_CLOSE)
+    for block in metrics_blocks():
+        data = block.encode()
+        _write(writer, "{:x}\r\n".format(len(data)).encode())
+        _write(writer, data)
+        _write(writer, b"\r\n")
+        await writer.drain()
+    _write(writer, b"0\r\n\r\n")
+    await writer.drain()
+
+# ---- Server-Sent Events (/stream) ----
+# Subscribers sit in Event.wait() until the aggregator closes a minute and
+# publishes one small event, formatted once for all of them. Between minutes
+# a subscriber costs a keep-alive comment every STREAM_KEEPALIVE_S, which
+# also finds clients that went away.
+STREAM_MAX_SUBSCRIBERS = 4  # counted within HTTP_MAX_CONNECTIONS
+STREAM_KEEPALIVE_S = 30
+STREAM_SEND_TIMEOUT = 2  # seconds a subscriber may take to accept an event
+stream_subscribers = 0
+stream_dropped = 0  # subscribers cut off for not keeping up
+stream_event = asyncio.Event()
+stream_payload = b""  # newest event
+stream_seq = 0  # events published; a subscriber compares it with its own
+_STREAM_HDR = (b"HTTP/1.1 200 OK\r\n"
+               b"Content-Type: text/event-stream\r\n"
+               b"Cache-Control: no-store\r\n"
+               b"Connection: close\r\n\r\n"
+               b"retry: 5000\n\n")
+_STREAM_PING = b": ping\n\n"
+
+def stream_publish(seq, ts, dt, t, h):
+    """Wake every subscriber with the minute just closed (raw tenths)."""
+    global stream_payload, stream_seq
+    stream_payload = (
+        'id: {}\nevent: minute\n'
+        'data: {{"seq":{},"time":{},"dt":{},"t":{:.1f},"h":{:.1f}}}\n\n'
+    ).format(seq, seq, ts, dt, t / 10, h / 10).encode()
+    stream_seq += 1
+    stream_event.set()
+    stream_event.clear()
+
+async def send_stream(writer):
+    """Hold the connection open and push each published event to it."""
+    global stream_subscribers, stream_dropped
+    if stream_subscribers >= STREAM_MAX_SUBSCRIBERS:
+        await _send_response(writer, _HDR_BUSY, "too many streams\n", False)
+        return
+    stream_subscribers += 1
+    try:
+        _write(writer, _STREAM_HDR)
+        if stream_payload:
+            _write(writer, stream_payload)
+        sent = stream_seq
+        await writer.drain()
+        while True:
+            # The sequence check, not the wake-up, decides what to send: a
+            # keep-alive timeout and a publish can land on the same tick
+            if sent == stream_seq:
+                try:
+                    await asyncio.wait_for(stream_event.wait(), STREAM_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    pass
+            if sent != stream_seq:
+                sent = stream_seq
+                data = stream_payload
+            else:
+                data = _STREAM_PING
+            _write(writer, data)
+            try:
+                await asyncio.wait_for(writer.drain(), STREAM_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                # Slow consumer: drop it rather than buffer for it
+                stream_dropped += 1
+                return
+    except OSError:
+        pass  # client went away
+    finally:
+        stream_subscribers -= 1
+
+def _req_acquire():
+    return _req_pool.pop() if _req_pool else Request(HTTP_HEAD_MAX)
+
+def _req_release(req):
+    req.reset()
+    _req_pool.append(req)
+
+async def http_handle(reader, writer):
+    """Serve requests on an accepted connection until it closes or idles out.
+    Runs as its own task, so slow clients never hold up sampling, display or
+    other clients. HTTP/1.1 connections are kept alive for HTTP_IDLE_TIMEOUT.
+    Each head is read into a pooled Request and parsed in place.
+    """
+    global http_active
+    if http_active >= HTTP_MAX_CONNECTIONS:
         try:
-            first = req.split(b"\r\n", 1)[0]
-            parts = first.split()
-            method = parts[0].decode()
-            target = parts[1].decode() if len(parts) > 1 else "/"
+            await _send_response(writer, _HDR_BUSY, "busy\n", False)
         except Exception:
-            method = "GET"
-            target = "/"
-
-        path, _, query = target.partition("?")
-
-        if path == "/data":
-            # Parse points=N
-            points = POINTS_DEFAULT
-            if query:
-                for kv in query.split("&"):
-                    k, _, v = kv.partition("=")
-                    if k == "points":
-                        try:
-                            points = int(v)
-                        except Exception:
-                            points = POINTS_DEFAULT
-            if points < 10:
-                points = 10
-            if points > POINTS_MAX:
-                points = POINTS_MAX
-            payload = build_json(points)
-            hdr = (
-                "HTTP/1.1 200 OK\r\n"
-                "Content-Type: application/json; charset=utf-8\r\n"
-                "Connection: close\r\n"
-                "Cache-Control: no-store\r\n\r\n"
-            )
-            _send_all(conn, hdr)
-            # Allow a little more time for larger JSON bodies
+            pass
+        await _close(writer)
+        return
+    http_active += 1
+    req = _req_acquire()
+    try:
+        served = 0
+        keep_alive = True
+        while keep_alive and served < HTTP_KEEPALIVE_MAX:
+            # First request gets the short read timeout; later ones may idle
+            wait = HTTP_READ_TIMEOUT if served == 0 else HTTP_IDLE_TIMEOUT
             try:
-                conn.settimeout(2)
-            except Exception:
-                pass
-            _send_all(conn, payload)
-        elif path == "/text":
-            payload = build_text()
-            hdr = (
-                "HTTP/1.1 200 OK\r\n"
-                "Content-Type: text/plain; charset=utf-8\r\n"
-                "Connection: close\r\n"
-                "Cache-Control: no-store\r\n\r\n"
-            )
-            _send_all(conn, hdr)
-            _send_all(conn, payload)
-        else:
-            # default dashboard
-            payload = build_html()
-            hdr = (
-                "HTTP/1.1 200 OK\r\n"
-                "Content-Type: text/html; charset=utf-8\r\n"
-                "Connection: close\r\n"
-                "Cache-Control: no-store\r\n\r\n"
-            )
-            _send_all(conn, hdr)
-            _send_all(conn, payload)
+                if not await asyncio.wait_for(req.read(reader), wait):
+                    break
+            except ValueError:
+                # Head larger than HTTP_HEAD_MAX
+                await _send_response(writer, _HDR_TOO_LARGE, "request head too large\n", False)
+                break
+            t0 = ticks_us()
+            served += 1
+            # A request body is never read, so a POST ends the connection
+            keep_alive = req.keep_alive and served < HTTP_KEEPALIVE_MAX and not req.post
+            if req.bad:
+                http_requests["other"] += 1
+                await _send_response(writer, _HDR_BAD_REQUEST, "bad request\n", False)
+                break
+            if req.path_is(b"/stream"):
+                # The connection belongs to the stream from here on
+                http_requests["/stream"] += 1
+                await send_stream(writer)
+                break
+            await _route(writer, req, keep_alive)
+            stage_http.observe(ticks_diff(ticks_us(), t0))
+    except asyncio.TimeoutError:
+        pass  # idle keep-alive connection or stalled client
     except Exception as e:
         try:
-            conn.send("HTTP/1.1 500 Internal Server Error\r\nConnection: close\r\n\r\n")
+            await _send_response(writer, _HDR_ERROR, "error\n", False)
         except Exception:
             pass
         print("HTTP handler error:", e)
     finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+        http_active -= 1
+        _req_release(req)
+        await _close(writer)
 
-# DHT Sensor
-#sensor = dht.DHT22(Pin(22))
-sensor = dht.DHT11(Pin(6))
+# DHT probes: (name, part, GPIO). The first is the primary probe: it drives
+# the OLED, LEDs and serial log and feeds the rollup tiers and flash log.
+# The others keep SENSOR_POINTS minutes each, served by /data?sensor=NAME.
+SENSORS = (
+    ("s0", "DHT11", 6),
+    #("s1", "DHT22", 22),
+)
+SENSOR_POINTS = 720  # 12 h of minute means per extra probe (~2.9 KB)
 gled = machine.Pin(18, machine.Pin.OUT)
 rled = machine.Pin(19, machine.Pin.OUT)
 bled = machine.Pin(20, machine.Pin.OUT)
@@ -219,21 +878,27 @@ avgHum30m = 0
 
 randomX = 0
 randomY = 0
-avgTemp = 0
-avgHum = 0
+# Mean of the last minute of readings in tenths, from temp_1m/hum_1m below;
+# ints so the per-tick update allocates nothing
+avgTemp10 = 0
+avgHum10 = 0
 avgTemp60s = 0
 avgHum60s = 0
 
-# Minute aggregation accumulators
-minute_temp_sum = 0.0
-minute_hum_sum = 0.0
-minute_sample_count = 0
+# Latest sensor reading, shared between tasks
+temp = 0
+hum = 0
 
 # OLED burn-in mitigation: jitter settings
-# Move the on-screen text every N seconds to spread pixel wear
+# Move the on-screen text every N seconds to spread pixel wear. The text is
+# drawn at the origin and moved with oled.jitter(): a vertical move is one
+# command byte, a horizontal one resends the columns the text covers, so the
+# text only moves sideways every JITTER_X_EVERY moves.
 JITTER_SECONDS = 10  # default ~10s; keep small to reduce static image time
 JITTER_X_MAX = 100    # horizontal jitter range (pixels)
-JITTER_Y_MAX = 45    # vertical jitter range (pixels; allow two 8px lines)
+JITTER_Y_MAX = HEIGHT - 28    # vertical jitter range (pixels; three lines fit, rows wrap past it)
+JITTER_X_EVERY = 6
+jitterCount = 0
 
 # OLED power cycling to mitigate burn-in: 15s off, 15s on
 OLED_ON_SECONDS = 15
@@ -251,7 +916,40 @@ MINUTES_60 = 60
 # Convenience conversion for the hour-scale second counter
 SECONDS_60M = MINUTES_60 * SAMPLES_PER_MINUTE
 
-# Values 5, 10 and 30 minutes ago
+# Serial status line every N seconds; 0 turns it off. Printing every tick
+# floods the REPL for no benefit.
+SERIAL_LOG_SECONDS = 10
+
+# Task periods (ms); each task runs on its own fixed deadline
+SAMPLE_PERIOD_MS = 1000
+DISPLAY_PERIOD_MS = 1000
+AGGREGATE_PERIOD_MS = SAMPLES_PER_MINUTE * SAMPLE_PERIOD_MS
+
+# Battery units: let each probe's read interval stretch up to
+# ADAPTIVE_MAX_MS while its readings hold steady (lib/sensors.py ADAPT_*),
+# and lightsleep between task deadlines while no HTTP connection is open.
+# Both are off by default; a mains-powered board gains nothing from them.
+ADAPTIVE_SAMPLING = False
+ADAPTIVE_MAX_MS = 8000
+LIGHTSLEEP = False
+LIGHTSLEEP_MIN_MS = 20  # shorter gaps are left to the event loop
+
+# Wi-Fi state machine (wifi_step). A connect is started and then polled
+# until the driver reports an address, a failure or the timeout; failures
+# back off, doubling up to the cap, plus up to half again of random jitter
+# so boards that lost the same access point do not retry in step.
+WIFI_DOWN = 0        # start a connect on the next step
+WIFI_CONNECTING = 1
+WIFI_UP = 2
+WIFI_BACKOFF = 3
+WIFI_STATE_NAMES = ("down", "connecting", "up", "backoff")
+WIFI_POLL_MS = 250   # status polls while connecting
+WIFI_CHECK_MS = 2000  # link checks while up
+WIFI_CONNECT_TIMEOUT_MS = 15000
+WIFI_BACKOFF_MS = 2000
+WIFI_BACKOFF_MAX_MS = 60000
+
+# Means over the last 5, 10, 30 and 60 minutes (None until a window fills)
 temp5m = ''
 hum5m = ''
 temp10m = ''
@@ -260,13 +958,152 @@ temp30m = ''
 hum30m = ''
 temp60m = ''
 hum60m = ''
+# Display form of the history above (" t5 t10 t30 t60"); rebuilt only when
+# a minute closes so the per-tick draw reuses the same strings
+hist_temp_text = " -- -- -- --"
+hist_hum_text = " -- -- -- --"
+
+# Trailing-window statistics (tenths): every reading over the last minute,
+# and the minute entries over the windows above, with each minute's own
+# min/max for the extremes. O(1) per sample, see lib/winstats.py.
+STATS_WINDOWS = (MINUTES_5, MINUTES_10, MINUTES_30, MINUTES_60)
+temp_1m = WindowStats((SAMPLES_PER_MINUTE,))
+hum_1m = WindowStats((SAMPLES_PER_MINUTE,))
+temp_stats = WindowStats(STATS_WINDOWS)
+hum_stats = WindowStats(STATS_WINDOWS)
 
 # Fixed-size circular buffers, for storing the humidity and temperature readings
-# Minute-averaged circular buffer (slightly oversized for wrap clarity)
-buffer_size = POINTS_MAX + 1
-tempList = [0] * buffer_size
-humList = [0] * buffer_size
-current_index = 0
+# Minute averages kept as int16 tenths (see lib/ringseries.py)
+buffer_size = POINTS_MAX
+
+def _make_channels():
+    # Reads are staggered evenly over one sample period, so a pass never
+    # blocks on more than one probe; each part keeps its minimum interval
+    start = ticks_ms()
+    out = []
+    for i, (name, part, pin) in enumerate(SENSORS):
+        interval = MIN_INTERVAL_MS.get(part, SAMPLE_PERIOD_MS)
+        if interval < SAMPLE_PERIOD_MS:
+            interval = SAMPLE_PERIOD_MS
+        out.append(Channel(name, getattr(dht, part)(Pin(pin)), interval,
+                           ticks_add(start, i * SAMPLE_PERIOD_MS // len(SENSORS)),
+                           buffer_size if i == 0 else SENSOR_POINTS,
+                           ADAPTIVE_MAX_MS if ADAPTIVE_SAMPLING else 0))
+    return out
+
+channels = _make_channels()
+primary = channels[0]
+temp_series = primary.temp_series
+hum_series = primary.hum_series
+
+# Persistent minute log on flash (lib/flashlog.py); history is rebuilt from it
+# at boot. Up to LOG_BATCH minutes are lost on power failure.
+LOG_DIR = "log"
+LOG_SEGMENT_RECORDS = 720  # 12 h per segment file
+LOG_SEGMENTS = 4           # keep 48 h on flash (~58 KB)
+LOG_BATCH = 10             # minutes buffered in RAM between flash writes
+flash_log = None
+
+# Rollup tiers fed from the minute series: each bucket keeps min/max/mean/count
+# per channel (temp, hum) over one slot of wall time, 10-minute slots for 7
+# days and hourly ones for 30 days. Slots with no minutes are left out.
+TIER_10M_SIZE = 7 * 24 * 6
+TIER_1H_SIZE = 30 * 24
+tier_10m = RollupTier(TIER_10M_SIZE, 600)
+tier_1h = RollupTier(TIER_1H_SIZE, 3600)
+# The end of each bucket's slot (lib/timeindex.py)
+tier_10m_times = TimeIndex(TIER_10M_SIZE)
+tier_1h_times = TimeIndex(TIER_1H_SIZE)
+# Closed buckets are logged too (same records: bucket seq and slot end), in
+# subdirectories of LOG_DIR, so the tiers outlive the minute log's 48 h.
+# Buckets a reboot loses from a batch are rebuilt from the log below.
+LOG_10M_RECORDS = 144  # a day of 10-minute buckets per segment
+LOG_10M_SEGMENTS = 8   # 7 days plus the segment being written (~28 KB)
+LOG_1H_RECORDS = 120   # 5 days of hourly buckets per segment
+LOG_1H_SEGMENTS = 7    # 30 days plus the segment being written (~20 KB)
+LOG_TIER_BATCH = 6     # buckets buffered between flash writes
+tier_10m_log = None
+tier_1h_log = None
+
+# /data resolutions: minutes per point, (json key, series) per field and the
+# entries' timestamps
+DATA_RES_ORDER = ("1m", "10m", "1h")
+
+def _tier_fields(tier):
+    return (
+        (b'"t":', tier.mean[0]), (b'"h":', tier.mean[1]),
+        (b'"tmin":', tier.min[0]), (b'"tmax":', tier.max[0]),
+        (b'"hmin":', tier.min[1]), (b'"hmax":', tier.max[1]),
+    )
+
+DATA_TIERS = {
+    "1m": (1, ((b'"t":', temp_series), (b'"h":', hum_series)), primary.times),
+    "10m": (10, _tier_fields(tier_10m), tier_10m_times),
+    "1h": (60, _tier_fields(tier_1h), tier_1h_times),
+}
+SPAN_MAX = 60 * TIER_1H_SIZE  # minutes of history the coarsest tier covers
+
+# /data?fields= extras computed from each point's temperature and RH: json
+# key and function. Their series are made per sensor and tier on first use
+# (2 bytes per point of that tier) and only convert points added since.
+DERIVED_FIELDS = {
+    "dp": (b'"dp":', dew_point),
+    "ah": (b'"ah":', absolute_humidity),
+    "hi": (b'"hi":', heat_index),
+}
+_derived = {}  # (sensor, res, field) -> DerivedSeries
+
+# /data?sensor= lookup: the primary gets every tier, other probes 1m only
+SENSOR_TIERS = {primary.name: DATA_TIERS}
+for ch in channels[1:]:
+    SENSOR_TIERS[ch.name] = {
+        "1m": (1, ((b'"t":', ch.temp_series), (b'"h":', ch.hum_series)), ch.times),
+    }
+# sensor= and res= values as matched in the request buffer
+SENSOR_NAMES = tuple((name.encode(), name) for name in SENSOR_TIERS)
+RES_NAMES = tuple((res.encode(), res) for res in DATA_RES_ORDER)
+
+# ---- Wall clock ----
+# Entries are stamped with Unix time from the RTC, which starts from a fixed
+# date at power-up. NTP sets it once Wi-Fi is up; failing that, the first
+# client to POST /time?epoch=S does (the dashboard does so when /info shows
+# no clock), and later ones are ignored. Entries stamped before then are
+# shifted along with the clock.
+EPOCH_OFFSET = 946684800 if gmtime(0)[0] == 2000 else 0  # 2000-based ports
+clock_source = ""  # "ntp" or "client" once set
+TIME_INDEXES = [tier_10m_times, tier_1h_times] + [ch.times for ch in channels]
+
+def wall_time():
+    return int(time()) + EPOCH_OFFSET
+
+def _clock_moved(shift, source):
+    global clock_source
+    if not clock_source:
+        for idx in TIME_INDEXES:
+            idx.rebase(shift)
+        tier_10m.rebase(shift)
+        tier_1h.rebase(shift)
+        data_cache.clear()
+    clock_source = source
+
+def sync_clock_ntp():
+    """Set the RTC from NTP; blocks for up to about a second."""
+    if ntptime is None:
+        return
+    before = wall_time()
+    try:
+        ntptime.settime()
+    except Exception as e:
+        print("NTP error:", e)
+        return
+    _clock_moved(wall_time() - before, "ntp")
+
+def set_clock_epoch(epoch):
+    """Set the RTC from a client-supplied Unix time."""
+    before = wall_time()
+    tm = gmtime(epoch - EPOCH_OFFSET)
+    machine.RTC().datetime((tm[0], tm[1], tm[2], tm[6], tm[3], tm[4], tm[5], 0))
+    _clock_moved(wall_time() - before, "client")
 
 # Turn all LED's off
 def led_off():
@@ -274,62 +1111,25 @@ def led_off():
     rled.low()
     bled.low()
 
-# Small OLED helper for brief status messages at boot
-def _oled_status(line1: str, line2: str = "", line3: str = ""):
-    try:
-        oled.fill(0)
-        oled.contrast(1)
-        if line1:
-            oled.text(line1, 0, 0)
-        if line2:
-            oled.text(line2, 0, 10)
-        if line3:
-            oled.text(line3, 0, 20)
-        oled.show()
-    except Exception:
-        # If display isn't ready or errors, ignore silently
-        pass
-
-# Try WiFi + HTTP once at boot if credentials exist
+# WiFi interface; created by the first wifi_step()
 wlan = None
-if WIFI_SSID and WIFI_PASSWORD:
-    # Show quick connection status on OLED
-    _oled_status("Connecting to WiFi", "...please wait")
-    wlan = connect_wifi(WIFI_SSID, WIFI_PASSWORD)
-    if wlan and wlan.isconnected():
-        # Try to gather connection details
-        ip = None
-        rssi = None
-        try:
-            ip = wlan.ifconfig()[0]
-        except Exception:
-            ip = None
-        try:
-            # RSSI may not be supported on all ports
-            rssi = wlan.status('rssi')
-        except Exception:
-            rssi = None
-        # Show IP on line 2; RSSI on line 3 if available
-        line2 = ("IP:" + ip) if ip else ""
-        line3 = ("RSSI:{} dBm".format(rssi)) if rssi is not None else ""
-        _oled_status("WiFi Connected", line2, line3)
-        # Keep the message visible ~10 seconds
-        for _ in range(10):
-            sleep(1)
-        start_http_server()
-    else:
-        _oled_status("WiFi connect failed", "HTTP disabled")
-else:
-    _oled_status("No WiFi credentials", "HTTP disabled")
-    print("No WiFi credentials found in secrets.py; HTTP disabled.")
+wifi_state = WIFI_DOWN
+wifi_until = 0     # ticks_ms: connect timeout, or end of the backoff
+wifi_fails = 0     # consecutive failed connects
+wifi_failures = 0  # failed connects in all
+wifi_connects = 0  # times the link came up
+wifi_drops = 0     # times it went down again
+first_sample_ms = -1  # ms from BOOT_MS to the first good primary reading
+# Last IP octet shown on the OLED; refreshed on (re)connect
+ip_suffix = ""
 
 # Track how many minute-averaged readings we have captured (for data endpoint)
 readings_count = 0
 
 # --- Lightweight memory stats helper ---
-# Tracks free low-water and prints a compact line every ~30 seconds.
+# Tracks free low-water every tick; prints a compact line once a minute.
 mem_min_free = gc.mem_free()
-mem_last_report_sec = -1
+mem_last_free = mem_min_free
 mem_stats_line = ""
 
 def _format_mem_line(alloc, free, low):
@@ -339,24 +1139,34 @@ def _format_mem_line(alloc, free, low):
         alloc // 1024, free // 1024, total // 1024, low // 1024
     )
 
-def mem_update_and_maybe_log(current_seconds):
-    global mem_min_free, mem_last_report_sec, mem_stats_line
-    # Track low-water continuously with minimal churn
+def mem_track():
+    # Low-water mark of free heap; cheap enough for every tick. Free heap
+    # only grows between ticks when the collector has run.
+    global mem_min_free, mem_last_free, gc_collections
     free_now = gc.mem_free()
     if free_now < mem_min_free:
         mem_min_free = free_now
-    # Emit a line every ~30s; also refresh the cached text
-    if current_seconds % 30 == 0 and current_seconds != mem_last_report_sec:
-        # Collect before sampling for a stable reading; do it sparsely
-        gc.collect()
-        alloc = gc.mem_alloc()
-        free = gc.mem_free()
-        base = _format_mem_line(alloc, free, mem_min_free)
-        # Append buffer lengths and filled count
-        filled = readings_count if readings_count < buffer_size else buffer_size
-        mem_stats_line = base + " | samples(min):{}/{}".format(filled, buffer_size)
-        print(mem_stats_line)
-        mem_last_report_sec = current_seconds
+    if free_now > mem_last_free:
+        gc_collections += 1
+    mem_last_free = free_now
+
+def mem_report():
+    """Collect, refresh the cached memory line and print it (once a minute)."""
+    global mem_stats_line, mem_last_free, gc_collections
+    # Collect before sampling for a stable reading; do it sparsely
+    t0 = ticks_us()
+    gc.collect()
+    stage_gc.observe(ticks_diff(ticks_us(), t0))
+    gc_collections += 1
+    mem_last_free = gc.mem_free()  # don't count this one twice in mem_track()
+    mem_track()
+    alloc = gc.mem_alloc()
+    free = gc.mem_free()
+    base = _format_mem_line(alloc, free, mem_min_free)
+    # Append buffer lengths and filled count
+    filled = readings_count if readings_count < buffer_size else buffer_size
+    mem_stats_line = base + " | samples(min):{}/{}".format(filled, buffer_size)
+    print(mem_stats_line)
 
 
 def _hist_str(val):
@@ -364,8 +1174,8 @@ def _hist_str(val):
         return "{:.1f}".format(val)
     return val if val else "--"
 
-def build_status_text(t, h):
-    # Include latest memory snapshot as a third line; if none yet, build one ad-hoc
+def current_mem_line():
+    # Latest memory snapshot; if none yet, build one ad-hoc
     global mem_stats_line
     if not mem_stats_line:
         alloc = gc.mem_alloc()
@@ -373,199 +1183,417 @@ def build_status_text(t, h):
         base = _format_mem_line(alloc, free, mem_min_free)
         filled = readings_count if readings_count < buffer_size else buffer_size
         mem_stats_line = base + " | samples(min):{}/{}".format(filled, buffer_size)
-    t5 = _hist_str(temp5m)
-    t10 = _hist_str(temp10m)
-    t30 = _hist_str(temp30m)
-    t60 = _hist_str(temp60m)
-    h5 = _hist_str(hum5m)
-    h10 = _hist_str(hum10m)
-    h30 = _hist_str(hum30m)
-    h60 = _hist_str(hum60m)
-    return (
-        f"T: {t}c {avgTemp:.0f} {t5} {t10} {t30} {t60}\n"
-        f"H: {h}% {avgHum:.0f} {h5} {h10} {h30} {h60}\n"
-        + mem_stats_line + "\n"
-    )
+    return mem_stats_line
 
-def build_data_json(points: int):
-    # Determine available points
-    available = readings_count if readings_count < buffer_size else buffer_size
-    n = points if points < available else available
-    if n <= 0:
-        return json.dumps({"t": [], "h": []})
-    # Collect from circular buffer ending at current_index-1
-    out_t = []
-    out_h = []
-    start = (current_index - n) % buffer_size
-    for i in range(n):
-        idx = (start + i) % buffer_size
-        out_t.append(tempList[idx])
-        out_h.append(humList[idx])
-    return json.dumps({"t": out_t, "h": out_h})
-
-def build_html_page():
-    # Maximum whole hours supported by POINTS_MAX
-    hours_max = int(POINTS_MAX // 60)
+def build_status_text(t, h):
+    # Include latest memory snapshot as a third line
+    current_mem_line()
     return (
-        "<!doctype html><html><head><meta charset='utf-8'>"
-        "<meta name='viewport' content='width=device-width,initial-scale=1'>"
-        "<title>Pico W DHT - Live</title>"
-        "<link rel='stylesheet' href='https://unpkg.com/uplot@1.6.32/dist/uPlot.min.css'>"
-        "<script src='https://unpkg.com/uplot@1.6.32/dist/uPlot.iife.min.js'></script>"
-        "<style>body{font-family:system-ui,Segoe UI,Arial;margin:0;padding:12px;background:#0b0e12;color:#e6e8eb}"
-        "#bar{display:flex;gap:8px;align-items:center;margin-bottom:8px}"
-        "label{opacity:.8}input{width:6em}#chart{width:100%;height:240px;background:#11161d;border:1px solid #253041;border-radius:6px}"
-        ".legend{font-size:12px;opacity:.8;margin-left:auto}span.dot{display:inline-block;width:10px;height:10px;border-radius:50%;margin-right:6px}"
-        "</style></head><body>"
-        "<div id='bar'>"
-        "<label style='margin-left:8px'>Hours <input id='hours' type='number' min='1' max='" + str(hours_max) + "' step='1' value='1'></label>"
-        "<label style='margin-left:8px'>Refresh ms <input id='refms' type='number' min='500' max='60000' step='500' value='2000'></label>"
-        "<div class='legend'><span class='dot' style='background:#4fc3f7'></span>Temp <span class='dot' style='background:#81c784'></span>Hum</div>"
-        "</div>"
-        "<div id='chart'></div>"
-        "<pre id='txt' style='opacity:.7'></pre>"
-        "<pre style='opacity:.7'>" + str(mem_stats_line) + "</pre>"
-        "<script>(function(){\n"
-        "const el=document.getElementById('chart');\n"
-        "const txt=document.getElementById('txt');\n"
-        "const hoursEl=document.getElementById('hours');\n"
-        "const refEl=document.getElementById('refms');\n"
-        "let fetchPts=(function(){let hv=parseInt(hoursEl.value)||1;hv=Math.max(1,Math.min(" + str(hours_max) + ",hv));return Math.max(10,Math.min(" + str(POINTS_MAX) + ",hv*60));})();\n"
-        "const initW = (el && el.clientWidth) ? el.clientWidth : 320;\n"
-        "const opts = {\n"
-        "  width: initW,\n"
-        "  height: 240,\n"
-        "  legend: {show: true},\n"
-        "  series: [\n"
-        "    {},\n"
-        "    { label: 'Temp (°C)', stroke: '#4fc3f7', width: 2 },\n"
-        "    { label: 'Hum (%)',  stroke: '#81c784', width: 2 }\n"
-        "  ],\n"
-        "  axes: [\n"
-        "    { stroke:'#8aa1b4', grid:{ stroke:'#1e2734' } },\n"
-        "    { stroke:'#8aa1b4', grid:{ stroke:'#1e2734' } },\n"
-        "  ],\n"
-        "  scales: { x: { time: true }, y: {} }\n"
-        "};\n"
-        "let u = new uPlot(opts, [[],[],[]], el);\n"
-        "function draw(data) {\n"
-        "  if (!data || !data.t || !data.t.length) return;\n"
-        "  const nowSec = Math.floor(Date.now()/1000);\n"
-        "  const n = data.t.length;\n"
-        "  const times = new Array(n);\n"
-        "  for (let i=0;i<n;i++) times[i] = nowSec - ((n - 1 - i) * 60);\n"
-        "  u.setData([times, data.t, data.h]);\n"
-        "  const all = data.t.concat(data.h);\n"
-        "  let mn = all[0], mx = all[0];\n"
-        "  for (let i=1;i<all.length;i++){ const v=all[i]; if(v<mn) mn=v; if(v>mx) mx=v; }\n"
-        "  txt.textContent = 'min:'+mn+' max:'+mx+' last T:'+data.t[n-1]+' H:'+data.h[n-1]+' | hrs:'+((fetchPts/60).toFixed(1));\n"
-        "}\n"
-        "async function tick(){try{const r=await fetch('/data?points='+fetchPts,{cache:'no-store'});const d=await r.json();draw(d)}catch(e){ /* ignore */ }}\n"
-        "function clampHours(){let hv=parseInt(hoursEl.value)||1;hv=Math.max(1,Math.min(" + str(hours_max) + ",hv));hoursEl.value=hv;fetchPts=Math.max(10,Math.min(" + str(POINTS_MAX) + ",hv*60));}\n"
-        "function clampRef(){let rv=parseInt(refEl.value)||2000;rv=Math.max(500,Math.min(60000,rv));refEl.value=rv;return rv;}\n"
-        "let _timer=null; function applyInterval(){const rv=clampRef(); if(_timer){clearInterval(_timer);} _timer=setInterval(tick,rv);}\n"
-        "hoursEl.addEventListener('change',()=>{clampHours();tick()});\n"
-        "refEl.addEventListener('change',()=>{applyInterval();tick()});\n"
-        "window.addEventListener('resize',()=>{ try{ u.setSize({width:(el.clientWidth||320), height:240}); }catch(e){} });\n"
-        "applyInterval(); tick();\n"
-        "})();</script></body></html>"
-    )
+        "T: {}c {}{}\n"
+        "H: {}% {}{}\n"
+    ).format(t, (avgTemp10 + 5) // 10, hist_temp_text,
+             h, (avgHum10 + 5) // 10, hist_hum_text) + (
+        _stats_line("T", temp_stats) + _stats_line("H", hum_stats) + _cache_line()
+        + mem_stats_line + "\n")
 
-while True:
-  try:
-    # IMPORTANT TO BE 1
-    sleep(1)
-    # Increment all count variables
-    sleepCount += 1
-    displayMoveCount += 1
-    # Memory: update low-water and log every ~30s
-    mem_update_and_maybe_log(sleepCount)
-
-    sensor.measure()
-    temp = sensor.temperature()
-    hum = sensor.humidity()
-
-    # Accumulate readings for a minute-average entry
-    minute_temp_sum += temp
-    minute_hum_sum += hum
-    minute_sample_count += 1
-
-    if minute_sample_count >= SAMPLES_PER_MINUTE:
-        avg_temp_minute = round(minute_temp_sum / minute_sample_count, 1)
-        avg_hum_minute = round(minute_hum_sum / minute_sample_count, 1)
-        tempList[current_index] = avg_temp_minute
-        humList[current_index] = avg_hum_minute
-        readings_count += 1
-        current_index = (current_index + 1) % buffer_size
-        minute_temp_sum = 0.0
-        minute_hum_sum = 0.0
-        minute_sample_count = 0
-    
-    # LED logic
-    if temp < 40:
+def _cache_line():
+    c = data_cache
+    return "Cache {:.0f}% hit ({}/{}) {}/{} B in {} bodies\n".format(
+        100 * c.hit_rate(), c.hits, c.hits + c.misses, c.held, c.budget, len(c))
+
+def _stats_line(label, stats):
+    parts = []
+    for k, w in enumerate(stats.windows):
+        if stats.count(k):
+            parts.append("{}m {:.1f}..{:.1f} sd {:.2f}".format(
+                w, stats.min(k) / 10, stats.max(k) / 10, stats.std(k) / 10))
+        else:
+            parts.append("{}m --".format(w))
+    return "{} {}\n".format(label, " | ".join(parts))
+
+def build_stats_json():
+    # Window statistics for /stats, in degrees and percent
+    def series(stats):
+        out = {"n": [], "mean": [], "min": [], "max": [], "std": []}
+        for k in range(len(stats.windows)):
+            n = stats.count(k)
+            out["n"].append(n)
+            out["mean"].append(stats.mean(k) / 10 if n else None)
+            out["min"].append(stats.min(k) / 10 if n else None)
+            out["max"].append(stats.max(k) / 10 if n else None)
+            out["std"].append(round(stats.std(k) / 10, 2) if n else None)
+        return out
+    return json.dumps({
+        "seq": readings_count,
+        "windows": STATS_WINDOWS,
+        "t": series(temp_stats),
+        "h": series(hum_stats),
+    })
+
+def build_info_json():
+    # Dynamic values for the static dashboard page
+    return json.dumps({
+        "points_default": POINTS_DEFAULT,
+        "points_max": POINTS_MAX,
+        "span_max": SPAN_MAX,
+        "res": {r: DATA_TIERS[r][1][0][1].size for r in DATA_RES_ORDER},
+        "sensors": [ch.name for ch in channels],
+        "seq": readings_count,
+        "time": wall_time(),
+        "clock": clock_source,
+        "mem": current_mem_line(),
+    })
+
+# ---- Cooperative tasks ----
+
+def _next_deadline(deadline, period_ms):
+    deadline = ticks_add(deadline, period_ms)
+    if ticks_diff(deadline, ticks_ms()) < 0:
+        # Fell more than a period behind; re-anchor instead of bursting
+        deadline = ticks_add(ticks_ms(), period_ms)
+    return deadline
+
+try:
+    _sleep_ms = asyncio.sleep_ms  # MicroPython: integer ms, no float per wait
+except AttributeError:
+    async def _sleep_ms(ms):
+        await asyncio.sleep(ms / 1000)
+
+async def _sleep_until(deadline):
+    delay = ticks_diff(deadline, ticks_ms())
+    if delay > 0:
+        await _sleep_ms(delay)
+
+# Low-power idle. machine.lightsleep() stops the event loop with the CPU, so
+# only the sampler naps, and only up to the next deadline any timed task has
+# published below, and never with a connection open. Minute closes turn the
+# time slept into an awake fraction, kept per minute over the last hour.
+display_due = None
+aggregate_due = None
+wifi_due = None
+slept_ms = 0        # total time in lightsleep
+naps = 0
+power_slept_ms = 0  # lightsleep since the last minute close
+power_mark = ticks_ms()
+duty_permille = 1000  # awake share of the last minute closed
+awake_permille = WindowStats((MINUTES_60,))  # the same, for each minute
+
+def _nap_ms(now, wait):
+    """How long the sampler may lightsleep from `now`, waiting `wait` ms."""
+    if display_due is not None and ticks_diff(display_due, now) < wait:
+        wait = ticks_diff(display_due, now)
+    if aggregate_due is not None and ticks_diff(aggregate_due, now) < wait:
+        wait = ticks_diff(aggregate_due, now)
+    if wifi_due is not None and ticks_diff(wifi_due, now) < wait:
+        wait = ticks_diff(wifi_due, now)
+    return wait
+
+async def _idle_until(deadline):
+    """_sleep_until, napping in lightsleep where LIGHTSLEEP allows."""
+    global slept_ms, naps, power_slept_ms
+    while True:
+        now = ticks_ms()
+        wait = ticks_diff(deadline, now)
+        if wait <= 0:
+            return
+        if not LIGHTSLEEP or http_active:
+            await _sleep_ms(wait)
+            return
+        nap = _nap_ms(now, wait)
+        if nap < LIGHTSLEEP_MIN_MS:
+            # Another task is due first; let it run, then look again
+            await _sleep_ms(nap if nap > 0 else 1)
+            continue
+        machine.lightsleep(nap)
+        nap = ticks_diff(ticks_ms(), now)
+        slept_ms += nap
+        power_slept_ms += nap
+        naps += 1
+        await _sleep_ms(0)  # whatever came due meanwhile runs now
+
+def close_power_minute(now):
+    """Fold the time since the last call into awake_permille."""
+    global power_slept_ms, power_mark, duty_permille
+    elapsed = ticks_diff(now, power_mark)
+    if elapsed > 0:
+        awake = elapsed - power_slept_ms
+        duty_permille = max(0, awake) * 1000 // elapsed
+        awake_permille.add(duty_permille)
+    power_slept_ms = 0
+    power_mark = now
+
+def awake_s_per_hour():
+    """Awake seconds per hour, from the minutes of the last hour (fewer
+    when the board has been up less than an hour)."""
+    if not awake_permille.seq:
+        return 3600
+    return awake_permille.mean(0) * 3600 // 1000
+
+def update_leds(t):
+    if t < 40:
         #too low
         led_off()
         bled.high()
-    elif temp >= 40 and temp < 45:
+    elif t >= 40 and t < 45:
         #40 - 45
         led_off()
         bled.high()
         gled.high()
-    elif temp >= 45 and temp < 50:
+    elif t >= 45 and t < 50:
         #45 - 50
         led_off()
         gled.high()
-    elif temp >= 50 and temp < 55:
+    elif t >= 50 and t < 55:
         # 50 - 55
         led_off()
         gled.high()
         rled.high()
-    elif temp >= 55:
+    elif t >= 55:
         # too high
         led_off()
         rled.high()
-    
-    # Average readings
-    avgTemp = (avgTemp + temp ) / 2
-    avgHum = (avgHum + hum) / 2
-    
+
+# Reading -> display string, filled on first use. The sensor's range keeps
+# these small, and steady-state ticks then draw the same string objects.
+_temp_strs = {}
+_hum_strs = {}
+
+def _reading_str(cache, fmt, v):
+    v = int(round(v))
+    s = cache.get(v)
+    if s is None:
+        s = cache[v] = fmt.format(v)
+    return s
+
+def store_minute(ts, t, h, tmin, tmax, hmin, hmax, n, provisional=False):
+    """Append one minute aggregate (raw tenths, stamped ts) to the series
+    and rollup tiers; a bucket is stamped with the end of its slot.
+    provisional marks a stamp from a clock not yet set."""
+    data_cache.clear()
+    temp_series.append_raw(t)
+    hum_series.append_raw(h)
+    primary.times.append(ts, provisional)
+    temp_stats.add(t, tmin, tmax)
+    hum_stats.add(h, hmin, hmax)
+    for closed in tier_10m.add(ts, (t, h), (tmin, hmin), (tmax, hmax), n):
+        tier_10m_times.append(closed[0], provisional)
+        _log_bucket(tier_10m_log, tier_10m, closed)
+        _add_hour(closed, provisional)
+
+def _add_hour(bucket, provisional=False):
+    # Feed a closed 10-minute bucket to the hourly tier
+    for closed in tier_1h.add(*bucket):
+        tier_1h_times.append(closed[0], provisional)
+        _log_bucket(tier_1h_log, tier_1h, closed)
+
+def _log_bucket(log, tier, closed):
+    if log is None:
+        return
+    end, means, mins, maxs, n = closed
+    try:
+        log.append(tier.seq, end, means[0], means[1], mins[0], maxs[0], mins[1], maxs[1],
+                   n if n < 32767 else 32767)
+    except OSError as e:
+        print("Flash log error:", e)
+
+def _replay_10m(seq, ts, t, h, tmin, tmax, hmin, hmax, n):
+    bucket = (ts, (t, h), (tmin, hmin), (tmax, hmax), n)
+    tier_10m.restore(seq, *bucket)
+    tier_10m_times.append(ts)
+    # Buckets newer than the last hour on flash go on into the hourly tier
+    _add_hour(bucket)
+
+def _replay_1h(seq, ts, t, h, tmin, tmax, hmin, hmax, n):
+    tier_1h.restore(seq, ts, (t, h), (tmin, hmin), (tmax, hmax), n)
+    tier_1h_times.append(ts)
+
+def _replay_minute(seq, ts, t, h, tmin, tmax, hmin, hmax, n):
+    global readings_count
+    store_minute(ts, t, h, tmin, tmax, hmin, hmax, n)
+    # Keep numbering from before the reboot so dashboards' since= stays valid
+    readings_count = seq
+    temp_series.seq = seq
+    hum_series.seq = seq
+
+def open_flash_log():
+    """Open the flash logs and rebuild history from them, each in one
+    sequential pass: hourly buckets, then 10-minute ones, then minutes.
+    Each pass also rebuilds the buckets above it that are not on flash."""
+    global flash_log, tier_10m_log, tier_1h_log
+    t0 = ticks_ms()
+    try:
+        flash_log = FlashLog(LOG_DIR, LOG_SEGMENT_RECORDS, LOG_SEGMENTS, LOG_BATCH)
+        tier_1h_log = FlashLog(LOG_DIR + "/1h", LOG_1H_RECORDS, LOG_1H_SEGMENTS, LOG_TIER_BATCH)
+        tier_10m_log = FlashLog(LOG_DIR + "/10m", LOG_10M_RECORDS, LOG_10M_SEGMENTS,
+                                LOG_TIER_BATCH)
+        buckets = tier_1h_log.replay(_replay_1h) + tier_10m_log.replay(_replay_10m)
+        count = flash_log.replay(_replay_minute)
+    except OSError as e:
+        print("Flash log unavailable:", e)
+        flash_log = tier_10m_log = tier_1h_log = None
+        return
+    update_history()
+    print("Restored {} minutes and {} buckets from flash in {} ms".format(
+        count, buckets, ticks_diff(ticks_ms(), t0)))
+
+def flash_writes():
+    """Appends issued to the minute and bucket logs."""
+    return sum(log.writes for log in (flash_log, tier_10m_log, tier_1h_log) if log)
+
+def _window_mean(stats, k):
+    # Mean of window k in degrees/percent, or None while it is still filling
+    if stats.count(k) < stats.windows[k]:
+        return None
+    return stats.mean(k) / 10
+
+def update_history():
+    # Update the history columns: means over the trailing windows
+    global temp5m, hum5m, temp10m, hum10m, temp30m, hum30m, temp60m, hum60m
+    global hist_temp_text, hist_hum_text
+    temp5m = _window_mean(temp_stats, 0)
+    hum5m = _window_mean(hum_stats, 0)
+    temp10m = _window_mean(temp_stats, 1)
+    hum10m = _window_mean(hum_stats, 1)
+    temp30m = _window_mean(temp_stats, 2)
+    hum30m = _window_mean(hum_stats, 2)
+    temp60m = _window_mean(temp_stats, 3)
+    hum60m = _window_mean(hum_stats, 3)
+    hist_temp_text = " {} {} {} {}".format(
+        _hist_str(temp5m), _hist_str(temp10m), _hist_str(temp30m), _hist_str(temp60m))
+    hist_hum_text = " {} {} {} {}".format(
+        _hist_str(hum5m), _hist_str(hum10m), _hist_str(hum30m), _hist_str(hum60m))
+
+def update_ip_suffix():
+    """Cache the last IP octet for the OLED; call after (re)connecting."""
+    global ip_suffix
+    ip_suffix = ""
+    if wlan and wlan.isconnected():
+        try:
+            ip0 = wlan.ifconfig()[0]
+            dot = ip0.rfind('.')
+            ip_suffix = ip0[dot+1:] if dot >= 0 else ip0
+        except Exception:
+            pass
+
+def sample_once(now):
+    """One sampler pass: read every probe due at `now` (normally one, as
+    reads are staggered) and update the display state from the primary.
+
+    A failed read only backs that probe off; the others carry on. Allocation-
+    free unless it is a serial-log tick or a read failed: no strings are
+    built and the accumulators are ints.
+    """
+    global sleepCount, temp, hum, avgTemp10, avgHum10, first_sample_ms
+    mem_track()
+    for ch in channels:
+        if ticks_diff(now, ch.due) < 0:
+            continue
+        t0 = ticks_us()
+        ok = ch.read(now)
+        stage_sensor.observe(ticks_diff(ticks_us(), t0))
+        if not ok:
+            print(ch.name, ch.last_error)
+        if ch is not primary:
+            continue
+        # Counts base-rate slots, which a read on a stretched schedule
+        # stands for several of
+        w = ch.weight
+        prev = sleepCount
+        sleepCount += w
+        if sleepCount >= SECONDS_60M:
+            # Reset sleep count periodically to keep values bounded
+            sleepCount -= SECONDS_60M
+            prev -= SECONDS_60M
+        if not ok:
+            continue
+        if first_sample_ms < 0:
+            first_sample_ms = ticks_diff(now, BOOT_MS)
+        temp = ch.temp
+        hum = ch.hum
+        update_leds(temp)
+
+        # Mean of the last minute of readings, each held for its slots
+        for _ in range(w):
+            temp_1m.add(ch.t10)
+            hum_1m.add(ch.h10)
+        avgTemp10 = temp_1m.mean(0)
+        avgHum10 = hum_1m.mean(0)
+
+        if SERIAL_LOG_SECONDS and sleepCount // SERIAL_LOG_SECONDS != prev // SERIAL_LOG_SECONDS:
+            # Pieces rather than a formatted line: print writes them straight out
+            print("T: ", temp, "c ", (avgTemp10 + 5) // 10, hist_temp_text, sep="")
+            print("H: ", hum, "% ", (avgHum10 + 5) // 10, hist_hum_text, sep="")
+
+def next_sample_due():
+    """Earliest due time over all probes."""
+    due = primary.due
+    for ch in channels:
+        if ticks_diff(ch.due, due) < 0:
+            due = ch.due
+    return due
+
+async def sampler_task():
+    """Read each probe when it is due and feed its minute accumulators."""
+    while True:
+        await _idle_until(next_sample_due())
+        t0 = ticks_us()
+        sample_once(ticks_ms())
+        stage_sample.observe(ticks_diff(ticks_us(), t0))
+
+async def aggregator_task():
+    """Close a minute-average entry per probe every AGGREGATE_PERIOD_MS."""
+    global readings_count, aggregate_due
+    deadline = ticks_ms()
+    while True:
+        deadline = aggregate_due = _next_deadline(deadline, AGGREGATE_PERIOD_MS)
+        await _sleep_until(deadline)
+        t0 = ticks_us()
+        close_power_minute(ticks_ms())
+        # Stamp the scheduled boundary, not the (possibly late) wake-up
+        ts = wall_time() - ticks_diff(ticks_ms(), deadline) // 1000
+        provisional = not clock_source
+        for ch in channels[1:]:
+            rec = ch.close_minute()
+            if rec:
+                ch.temp_series.append_raw(rec[0])
+                ch.hum_series.append_raw(rec[1])
+                ch.times.append(ts, provisional)
+                data_cache.clear()
+        rec = primary.close_minute()
+        if rec is None:
+            # No successful reads this minute; leave a gap rather than a zero
+            continue
+        prev_ts = primary.times.newest
+        store_minute(ts, *rec, provisional=provisional)
+        readings_count += 1
+        stream_publish(readings_count, ts, ts - prev_ts if 0 < prev_ts < ts else 0,
+                       rec[0], rec[1])
+        if flash_log:
+            t1 = ticks_us()
+            try:
+                flash_log.append(readings_count, ts, *rec)
+            except OSError as e:
+                print("Flash log error:", e)
+            stage_flash.observe(ticks_diff(ticks_us(), t1))
+        update_history()
+        stage_aggregate.observe(ticks_diff(ticks_us(), t0))
+        mem_report()
+
+def display_once():
+    """One display tick: jitter, power cycling and redraw from cached text."""
+    global displayMoveCount, jitterCount, randomX, randomY, oled_on, oled_phase_count
+    displayMoveCount += 1
     # Every JITTER_SECONDS change the location
     if displayMoveCount >= JITTER_SECONDS:
         displayMoveCount = 0
-        # Oled draw in different spots
-        randomX = random.randint(0, JITTER_X_MAX)
+        # Move the picture on the panel; GDDRAM keeps the same content
+        jitterCount += 1
+        if jitterCount >= JITTER_X_EVERY:
+            jitterCount = 0
+            randomX = random.randint(0, JITTER_X_MAX)
         randomY = random.randint(0, JITTER_Y_MAX)
-    
-    # Update the historical readings using circular buffer math (minute offsets)
-    if readings_count >= MINUTES_5:
-        index_5m = (current_index - MINUTES_5) % buffer_size
-        temp5m = tempList[index_5m]
-        hum5m = humList[index_5m]
-    if readings_count >= MINUTES_10:
-        index_10m = (current_index - MINUTES_10) % buffer_size
-        temp10m = tempList[index_10m]
-        hum10m = humList[index_10m]
-    if readings_count >= MINUTES_30:
-        index_30m = (current_index - MINUTES_30) % buffer_size
-        temp30m = tempList[index_30m]
-        hum30m = humList[index_30m]
-    if readings_count >= MINUTES_60:
-        index_60m = (current_index - MINUTES_60) % buffer_size
-        temp60m = tempList[index_60m]
-        hum60m = humList[index_60m]
-
-    if sleepCount >= SECONDS_60M:
-        # Reset sleep count periodically to keep values bounded
-        sleepCount = 0
-
-    t5_str = _hist_str(temp5m)
-    t10_str = _hist_str(temp10m)
-    t30_str = _hist_str(temp30m)
-    t60_str = _hist_str(temp60m)
-    h5_str = _hist_str(hum5m)
-    h10_str = _hist_str(hum10m)
-    h30_str = _hist_str(hum30m)
-    h60_str = _hist_str(hum60m)
+        oled.jitter(randomX, randomY)
+
     # OLED power cycle control: toggle every 15s
     oled_phase_count += 1
     if oled_on:
@@ -581,54 +1609,133 @@ while True:
 
     if not oled_on:
         # Skip drawing work while panel is off
+        return
+    oled.contrast(1)
+    oled.fill(0)
+    # Reading and history are drawn as separate cached strings, one
+    # character cell apart, instead of formatting a fresh line each tick
+    t_str = _reading_str(_temp_strs, "{}", temp)
+    oled.text(t_str, 0, 0)
+    oled.text(hist_temp_text, 8 * len(t_str), 0)
+    h_str = _reading_str(_hum_strs, "{:>2}", hum)
+    oled.text(h_str, 0, 10)
+    oled.text(hist_hum_text, 8 * len(h_str), 10)
+    # Show last IP octet when connected
+    if ip_suffix and wlan and wlan.isconnected():
+        oled.text(ip_suffix, 0, 20)
+    t0 = ticks_us()
+    oled.show()
+    stage_oled_show.observe(ticks_diff(ticks_us(), t0))
+
+async def display_task():
+    """Redraw the OLED every DISPLAY_PERIOD_MS, with burn-in jitter and power cycling."""
+    global display_due
+    deadline = ticks_ms()
+    while True:
+        deadline = display_due = _next_deadline(deadline, DISPLAY_PERIOD_MS)
+        await _sleep_until(deadline)
+        t0 = ticks_us()
+        try:
+            display_once()
+        except OSError as e:
+            print(e)
+        stage_display.observe(ticks_diff(ticks_us(), t0))
+
+def _wifi_failed(now, why):
+    global wifi_state, wifi_until, wifi_fails, wifi_failures
+    print("WiFi connect failed:", why)
+    try:
+        wlan.disconnect()
+    except Exception:
         pass
-    else:
-        oled.contrast(1)
-        oled.fill(0)
-#     oled.text(f"{temp:.0f} {avgTemp:>2.0f} {temp5m:>2.0f} {temp10m:>2.0f} {temp30m:>2.0f}", randomX, randomY)   
-#     oled.text(f"{hum:>2} {avgHum:>2.0f} {hum5m:>2.0f} {hum10m:>2.0f} {hum30m:>2.0f}", randomX, randomY+10)
-    if oled_on:
-        oled.text(f"{temp:.0f} {t5_str} {t10_str} {t30_str} {t60_str}", randomX, randomY)   
-        oled.text(f"{hum:>2} {h5_str} {h10_str} {h30_str} {h60_str}", randomX, randomY+10)
-        # Show last IP octet when connected
-        if wlan and wlan.isconnected():
+    wifi_fails += 1
+    wifi_failures += 1
+    delay = WIFI_BACKOFF_MS
+    k = wifi_fails
+    while k > 1 and delay < WIFI_BACKOFF_MAX_MS:
+        delay *= 2
+        k -= 1
+    if delay > WIFI_BACKOFF_MAX_MS:
+        delay = WIFI_BACKOFF_MAX_MS
+    delay += random.randint(0, delay // 2)
+    wifi_state = WIFI_BACKOFF
+    wifi_until = ticks_add(now, delay)
+    return delay
+
+def wifi_step(now):
+    """Advance the Wi-Fi state machine; returns ms until it wants the next
+    step. Only polls the driver, so it never holds up the other tasks
+    (bar sync_clock_ntp() once per connection while the clock is unset)."""
+    global wlan, wifi_state, wifi_until, wifi_fails, wifi_connects, wifi_drops
+    if wifi_state == WIFI_DOWN:
+        if wlan is None:
+            wlan = network.WLAN(network.STA_IF)
+        try:
+            wlan.active(True)
+            wlan.connect(WIFI_SSID, WIFI_PASSWORD)
+        except OSError as e:
+            return _wifi_failed(now, e)
+        print("Connecting to WiFi…")
+        wifi_state = WIFI_CONNECTING
+        wifi_until = ticks_add(now, WIFI_CONNECT_TIMEOUT_MS)
+        return WIFI_POLL_MS
+    if wifi_state == WIFI_CONNECTING:
+        if wlan.isconnected():
+            print("WiFi connected:", wlan.ifconfig())
+            wifi_state = WIFI_UP
+            wifi_fails = 0
+            wifi_connects += 1
+            update_ip_suffix()
+            if clock_source != "ntp":
+                sync_clock_ntp()
+            return WIFI_CHECK_MS
+        status = wlan.status()
+        if status < 0:
+            # Wrong password, no access point or a failed join
+            return _wifi_failed(now, "status {}".format(status))
+        if ticks_diff(wifi_until, now) <= 0:
+            return _wifi_failed(now, "timeout")
+        return WIFI_POLL_MS
+    if wifi_state == WIFI_UP:
+        if wlan.isconnected():
+            return WIFI_CHECK_MS
+        print("WiFi lost")
+        wifi_drops += 1
+        wifi_state = WIFI_DOWN
+        update_ip_suffix()
+        return 0
+    # WIFI_BACKOFF
+    left = ticks_diff(wifi_until, now)
+    if left > 0:
+        return left
+    wifi_state = WIFI_DOWN
+    return 0
+
+async def wifi_task():
+    """Keep WiFi up and start the HTTP server once it is."""
+    global wifi_due
+    while True:
+        now = ticks_ms()
+        wifi_due = now  # no naps until the step is done
+        delay = wifi_step(now)
+        if wifi_state == WIFI_UP and not server:
             try:
-                ip0 = wlan.ifconfig()[0]
-                if ip0:
-                    dot = ip0.rfind('.')
-                    last_oct = ip0[dot+1:] if dot >= 0 else ip0
-                    oled.text(last_oct, randomX, randomY+20)
-            except Exception:
-                pass
-        oled.show()
-
-    # Handle one HTTP request per loop if server is running
-    if server_sock:
-        http_poll_and_respond(
-            lambda: build_status_text(temp, hum),
-            build_data_json,
-            build_html_page,
-        )
+                await start_http_server()
+            except OSError as e:
+                print(e)
+        wifi_due = ticks_add(ticks_ms(), delay)
+        await _sleep_ms(delay)
+
+async def main():
+    open_flash_log()
+    load_static_assets()
+    # Sampling starts at once; WiFi comes up alongside it
+    tasks = [sampler_task(), aggregator_task(), display_task()]
+    if WIFI_SSID and WIFI_PASSWORD:
+        tasks.append(wifi_task())
     else:
-        # If WiFi creds exist but server is not up, try to (re)connect occasionally
-        if WIFI_SSID and WIFI_PASSWORD:
-            # Every ~30s, attempt to bring WiFi/server back
-            if sleepCount % 30 == 0:
-                if not wlan or not wlan.isconnected():
-                    wlan = connect_wifi(WIFI_SSID, WIFI_PASSWORD)
-                if wlan and wlan.isconnected():
-                    start_http_server()
-    
-#     print(f"T: {temp}c {avgTemp:.0f} {temp5m:.0f} {temp10m:.0f} {temp30m:.0f} {temp60m:.0f}")
-#     print(f"H: {hum}% {avgHum:.0f} {hum5m:.0f} {hum10m:.0f} {hum30m:.0f} {hum60m:.0f}")
-    print(
-        f"T: {temp}c {avgTemp:.0f} {t5_str} {t10_str} {t30_str} {t60_str}\n"
-        f"H: {hum}% {avgHum:.0f} {h5_str} {h10_str} {h30_str} {h60_str}"
-    )
-    # print(f"H: {hum}% {avgHum:.0f} {hum5m} {hum10m} {hum30m} {hum60m}")
-    # Memory line is logged periodically by mem_update_and_maybe_log()
-    # print(tempList)
-    # print(humList)
-        
-  except OSError as e:
-    print(e)
+        print("No WiFi credentials found in secrets.py; HTTP disabled.")
+    await asyncio.gather(*tasks)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""Build the gzip-compressed dashboard assets served from flash.
+
+    python tools/build_web.py [--fetch-uplot]
+
+Reads web/index.html and the uPlot copy kept in web/vendor/
+(uPlot.iife.min.js and uPlot.min.css; --fetch-uplot downloads
+UPLOT_VERSION from unpkg over them). Writes www/*.gz plus www/assets.json,
+which main.py loads at boot, and an uncompressed www/index.html for clients
+that do not accept gzip. Copy the www/ folder to the Pico root alongside
+main.py.
+
+uPlot is served by the board under /s/ with a content-hashed name, so it
+can be cached forever and the page needs no internet access.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEB = os.path.join(ROOT, "web")
+VENDOR = os.path.join(WEB, "vendor")
+OUT = os.path.join(ROOT, "www")
+
+UPLOT_VERSION = "1.6.18"
+UPLOT_CDN = "https://unpkg.com/uplot@{}/dist/".format(UPLOT_VERSION)
+UPLOT_FILES = {
+    "js": "uPlot.iife.min.js",
+    "css": "uPlot.min.css",
+}
+
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+# The page itself keeps its URL across firmware updates, so always revalidate;
+# the ETag makes that a bodiless 304.
+CACHE_PAGE = "no-cache"
+
+
+def _gzip(data):
+    # mtime=0 keeps output (and so the ETag) reproducible
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _etag(blob):
+    return '"{}"'.format(hashlib.sha1(blob).hexdigest()[:16])
+
+
+def fetch_uplot():
+    os.makedirs(VENDOR, exist_ok=True)
+    for name in UPLOT_FILES.values():
+        url = UPLOT_CDN + name
+        print("fetching", url)
+        with urllib.request.urlopen(url, timeout=30) as r:
+            data = r.read()
+        with open(os.path.join(VENDOR, name), "wb") as f:
+            f.write(data)
+
+
+def build():
+    os.makedirs(OUT, exist_ok=True)
+    for name in os.listdir(OUT):
+        if name.endswith((".gz", ".html")) or name == "assets.json":
+            os.remove(os.path.join(OUT, name))
+    assets = {}
+
+    def emit(url, fname, ctype, cache, raw, plain=False):
+        blob = _gzip(raw)
+        with open(os.path.join(OUT, fname + ".gz"), "wb") as f:
+            f.write(blob)
+        assets[url] = {
+            "file": fname + ".gz",
+            "type": ctype,
+            "size": len(blob),
+            "etag": _etag(blob),
+            "cache": cache,
+        }
+        if plain:
+            with open(os.path.join(OUT, fname), "wb") as f:
+                f.write(raw)
+            assets[url]["plain"] = {"file": fname, "size": len(raw), "etag": _etag(raw)}
+        print("{:<28} {:>7} -> {:>6} bytes".format(url, len(raw), len(blob)))
+
+    tags = []
+    for kind, name in sorted(UPLOT_FILES.items()):
+        with open(os.path.join(VENDOR, name), "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()[:10]
+        url = "/s/uplot.{}.{}".format(digest, kind)
+        ctype = "text/css" if kind == "css" else "application/javascript"
+        emit(url, "uplot.{}.{}".format(digest, kind), ctype, CACHE_IMMUTABLE, raw)
+        if kind == "css":
+            tags.append("<link rel='stylesheet' href='{}'>".format(url))
+        else:
+            tags.append("<script src='{}'></script>".format(url))
+
+    with open(os.path.join(WEB, "index.html"), "rb") as f:
+        page = f.read()
+    page = page.replace(b"<!--UPLOT-->", "".join(tags).encode())
+    emit("/", "index.html", "text/html; charset=utf-8", CACHE_PAGE, page, plain=True)
+
+    with open(os.path.join(OUT, "assets.json"), "w") as f:
+        json.dump(assets, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--fetch-uplot", action="store_true",
+                    help="download uPlot {} into web/vendor first".format(UPLOT_VERSION))
+    args = ap.parse_args()
+    if args.fetch_uplot:
+        fetch_uplot()
+    build()
@@ -0,0 +1,175 @@
+"""Scrape minute readings from many Pico nodes into a column store.
+
+    python tools/collector.py --store DIR [--interval 60] [--limit 8]
+                              [--timeout 5] [--once] host[:port] ...
+
+Each round fetches /data.bin?since=SEQ from every node that is due, with
+at most --limit connections open at once. SEQ is the sequence number
+(readings_count) of the newest minute already stored for that node, so a
+node only sends the minutes added since the last scrape; after a reboot or
+a long gap it sends its whole window, and rows already stored are skipped
+by time. A node that fails (timeout, refused, 503, bad reply) is retried
+after interval * 2, 4, 8... up to --backoff-max seconds, without holding up
+the others. Rows land in tools/colstore.py tables, one per node.
+
+CPython only (asyncio, mmap); it runs next to the boards, not on them.
+"""
+import argparse
+import asyncio
+import struct
+import time
+
+from colstore import ColumnStore
+
+# /data.bin v3 header, see DATA_BIN_HDR in main.py
+DATA_BIN_HDR = "<2sBBHHII"
+DATA_BIN_SIZE = struct.calcsize(DATA_BIN_HDR)
+DATA_BIN_MAGIC = b"PD"
+POINTS_MAX = 1440  # the nodes' 1-minute window
+
+
+def decode_gap(v):
+    # Seconds, or minutes with the top bit set (lib/timeindex.py)
+    return (v & 0x7FFF) * 60 if v & 0x8000 else v
+
+
+def parse_data_bin(body):
+    """(seq, ts, t, h) from a /data.bin reply; ts ascending Unix times."""
+    magic, version, res, n, scale, seq, newest = struct.unpack_from(DATA_BIN_HDR, body)
+    if magic != DATA_BIN_MAGIC or version < 3:
+        raise ValueError("unsupported /data.bin header")
+    if len(body) < DATA_BIN_SIZE + 6 * n:
+        raise ValueError("short /data.bin reply")
+    t = struct.unpack_from("<%dh" % n, body, DATA_BIN_SIZE)
+    h = struct.unpack_from("<%dh" % n, body, DATA_BIN_SIZE + 2 * n)
+    gaps = struct.unpack_from("<%dH" % n, body, DATA_BIN_SIZE + 4 * n)
+    ts = [0] * n
+    step = 60 * res
+    if n:
+        ts[n - 1] = newest
+        for i in range(n - 1, 0, -1):
+            # Unknown gaps (0) are taken as one step
+            ts[i - 1] = ts[i] - (decode_gap(gaps[i]) or step)
+    if scale != 10:
+        t = [v * 10 // scale for v in t]
+        h = [v * 10 // scale for v in h]
+    return seq, ts, t, h
+
+
+class Node:
+    """Scrape state of one board."""
+
+    def __init__(self, addr):
+        host, _, port = addr.partition(":")
+        self.name = addr
+        self.host = host
+        self.port = int(port) if port else 80
+        self.due = 0.0
+        self.fails = 0
+        self.last_error = None
+        self.scrapes = 0
+        self.rows = 0
+        self.bytes = 0
+
+
+class Collector:
+    def __init__(self, nodes, store, interval=60, limit=8, timeout=5, backoff_max=900):
+        self.nodes = [Node(a) for a in nodes]
+        self.store = store
+        self.interval = interval
+        self.timeout = timeout
+        self.backoff_max = backoff_max
+        self._slots = asyncio.Semaphore(limit)
+
+    async def _get(self, node, path):
+        reader, writer = await asyncio.open_connection(node.host, node.port)
+        try:
+            writer.write("GET {} HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n\r\n".format(
+                path, node.host).encode())
+            await writer.drain()
+            status = (await reader.readline()).split()
+            if len(status) < 2 or status[1] != b"200":
+                raise OSError("HTTP {}".format(status[1].decode() if len(status) > 1 else "?"))
+            length = None
+            while True:
+                line = await reader.readline()
+                if not line or line == b"\r\n":
+                    break
+                if line[:15].lower() == b"content-length:":
+                    length = int(line[15:])
+            body = await (reader.readexactly(length) if length is not None else reader.read())
+            node.bytes += len(body)
+            return body
+        finally:
+            writer.close()
+
+    async def scrape(self, node):
+        """Fetch and store the node's new minutes; returns rows stored."""
+        tab = self.store.table(node.name)
+        path = "/data.bin?res=1m&points={}&since={}".format(POINTS_MAX, tab.seq)
+        async with self._slots:
+            try:
+                body = await asyncio.wait_for(self._get(node, path), self.timeout)
+                seq, ts, t, h = parse_data_bin(body)
+            except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                node.fails += 1
+                node.last_error = e
+                delay = self.interval * 2 ** node.fails
+                node.due = time.monotonic() + (delay if delay < self.backoff_max else self.backoff_max)
+                return 0
+        kept = tab.append(ts, t, h, seq)
+        tab.flush()
+        node.fails = 0
+        node.last_error = None
+        node.scrapes += 1
+        node.rows += kept
+        node.due = time.monotonic() + self.interval
+        return kept
+
+    async def round(self):
+        """Scrape every node that is due, concurrently; returns how many were."""
+        now = time.monotonic()
+        due = [n for n in self.nodes if n.due <= now]
+        await asyncio.gather(*(self.scrape(n) for n in due))
+        return len(due)
+
+    async def run(self):
+        while True:
+            await self.round()
+            wake = min(n.due for n in self.nodes)
+            await asyncio.sleep(max(0.0, wake - time.monotonic()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("nodes", nargs="+", help="host[:port] of each board")
+    ap.add_argument("--store", required=True, help="directory for the column files")
+    ap.add_argument("--interval", type=float, default=60, help="seconds between scrapes")
+    ap.add_argument("--limit", type=int, default=8, help="connections open at once")
+    ap.add_argument("--timeout", type=float, default=5, help="seconds per scrape")
+    ap.add_argument("--backoff-max", type=float, default=900)
+    ap.add_argument("--once", action="store_true", help="one round, then exit")
+    args = ap.parse_args()
+
+    store = ColumnStore(args.store)
+
+    async def go():
+        c = Collector(args.nodes, store, args.interval, args.limit, args.timeout, args.backoff_max)
+        if args.once:
+            await c.round()
+            for n in c.nodes:
+                print("{}: {} rows{}".format(n.name, n.rows,
+                                             ", failed: {}".format(n.last_error) if n.fails else ""))
+            return
+        await c.run()
+
+    try:
+        asyncio.run(go())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
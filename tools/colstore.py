@@ -0,0 +1,155 @@
+"""Column-per-metric store for minute readings from many nodes.
+
+Each node gets a directory holding one file per column (ts as u32 Unix
+time, t and h as int16 tenths), memory-mapped and grown in GROW_ROWS steps,
+and a meta.json with the row count and the node's /data sequence number
+(the collector's cursor). Rows are kept in time order. A small time index,
+the first timestamp of every INDEX_BLOCK rows, is rebuilt in memory on
+open, so a time range is a binary search over the index, then one inside
+a single block.
+
+meta.json is replaced atomically after the columns are flushed, so rows
+written past its count by an interrupted append are simply ignored on the
+next open.
+"""
+import bisect
+import json
+import mmap
+import os
+import re
+from array import array
+
+COLUMNS = (("ts", "I"), ("t", "h"), ("h", "h"))
+GROW_ROWS = 4096
+INDEX_BLOCK = 1024
+
+
+class _Column:
+    """One fixed-width column file, mapped and exposed as a typed memoryview."""
+
+    def __init__(self, path, typecode, rows):
+        self.path = path
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        exists = os.path.exists(path)
+        self.f = open(path, "r+b" if exists else "w+b")
+        self.capacity = os.path.getsize(path) // self.itemsize
+        self.mm = None
+        self.view = None
+        self.reserve(max(rows, 1))
+
+    def reserve(self, rows):
+        if rows <= self.capacity and self.view is not None:
+            return
+        if rows > self.capacity:
+            cap = (rows + GROW_ROWS - 1) // GROW_ROWS * GROW_ROWS
+            self._unmap()
+            self.f.truncate(cap * self.itemsize)
+            self.capacity = cap
+        self._unmap()
+        self.mm = mmap.mmap(self.f.fileno(), self.capacity * self.itemsize)
+        self.view = memoryview(self.mm).cast(self.typecode)
+
+    def _unmap(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+    def flush(self):
+        self.mm.flush()
+
+    def close(self):
+        self._unmap()
+        self.f.close()
+
+
+class NodeTable:
+    """The columns of one node."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta = {}
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            pass
+        self.rows = meta.get("rows", 0)
+        self.seq = meta.get("seq", -1)  # newest /data sequence number stored
+        self.cols = {name: _Column(os.path.join(path, name + "." + code), code, self.rows)
+                     for name, code in COLUMNS}
+        self.index = array("I", (self.cols["ts"].view[r] for r in range(0, self.rows, INDEX_BLOCK)))
+
+    @property
+    def last_ts(self):
+        return self.cols["ts"].view[self.rows - 1] if self.rows else 0
+
+    def append(self, ts, t, h, seq):
+        """Append rows newer than the last stored one; ts must be ascending.
+        Returns how many were kept."""
+        k = bisect.bisect_right(ts, self.last_ts)
+        n = len(ts) - k
+        if n > 0:
+            r0 = self.rows
+            for name, values in (("ts", ts), ("t", t), ("h", h)):
+                col = self.cols[name]
+                col.reserve(r0 + n)
+                col.view[r0:r0 + n] = array(col.typecode, values[k:])
+            for r in range((r0 + INDEX_BLOCK - 1) // INDEX_BLOCK * INDEX_BLOCK, r0 + n, INDEX_BLOCK):
+                self.index.append(self.cols["ts"].view[r])
+            self.rows = r0 + n
+        self.seq = seq
+        return n if n > 0 else 0
+
+    def flush(self):
+        for col in self.cols.values():
+            col.flush()
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"rows": self.rows, "seq": self.seq}, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def range(self, t0, t1):
+        """Row numbers [lo, hi) with t0 <= ts < t1."""
+        ts = self.cols["ts"].view
+        return self._find(ts, t0), self._find(ts, t1)
+
+    def _find(self, ts, t):
+        b = bisect.bisect_left(self.index, t)
+        lo = (b - 1) * INDEX_BLOCK if b else 0
+        hi = b * INDEX_BLOCK if b * INDEX_BLOCK < self.rows else self.rows
+        return bisect.bisect_left(ts, t, lo, hi)
+
+    def column(self, name, lo=0, hi=None):
+        """Zero-copy view of rows [lo, hi) of one column."""
+        return self.cols[name].view[lo:self.rows if hi is None else hi]
+
+    def close(self):
+        for col in self.cols.values():
+            col.close()
+
+
+class ColumnStore:
+    """Node tables under one root directory, opened on first use."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.tables = {}
+
+    def table(self, node):
+        tab = self.tables.get(node)
+        if tab is None:
+            safe = re.sub(r"[^A-Za-z0-9._-]", "_", node)
+            tab = self.tables[node] = NodeTable(os.path.join(self.root, safe))
+        return tab
+
+    def close(self):
+        for tab in self.tables.values():
+            tab.flush()
+            tab.close()
+        self.tables = {}